@@ -0,0 +1,302 @@
+# admission.py
+import os
+import math
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from dotenv import load_dotenv
+
+from metrics import Counter, Histogram, register_collector
+
+# Load environment variables
+load_dotenv()
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# Chat turns running at once in this process (each holds OpenAI/Tavily calls)
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "16"))
+# Turns allowed to wait for a free slot; beyond that requests are rejected right away
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+# Seconds a queued turn waits before it is rejected
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "15"))
+# Per-user token bucket: a burst of ADMISSION_USER_BURST turns, refilled at this many per minute
+ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "5"))
+ADMISSION_USER_RATE_PER_MIN = float(os.getenv("ADMISSION_USER_RATE_PER_MIN", "10"))
+# Buckets kept in memory; the least recently used users are forgotten first
+ADMISSION_MAX_TRACKED_USERS = int(os.getenv("ADMISSION_MAX_TRACKED_USERS", "10000"))
+
+# IDs shared by everyone who isn't signed in; such users are limited per client address instead
+ANONYMOUS_USER_IDS = {"", "guest", "new-user"}
+
+DECISIONS = Counter(
+    "admission_decisions_total", "Chat turns admitted or rejected by admission control",
+    ["outcome"],  # admitted, rate_limited, queue_full, queue_timeout
+)
+WAIT_SECONDS = Histogram(
+    "admission_wait_seconds", "Time admitted turns waited in the queue", [],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30),
+)
+
+
+class AdmissionRejected(Exception):
+    """A turn was not admitted; `retry_after` is a hint in whole seconds."""
+    def __init__(self, reason, retry_after):
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+        super().__init__(f"{reason}, retry after {self.retry_after}s")
+
+    @property
+    def message(self):
+        if self.reason == "rate_limited":
+            return f"You're sending questions faster than we can answer them. Please try again in {self.retry_after} seconds."
+        return f"We're answering a lot of questions right now. Please try again in {self.retry_after} seconds."
+
+    def to_dict(self):
+        return {"error": self.reason, "message": self.message, "retry_after": self.retry_after}
+
+
+def admission_key(user_id, client=None):
+    """
+    Rate-limit signed-in users per user and everyone else per client address.
+    Guest IDs and session IDs are chosen by the caller, so a client could get
+    a fresh bucket on every request by leaving them out; anonymous callers
+    without a known address all share one bucket.
+    """
+    user_id = str(user_id or "")
+    if user_id in ANONYMOUS_USER_IDS or user_id.startswith("guest-"):
+        return f"client:{client}" if client else "anonymous"
+    return f"user:{user_id}"
+
+
+class TokenBuckets:
+    """Per-key token buckets, LRU-bounded to `max_keys`."""
+    def __init__(self, burst, rate_per_second, max_keys):
+        self.burst = burst
+        self.rate = rate_per_second
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()   # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, key, now=None):
+        """Take one token; returns 0 on success or the seconds until one is available."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate if self.rate > 0 else 60.0
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+class _ThreadWaiter:
+    __slots__ = ("event", "granted")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+
+    def wake(self):
+        self.event.set()
+
+
+class _AsyncWaiter:
+    __slots__ = ("loop", "future", "granted")
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+        self.granted = False
+
+    def wake(self):
+        self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class Ticket:
+    """An admitted turn's slot; release() is idempotent, so every exit path can call it."""
+    def __init__(self, controller):
+        self._controller = controller
+        self._released = controller is None
+        self.admitted_at = time.monotonic()
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(time.monotonic() - self.admitted_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class AdmissionController:
+    """
+    Admission for LLM-backed chat turns: a per-user token bucket, then at most
+    `max_concurrent` turns at once with a FIFO queue of `max_queue` waiters,
+    each waiting up to `queue_timeout` seconds. Usable from threads (admit) and
+    from asyncio (aadmit) against the same limits.
+    """
+    def __init__(self, max_concurrent=ADMISSION_MAX_CONCURRENT, max_queue=ADMISSION_MAX_QUEUE,
+                 queue_timeout=ADMISSION_QUEUE_TIMEOUT, user_burst=ADMISSION_USER_BURST,
+                 user_rate_per_min=ADMISSION_USER_RATE_PER_MIN, max_tracked_users=ADMISSION_MAX_TRACKED_USERS):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.buckets = TokenBuckets(user_burst, user_rate_per_min / 60, max_tracked_users)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queue = deque()
+        # Moving average of how long a turn holds its slot, for retry hints
+        self._hold_seconds = 10.0
+
+    # --- Stats ---
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": self._active, "queued": len(self._queue), "max_concurrent": self.max_concurrent}
+
+    def _retry_hint(self):
+        # Caller holds self._lock: roughly when a slot frees up for one more waiter
+        return self._hold_seconds * (len(self._queue) + 1) / max(1, self.max_concurrent)
+
+    # --- Admission ---
+
+    def _check_rate(self, key):
+        wait = self.buckets.take(key) if key is not None else 0.0
+        if wait:
+            DECISIONS.inc(outcome="rate_limited")
+            raise AdmissionRejected("rate_limited", wait)
+
+    def _try_enter(self, make_waiter):
+        """Take a slot now (returns None) or join the queue (returns the waiter)."""
+        with self._lock:
+            if self._active < self.max_concurrent and not self._queue:
+                self._active += 1
+                return None
+            if len(self._queue) >= self.max_queue:
+                retry_after = self._retry_hint()
+            else:
+                waiter = make_waiter()
+                self._queue.append(waiter)
+                return waiter
+        DECISIONS.inc(outcome="queue_full")
+        raise AdmissionRejected("queue_full", retry_after)
+
+    def _leave_queue(self, waiter):
+        """Drop a waiter from the queue; returns True if it was granted a slot meanwhile."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._queue.remove(waiter)
+            return False
+
+    def _give_up(self, waiter):
+        """After a queue timeout: reject, unless the slot arrived just in time."""
+        if self._leave_queue(waiter):
+            return
+        with self._lock:
+            retry_after = self._retry_hint()
+        DECISIONS.inc(outcome="queue_timeout")
+        raise AdmissionRejected("queue_timeout", retry_after)
+
+    def _admitted(self, waited):
+        DECISIONS.inc(outcome="admitted")
+        WAIT_SECONDS.observe(waited)
+        return Ticket(self)
+
+    def admit(self, key=None):
+        """Block until the turn may run; returns a Ticket or raises AdmissionRejected."""
+        self._check_rate(key)
+        started = time.monotonic()
+        waiter = self._try_enter(_ThreadWaiter)
+        if waiter is not None and not waiter.event.wait(self.queue_timeout):
+            self._give_up(waiter)
+        return self._admitted(time.monotonic() - started)
+
+    async def aadmit(self, key=None):
+        """asyncio version of admit()."""
+        self._check_rate(key)
+        started = time.monotonic()
+        waiter = self._try_enter(_AsyncWaiter)
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._give_up(waiter)
+            except asyncio.CancelledError:
+                # The client went away while queued; pass on a slot granted in the meantime
+                if self._leave_queue(waiter):
+                    self._release()
+                raise
+        return self._admitted(time.monotonic() - started)
+
+    def _release(self, held=None):
+        with self._lock:
+            if held is not None:
+                self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * held
+            if self._queue:
+                # Hand the slot straight to the next waiter
+                waiter = self._queue.popleft()
+                waiter.granted = True
+                waiter.wake()
+                return
+            self._active -= 1
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller():
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController()
+    return _controller
+
+
+def admit(user_id=None, client=None):
+    """
+    Admit one chat turn for this user, or for this client address (the
+    caller's IP) when not signed in; a no-op Ticket when admission control is off.
+    """
+    if not ADMISSION_ENABLED:
+        return Ticket(None)
+    return get_controller().admit(admission_key(user_id, client))
+
+
+async def aadmit(user_id=None, client=None):
+    if not ADMISSION_ENABLED:
+        return Ticket(None)
+    return await get_controller().aadmit(admission_key(user_id, client))
+
+
+def _admission_metrics():
+    if _controller is None:
+        return []
+    stats = _controller.stats()
+    return [
+        ("admission_in_flight", "Chat turns running under admission control", "gauge", None, stats["in_flight"]),
+        ("admission_queue_depth", "Chat turns waiting for a free slot", "gauge", None, stats["queued"]),
+    ]
+
+
+register_collector(_admission_metrics)
@@ -0,0 +1,94 @@
+# agents.py
+import os
+import time
+import logging
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Build every registered agent when a server process starts instead of on its first request
+AGENT_WARMUP = os.getenv("AGENT_WARMUP", "false").lower() == "true"
+
+
+# --- Default factories ---
+# Each factory imports its module only when called, so importing this registry
+# (or anything that depends on it) doesn't create LLM clients or touch the database.
+
+def _internet_agent():
+    from tavily_agent import build_internet_agent
+    return build_internet_agent()
+
+
+def _sql_agent():
+    from sql_agent import build_sql_agent
+    return build_sql_agent()
+
+
+def _supervisor():
+    from chat_service import build_supervisor
+    return build_supervisor()
+
+
+def _context_summarizer():
+    from conversation_context import build_summary_llm
+    return build_summary_llm()
+
+
+_factories = {
+    "internet_agent": _internet_agent,
+    "sql_agent": _sql_agent,
+    "supervisor": _supervisor,
+    "context_summarizer": _context_summarizer,
+}
+_agents = {}
+_lock = threading.RLock()
+
+
+def register(name, factory):
+    """Register (or replace) the factory for an agent. A built instance is dropped."""
+    with _lock:
+        _factories[name] = factory
+        _agents.pop(name, None)
+
+
+def override(name, agent):
+    """Use an already-built agent, e.g. a fake in a benchmark."""
+    with _lock:
+        _agents[name] = agent
+
+
+def get_agent(name):
+    """Return the process-wide instance of an agent, building it on first use."""
+    agent = _agents.get(name)
+    if agent is not None:
+        return agent
+    with _lock:
+        agent = _agents.get(name)
+        if agent is None:
+            if name not in _factories:
+                raise KeyError(f"Unknown agent {name!r}")
+            started = time.perf_counter()
+            agent = _factories[name]()
+            _agents[name] = agent
+            logging.info("Built agent %s in %.0f ms", name, (time.perf_counter() - started) * 1000)
+    return agent
+
+
+def warm_up(names=None):
+    """
+    Build the given agents ahead of the first request. By default only the
+    supervisor graph, which builds the agents it routes to.
+    """
+    for name in names or ["supervisor"]:
+        get_agent(name)
+
+
+def reset(name=None):
+    """Forget built agents so the next get_agent() rebuilds them."""
+    with _lock:
+        if name is None:
+            _agents.clear()
+        else:
+            _agents.pop(name, None)
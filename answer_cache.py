@@ -0,0 +1,205 @@
+# answer_cache.py
+import os
+import re
+import math
+import time
+import threading
+from collections import Counter, OrderedDict
+from dotenv import load_dotenv
+
+from qna_data import PREDEFINED_QAS
+
+# Load environment variables
+load_dotenv()
+
+# Cosine similarity (0-1) a question needs to reuse a cached answer
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.85"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(24 * 60 * 60)))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "am", "do", "does", "did",
+    "i", "me", "my", "we", "our", "you", "your", "it", "its", "this", "that", "these", "those",
+    "what", "which", "who", "whom", "how", "can", "could", "would", "should", "will", "shall",
+    "of", "in", "on", "at", "to", "for", "from", "by", "with", "about", "as", "into", "and", "or",
+    "please", "tell", "give", "list", "some", "any", "there", "here", "so", "if", "then",
+}
+
+
+def normalize_question(text):
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", text.lower())).strip()
+
+
+def _stem(word):
+    for suffix, replacement in (("ies", "y"), ("ing", ""), ("es", ""), ("s", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)] + replacement
+    return word
+
+
+def _features(text):
+    """Stemmed content words plus their character trigrams (to tolerate typos)."""
+    words = [_stem(w) for w in normalize_question(text).split() if w not in STOPWORDS]
+    features = Counter(f"w:{w}" for w in words)
+    for w in words:
+        padded = f" {w} "
+        features.update(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return features
+
+
+class _Entry:
+    __slots__ = ("question", "answer", "features", "expires_at", "pinned", "weights", "version")
+
+    def __init__(self, question, answer, features, expires_at, pinned):
+        self.question = question
+        self.answer = answer
+        self.features = features
+        self.expires_at = expires_at
+        self.pinned = pinned
+        # TF-IDF vector, memoized for the corpus version it was computed against
+        self.weights = None
+        self.version = -1
+
+
+class AnswerCache:
+    """
+    Near-duplicate question matcher over predefined and previously generated
+    answers. Questions are compared by TF-IDF cosine similarity over stemmed
+    words and character trigrams, using an inverted index so a lookup only
+    scores entries that share at least one feature with the question.
+    """
+    def __init__(self, threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_SIZE):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # normalized question -> _Entry (LRU order)
+        self._index = {}                # feature -> set of normalized questions
+        self._doc_freq = Counter()
+        self._version = 0               # bumped whenever document frequencies change
+
+        self.hits = 0
+        self.misses = 0
+
+    def _idf(self, feature):
+        n = len(self._entries)
+        return math.log((1 + n) / (1 + self._doc_freq.get(feature, 0))) + 1
+
+    def _weights(self, features):
+        weights = {f: tf * self._idf(f) for f, tf in features.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {f: w / norm for f, w in weights.items()}
+
+    def _add(self, key, entry):
+        self._remove(key)
+        self._entries[key] = entry
+        self._version += 1
+        for feature in entry.features:
+            self._index.setdefault(feature, set()).add(key)
+            self._doc_freq[feature] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._version += 1
+        for feature in entry.features:
+            keys = self._index.get(feature)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[feature]
+            self._doc_freq[feature] -= 1
+            if self._doc_freq[feature] <= 0:
+                del self._doc_freq[feature]
+        return True
+
+    def _evict(self):
+        unpinned = [k for k, e in self._entries.items() if not e.pinned]
+        for key in unpinned[: max(0, len(unpinned) - self.max_entries)]:
+            self._remove(key)
+
+    def put(self, question, answer, pinned=False, ttl=None):
+        """Cache an answer. Pinned entries (predefined Q&As) never expire or get evicted."""
+        key = normalize_question(question)
+        if not key:
+            return
+        expires_at = None if pinned else time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._add(key, _Entry(question, answer, _features(question), expires_at, pinned))
+            self._evict()
+
+    def lookup(self, question):
+        """
+        Returns (answer, score, matched_question) for the most similar cached
+        question at or above the threshold, or None.
+        """
+        key = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.expires_at is None or entry.expires_at > now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.answer, 1.0, entry.question
+
+            query = self._weights(_features(question))
+            # Features shared by most entries (e.g. "malaysia") can't discriminate;
+            # skipping them keeps the candidate set small
+            common = max(8, len(self._entries) // 4)
+            candidates = set()
+            for feature in query:
+                keys = self._index.get(feature, ())
+                if len(keys) <= common:
+                    candidates.update(keys)
+
+            best_key, best_score = None, 0.0
+            for candidate in candidates:
+                entry = self._entries[candidate]
+                if entry.expires_at is not None and entry.expires_at <= now:
+                    continue
+                if entry.version != self._version:
+                    entry.weights = self._weights(entry.features)
+                    entry.version = self._version
+                weights = entry.weights
+                score = sum(w * weights.get(f, 0.0) for f, w in query.items())
+                if score > best_score:
+                    best_key, best_score = candidate, score
+
+            if best_key is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            entry = self._entries[best_key]
+            return entry.answer, best_score, entry.question
+
+    def invalidate(self, question):
+        with self._lock:
+            return self._remove(normalize_question(question))
+
+    def clear(self, include_pinned=False):
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if include_pinned or not e.pinned]:
+                self._remove(key)
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e.expires_at is not None and e.expires_at <= now]:
+                self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "pinned": sum(1 for e in self._entries.values() if e.pinned),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+answer_cache = AnswerCache()
+for _question, _answer in PREDEFINED_QAS.items():
+    answer_cache.put(_question, _answer, pinned=True)
@@ -1,12 +1,62 @@
-from flask import Flask, request, session,jsonify
+from flask import Flask, request, session, jsonify, Response, stream_with_context, g
+from werkzeug.middleware.proxy_fix import ProxyFix
 from chat_history import get_chat_history
-from main import run_supervisor  # your supervisor/SQL/internet agent handler
+from chat_service import run_supervisor, stream_supervisor  # your supervisor/SQL/internet agent handler
+from agents import warm_up, AGENT_WARMUP
+from admission import admit, AdmissionRejected
+import metrics
+from instrumentation import configure_logging, set_request_id, reset_request_id, get_request_id, request_context
 import os
+import json
 from dotenv import load_dotenv
 
 load_dotenv()
+configure_logging()
 app = Flask(__name__)
 
+# Proxies in front of the app whose X-Forwarded-For is trusted; request.remote_addr
+# is then the real client, which admission control limits guests by
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+
+# Agents are otherwise built on the first request
+if AGENT_WARMUP:
+    warm_up()
+
+
+@app.before_request
+def assign_request_id():
+    # Reuse the caller's ID (e.g. from the proxy) so the turn can be followed end to end
+    g.request_id_token = set_request_id(request.headers.get("X-Request-ID"))
+
+
+@app.after_request
+def add_request_id_header(response):
+    response.headers["X-Request-ID"] = get_request_id()
+    return response
+
+
+@app.teardown_request
+def clear_request_id(exc):
+    token = g.pop("request_id_token", None)
+    if token is not None:
+        reset_request_id(token)
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.errorhandler(AdmissionRejected)
+def too_busy(exc):
+    # 429 with a retry hint, before any LLM work or history write happens
+    response = jsonify(exc.to_dict())
+    response.status_code = 429
+    response.headers["Retry-After"] = str(exc.retry_after)
+    return response
+
 
 @app.route("/chat", methods=["POST"])
 def chat():
@@ -21,13 +71,41 @@ def chat():
     # Load history from Postgres
     history, user_id, session_id = get_chat_history(session.get("user_id"), session.get("session_id"))
 
-    # Add user message to history
-    history.add_user_message(user_message)
+    # Get AI reply; run_supervisor saves the question and the reply in one write
+    with admit(user_id, request.remote_addr):
+        assistant_reply = run_supervisor(user_message, history, refresh=bool(request.json.get("refresh")))
 
-    # Get AI reply
-    assistant_reply = run_supervisor(user_message, history)
+    return jsonify({"reply": assistant_reply})
 
-    # Save assistant reply
-    history.add_ai_message(assistant_reply)
 
-    return jsonify({"reply": assistant_reply})
+@app.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    """Server-Sent-Events variant of /chat: one `data:` event per token, then `event: done`."""
+    user_message = request.json.get("message")
+    # Skip cached search results, e.g. for time-sensitive questions
+    refresh = bool(request.json.get("refresh"))
+
+    if "session_id" not in session:
+        session["session_id"] = os.urandom(8).hex()
+
+    history, user_id, session_id = get_chat_history(session.get("user_id"), session.get("session_id"))
+    request_id = get_request_id()
+    # Admit before the response starts so a rejection can still be a 429
+    ticket = admit(user_id, request.remote_addr)
+
+    def events():
+        # The body is produced after the view returns; keep the turn under this request's ID
+        with ticket, request_context(request_id):
+            # stream_supervisor saves both the question and the full reply to history
+            for token in stream_supervisor(user_message, history, refresh=refresh):
+                yield f"data: {json.dumps({'token': token})}\n\n"
+            yield f"event: done\ndata: {json.dumps({'session_id': session_id})}\n\n"
+
+    response = Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Also frees the slot if the client disconnects before the stream starts
+    response.call_on_close(ticket.release)
+    return response
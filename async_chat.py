@@ -0,0 +1,349 @@
+# async_chat.py
+import os
+import uuid
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from langchain_core.messages import HumanMessage, AIMessage
+from langgraph.graph import MessagesState
+from langchain_core.runnables.config import RunnableConfig
+
+from db_pool import conninfo, POOL_MIN_SIZE, POOL_MAX_SIZE, POOL_TIMEOUT
+from chat_history import (
+    TABLE_NAME, SESSIONS_TABLE_NAME, SESSIONS_PAGE_SIZE, SESSIONS_DDL, SESSION_UPSERT, SUMMARY_SELECT, SUMMARY_UPSERT, summary_upsert_params, unsummarized_page_query, insert_rows_query, session_summaries,
+)
+from instrumentation import db_timer, trace_turn
+from conversation_context import abuild_context, afold_after_turn
+from chat_service import final_reply, stream_text, search_freshness, MAX_DEPTH
+from checkpointing import checkpointing_enabled, checkpointed, aget_checkpointer, thread_config, aturn_input
+from agents import get_agent
+
+# Load environment variables
+load_dotenv()
+
+# Maximum number of agent turns (LLM/search round trips) in flight per process.
+# Requests beyond this wait on the semaphore instead of piling onto OpenAI.
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "32"))
+
+_pool = None
+_pool_lock = None
+_llm_semaphore = None
+_schema_ready = False
+
+
+async def get_async_pool():
+    """Return this process's async Postgres pool, opening it on first use."""
+    global _pool, _pool_lock
+    if _pool is None:
+        if _pool_lock is None:
+            _pool_lock = asyncio.Lock()
+        async with _pool_lock:
+            if _pool is None:
+                pool = AsyncConnectionPool(
+                    conninfo(),
+                    min_size=POOL_MIN_SIZE,
+                    max_size=POOL_MAX_SIZE,
+                    timeout=POOL_TIMEOUT,
+                    check=AsyncConnectionPool.check_connection,
+                    open=False,
+                )
+                await pool.open()
+                _pool = pool
+    return _pool
+
+
+async def close_async_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_llm_semaphore():
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+    return _llm_semaphore
+
+
+async def ensure_schema():
+    global _schema_ready
+    if _schema_ready:
+        return
+    pool = await get_async_pool()
+    async with pool.connection() as conn:
+        await conn.execute(SESSIONS_DDL)
+    _schema_ready = True
+
+
+class AsyncPostgresChatMessageHistory:
+    """
+    asyncio counterpart of chat_history.SimplePostgresChatMessageHistory, backed
+    by psycopg 3 and a shared AsyncConnectionPool.
+    """
+    def __init__(self, user_id, session_id):
+        self._user_id = str(user_id)
+        self._session_id = str(session_id)
+        # Cached tail of the session as [(created_at, message)], oldest first
+        self._window = []
+        self._window_complete = False
+        # Messages added inside turn() that are not written yet
+        self._pending = []
+        self._turn_depth = 0
+        # (summary, summarized_until) once loaded
+        self._summary = None
+
+    @property
+    def session_id(self):
+        return self._session_id
+
+    @staticmethod
+    def _to_message(row):
+        if row['role'] == 'user':
+            return HumanMessage(content=row['content'])
+        return AIMessage(content=row['content'])
+
+    async def recent_messages(self, limit):
+        return [msg for _, msg in await self.recent_entries(limit)]
+
+    async def recent_entries(self, limit):
+        if limit <= 0:
+            return []
+        if not self._window_complete and len(self._window) < limit:
+            query = f"""
+                SELECT role, content, created_at FROM {TABLE_NAME}
+                WHERE session_id = %s
+                ORDER BY created_at DESC
+                LIMIT %s
+            """
+            pool = await get_async_pool()
+            with db_timer("recent_messages"):
+                async with pool.connection() as conn:
+                    cur = await conn.cursor(row_factory=dict_row).execute(query, (self._session_id, limit))
+                    rows = await cur.fetchall()
+            rows.reverse()
+            self._window = [(row['created_at'], self._to_message(row)) for row in rows]
+            self._window_complete = len(rows) < limit
+        return (self._window + [(None, msg) for msg in self._pending])[-limit:]
+
+    async def unsummarized_entries(self, until, limit):
+        entries = await self.recent_entries(limit)
+        complete = self._window_complete or len(entries) < limit
+        if until is None:
+            return entries, complete
+        newer = [item for item in entries if item[0] is None or item[0] > until]
+        return newer, complete or len(newer) < len(entries)
+
+    async def unsummarized_page(self, after, before, limit):
+        query, params = unsummarized_page_query(self._session_id, after, before, limit)
+        pool = await get_async_pool()
+        with db_timer("unsummarized_page"):
+            async with pool.connection() as conn:
+                cur = await conn.cursor(row_factory=dict_row).execute(query, params)
+                rows = await cur.fetchall()
+        return [(row['created_at'], self._to_message(row)) for row in rows]
+
+    async def older_messages(self, before=None, limit=20):
+        """
+        Async version of SimplePostgresChatMessageHistory.older_messages: up to
+        `limit` messages created before `before` (or the latest ones), oldest
+        first, and the cursor for the next older page or None.
+        """
+        query = f"""
+            SELECT role, content, created_at FROM {TABLE_NAME}
+            WHERE session_id = %s AND (%s::timestamptz IS NULL OR created_at < %s)
+            ORDER BY created_at DESC
+            LIMIT %s
+        """
+        pool = await get_async_pool()
+        with db_timer("older_messages"):
+            async with pool.connection() as conn:
+                # One extra row tells whether there is an older page
+                cur = await conn.cursor(row_factory=dict_row).execute(query, (self._session_id, before, before, limit + 1))
+                rows = await cur.fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
+        return [self._to_message(row) for row in rows], (rows[0]['created_at'] if has_more else None)
+
+    async def summary_state(self):
+        if self._summary is None:
+            await ensure_schema()
+            pool = await get_async_pool()
+            with db_timer("summary"):
+                async with pool.connection() as conn:
+                    cur = await conn.execute(SUMMARY_SELECT, (self._session_id,))
+                    row = await cur.fetchone()
+            self._summary = (row[0], row[1]) if row else (None, None)
+        return self._summary
+
+    async def save_summary(self, summary, until, previous_until):
+        await ensure_schema()
+        pool = await get_async_pool()
+        params = summary_upsert_params(self._user_id, self._session_id, summary, until, previous_until)
+        with db_timer("save_summary"):
+            async with pool.connection() as conn:
+                cur = await conn.execute(SUMMARY_UPSERT, params)
+                saved = cur.rowcount == 1
+        self._summary = (summary, until) if saved else None
+        return saved
+
+    async def add_user_message(self, message):
+        await self.add_message(HumanMessage(content=message))
+
+    async def add_ai_message(self, message):
+        await self.add_message(AIMessage(content=message))
+
+    async def add_message(self, message):
+        await self.add_messages([message])
+
+    async def add_messages(self, messages):
+        self._pending.extend(messages)
+        if not self._turn_depth:
+            await self.flush()
+
+    @asynccontextmanager
+    async def turn(self):
+        """Buffer the block's messages and write them in one transaction at the end."""
+        self._turn_depth += 1
+        try:
+            yield self
+        finally:
+            self._turn_depth -= 1
+            if not self._turn_depth:
+                await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        messages, self._pending = self._pending, []
+        rows = [
+            (self._user_id, self._session_id, 'user' if isinstance(msg, HumanMessage) else 'assistant', msg.content, i)
+            for i, msg in enumerate(messages)
+        ]
+        await ensure_schema()
+        pool = await get_async_pool()
+        with db_timer("add_messages"):
+            async with pool.connection() as conn:
+                cur = await conn.execute(*insert_rows_query(rows))
+                created = [row[0] for row in await cur.fetchall()]
+                async with conn.cursor() as upsert:
+                    await upsert.executemany(SESSION_UPSERT, session_summaries(rows, created))
+        self._window.extend(zip(created, messages))
+
+
+def get_async_chat_history(user_id=None, session_id=None):
+    if not user_id:
+        user_id = f"guest-{uuid.uuid4()}"
+    if not session_id:
+        session_id = str(uuid.uuid4())
+
+    history = AsyncPostgresChatMessageHistory(user_id, session_id)
+    return history, user_id, session_id
+
+
+async def aget_user_chat_sessions(user_id, limit=SESSIONS_PAGE_SIZE, offset=0):
+    """Async version of chat_history.get_user_chat_sessions."""
+    query = f"""
+        SELECT session_id, first_time, last_time, title, message_count
+        FROM {SESSIONS_TABLE_NAME}
+        WHERE user_id = %s
+        ORDER BY first_time DESC
+        LIMIT %s OFFSET %s
+    """
+    await ensure_schema()
+    pool = await get_async_pool()
+    with db_timer("user_sessions"):
+        async with pool.connection() as conn:
+            cur = await conn.cursor(row_factory=dict_row).execute(query, (user_id, limit, offset))
+            return await cur.fetchall()
+
+
+async def asession_owner(session_id):
+    """The user_id a session belongs to, or None if it has no messages yet."""
+    await ensure_schema()
+    pool = await get_async_pool()
+    with db_timer("session_owner"):
+        async with pool.connection() as conn:
+            cur = await conn.execute(f"SELECT user_id FROM {SESSIONS_TABLE_NAME} WHERE session_id = %s", (session_id,))
+            row = await cur.fetchone()
+    return row[0] if row else None
+
+
+# Async version of chat_service.prepare_turn
+async def aprepare_turn(input_text, history, callbacks):
+    config = RunnableConfig(recursion_limit=MAX_DEPTH, callbacks=callbacks)
+    if not checkpointing_enabled():
+        messages = await abuild_context(history, callbacks=callbacks)
+        return get_agent("supervisor"), MessagesState(messages=messages), config
+    graph = checkpointed(get_agent("supervisor"), await aget_checkpointer(), "async")
+    config["configurable"] = thread_config(history)
+    return graph, await aturn_input(graph, config, input_text, history, callbacks=callbacks), config
+
+
+# Async version of chat_service.run_supervisor
+async def arun_supervisor(input_text, history, refresh=False):
+    # The question and the reply are written together when the turn ends
+    with trace_turn("run") as trace, search_freshness(refresh):
+        async with history.turn():
+            await history.add_user_message(input_text)
+            graph, input_state, config = await aprepare_turn(input_text, history, [trace.handler])
+
+            last_output = {}
+            try:
+                async with get_llm_semaphore():
+                    async for output in graph.astream(input_state, config=config):
+                        last_output = output
+            except Exception as e:
+                trace.status = "error"
+                logging.exception("Error running supervisor")
+                return f"❌ Unexpected error: {e}"
+
+            reply = final_reply(last_output)
+            if reply is None:
+                trace.status = "empty"
+                return "📡 No content returned."
+            await history.add_ai_message(reply)
+        afold_after_turn(history)
+        return reply
+
+
+# Async version of chat_service.stream_supervisor
+async def astream_supervisor(input_text, history, refresh=False):
+    with trace_turn("stream") as trace, search_freshness(refresh):
+        async with history.turn():
+            await history.add_user_message(input_text)
+            graph, input_state, config = await aprepare_turn(input_text, history, [trace.handler])
+
+            parts = []
+            current_message_id = None
+            try:
+                async with get_llm_semaphore():
+                    async for _, (chunk, metadata) in graph.astream(input_state, config=config, stream_mode="messages", subgraphs=True):
+                        text = stream_text(chunk, metadata)
+                        if text is None:
+                            continue
+                        if chunk.id != current_message_id:
+                            if parts:
+                                parts.append("\n\n")
+                                yield "\n\n"
+                            current_message_id = chunk.id
+                        parts.append(text)
+                        yield text
+            except Exception as e:
+                trace.status = "error"
+                logging.exception("Error streaming supervisor")
+                yield f"❌ Unexpected error: {e}"
+                return
+            finally:
+                if parts:
+                    await history.add_ai_message("".join(parts))
+
+        if not parts:
+            trace.status = "empty"
+            yield "📡 No content returned."
+            return
+        afold_after_turn(history)
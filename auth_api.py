@@ -1,22 +1,19 @@
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, EmailStr
-from sqlalchemy import create_engine, text
-FRONTEND_BUILD_DIR = "front_signup/build" 
-
-app = FastAPI(title="AI Super Search Auth API", version="1.0.0")
-
-app.mount(
-    "/",
-    StaticFiles(directory=FRONTEND_BUILD_DIR, html=True),
-    name="static_frontend"
-)
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from static_assets import StaticAssets
+from ttl_cache import TTLCache
 
 load_dotenv()
 
+FRONTEND_BUILD_DIR = os.getenv("FRONTEND_BUILD_DIR", "front_signup/build")
+
 DATABASE_URL = (
     os.getenv("NEON_API_URL")
     or os.getenv("DATABASE_URL")
@@ -26,10 +23,81 @@ if not DATABASE_URL:
     raise RuntimeError("Database URL not found. Set NEON_API_URL or DATABASE_URL in your environment.")
 
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# Per-worker pool; with gunicorn's 4 workers (run.sh) the database sees up to
+# 4 * (AUTH_DB_POOL_SIZE + AUTH_DB_MAX_OVERFLOW) connections
+AUTH_DB_POOL_SIZE = int(os.getenv("AUTH_DB_POOL_SIZE", "5"))
+AUTH_DB_MAX_OVERFLOW = int(os.getenv("AUTH_DB_MAX_OVERFLOW", "5"))
+AUTH_DB_POOL_TIMEOUT = float(os.getenv("AUTH_DB_POOL_TIMEOUT", "10"))
+# Neon closes idle connections; recycle them before that instead of pinging on every checkout
+AUTH_DB_POOL_RECYCLE = int(os.getenv("AUTH_DB_POOL_RECYCLE", "240"))
+AUTH_DB_PRE_PING = os.getenv("AUTH_DB_PRE_PING", "false").lower() == "true"
+# Prepared statements cached per connection by asyncpg; set 0 behind a
+# transaction-mode PgBouncer that can't keep them
+AUTH_DB_STATEMENT_CACHE_SIZE = int(os.getenv("AUTH_DB_STATEMENT_CACHE_SIZE", "100"))
+
+# email -> (user_id, username) for sign-in, per worker
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+SIGNUP_QUERY = text(
+    """
+    INSERT INTO aisupersearch_signup (institute, studying, username, contact_number, email)
+    VALUES (:institute, :studying, :username, :contact_number, :email)
+    ON CONFLICT (email) DO NOTHING
+    RETURNING user_id
+    """
+)
+SIGNIN_QUERY = text("SELECT user_id, username FROM aisupersearch_signup WHERE email = :email")
+
+
+def async_database_url(url):
+    """
+    The asyncpg form of a libpq-style URL: asyncpg takes `ssl` instead of
+    `sslmode` and knows no `channel_binding`, so those move to connect_args.
+    Returns (url, connect_args).
+    """
+    url = make_url(url)
+    query = dict(url.query)
+    sslmode = query.pop("sslmode", None)
+    query.pop("channel_binding", None)
+    connect_args = {"statement_cache_size": AUTH_DB_STATEMENT_CACHE_SIZE}
+    if sslmode:
+        connect_args["ssl"] = sslmode
+    return url.set(drivername="postgresql+asyncpg", query=query), connect_args
+
+
+def create_auth_engine(url=DATABASE_URL):
+    url, connect_args = async_database_url(url)
+    return create_async_engine(
+        url,
+        connect_args=connect_args,
+        # Every query here is a single statement; autocommit saves the BEGIN and COMMIT round trips
+        isolation_level="AUTOCOMMIT",
+        pool_size=AUTH_DB_POOL_SIZE,
+        max_overflow=AUTH_DB_MAX_OVERFLOW,
+        pool_timeout=AUTH_DB_POOL_TIMEOUT,
+        pool_recycle=AUTH_DB_POOL_RECYCLE,
+        pool_pre_ping=AUTH_DB_PRE_PING,
+    )
+
+
+engine = create_auth_engine()
+signin_cache = TTLCache("signin", ttl=AUTH_CACHE_TTL, max_entries=AUTH_CACHE_SIZE)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Open a first connection before traffic arrives instead of on the first sign-in
+    try:
+        async with engine.connect():
+            pass
+    except Exception as e:
+        print(f"Auth database not reachable at startup: {e}")
+    yield
+    await engine.dispose()
 
 
-app = FastAPI(title="AI Super Search Auth API", version="1.0.0")
+app = FastAPI(title="AI Super Search Auth API", version="1.0.0", lifespan=lifespan)
 
 
 # CORS for local dev frontends (adjust in production)
@@ -60,18 +128,11 @@ def health():
 
 
 @app.post("/signup")
-def signup(payload: SignupPayload):
+async def signup(payload: SignupPayload):
     try:
-        with engine.begin() as conn:
-            result = conn.execute(
-                text(
-                    """
-                    INSERT INTO aisupersearch_signup (institute, studying, username, contact_number, email)
-                    VALUES (:institute, :studying, :username, :contact_number, :email)
-                    ON CONFLICT (email) DO NOTHING
-                    RETURNING user_id
-                    """
-                ),
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                SIGNUP_QUERY,
                 {
                     "institute": payload.institute,
                     "studying": payload.studying,
@@ -81,32 +142,35 @@ def signup(payload: SignupPayload):
                 },
             )
             row = result.fetchone()
-            created = bool(row)
-            # If already exists, fetch id
-            if not created:
-                # Email exists -> return 409 Conflict
-                raise HTTPException(status_code=409, detail="Email already exists. Please sign in.")
-            else:
-                user_id = row[0]
-        return {"ok": True, "created": created, "user_id": user_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    # Whatever this worker remembered about the email is stale now
+    signin_cache.delete(payload.email)
+    if not row:
+        # Email exists -> return 409 Conflict
+        raise HTTPException(status_code=409, detail="Email already exists. Please sign in.")
+    return {"ok": True, "created": True, "user_id": row[0]}
 
 
 @app.post("/signin")
-def signin(payload: SigninPayload):
+async def signin(payload: SigninPayload):
+    cached = signin_cache.get(payload.email)
+    if cached is not None:
+        return {"ok": True, "user_id": cached[0], "username": cached[1]}
     try:
-        with engine.begin() as conn:
-            row = conn.execute(
-                text("SELECT user_id, username FROM aisupersearch_signup WHERE email = :email"),
-                {"email": payload.email},
-            ).fetchone()
-            if not row:
-                raise HTTPException(status_code=404, detail="Email not found. Please sign up.")
-            return {"ok": True, "user_id": row[0], "username": row[1]}
-    except HTTPException:
-        raise
+        async with engine.connect() as conn:
+            row = (await conn.execute(SIGNIN_QUERY, {"email": payload.email})).fetchone()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-
+    if not row:
+        # Not cached, so a signup in another worker is visible right away
+        raise HTTPException(status_code=404, detail="Email not found. Please sign up.")
+    signin_cache.set(payload.email, (row[0], row[1]))
+    return {"ok": True, "user_id": row[0], "username": row[1]}
+
+
+# Mounted last: the catch-all "/" must not shadow the API routes above
+if os.path.isdir(FRONTEND_BUILD_DIR):
+    app.mount("/", StaticAssets(FRONTEND_BUILD_DIR), name="static_frontend")
+else:
+    print(f"Frontend build not found at {FRONTEND_BUILD_DIR}; serving the API only")
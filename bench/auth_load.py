@@ -0,0 +1,237 @@
+# bench/auth_load.py
+"""
+Load benchmark for the auth API's /signin and /signup.
+
+Starts auth_api under uvicorn (or targets --url), seeds users into the
+database from NEON_API_URL/DATABASE_URL, then keeps --concurrency clients
+busy for --duration seconds with a mix of known sign-ins, unknown sign-ins
+and signups. To compare two revisions, point --app-dir at a checkout of the
+older one (e.g. a `git worktree`) and pass its results to --compare.
+
+    python -m bench.auth_load --out auth-after.json
+    python -m bench.auth_load --app-dir ../baseline --out auth-before.json
+    python -m bench.auth_load --compare auth-before.json
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import socket
+import asyncio
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+import httpx
+
+from bench.run import summarize, git_revision
+
+SIGNUP_DDL = """
+    CREATE TABLE IF NOT EXISTS aisupersearch_signup (
+        user_id SERIAL PRIMARY KEY,
+        institute TEXT,
+        studying TEXT,
+        username TEXT,
+        contact_number TEXT,
+        email TEXT UNIQUE NOT NULL
+    )
+"""
+
+
+def _database_url():
+    return os.getenv("NEON_API_URL") or os.getenv("DATABASE_URL") or os.getenv("POSTGRES_URL")
+
+
+def seed_users(count, prefix):
+    """Make sure `count` bench users exist; returns their emails."""
+    from sqlalchemy import create_engine, text
+
+    emails = [f"{prefix}{i}@bench.example.com" for i in range(count)]
+    engine = create_engine(_database_url())
+    with engine.begin() as conn:
+        conn.execute(text(SIGNUP_DDL))
+        conn.execute(
+            text("""
+                INSERT INTO aisupersearch_signup (institute, studying, username, contact_number, email)
+                VALUES ('Bench University', 'Computer Science', :username, '0000', :email)
+                ON CONFLICT (email) DO NOTHING
+            """),
+            [{"username": email.split("@")[0], "email": email} for email in emails],
+        )
+    engine.dispose()
+    return emails
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app_dir, workers):
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "auth_api:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=app_dir,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"auth_api exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("auth_api did not become healthy within 60s")
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = {}   # kind -> [seconds]
+        self.statuses = {}    # "kind status" -> count
+        self.errors = 0
+
+    def add(self, kind, seconds, status):
+        self.latencies.setdefault(kind, []).append(seconds)
+        key = f"{kind} {status}"
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+
+
+def auth_request(kind, emails, rng):
+    """(path, JSON body) of one request: "signup", "signin" (a seeded user) or "signin_unknown"."""
+    if kind == "signup":
+        return "/signup", {
+            "institute": "Bench University", "studying": "Engineering", "username": "bench",
+            "contact_number": "0000", "email": f"new-{uuid.uuid4().hex}@bench.example.com",
+        }
+    if kind == "signin_unknown":
+        return "/signin", {"email": f"nobody-{uuid.uuid4().hex}@bench.example.com"}
+    return "/signin", {"email": rng.choice(emails)}
+
+
+async def _client(url, emails, args, stats, stop_at, rng):
+    async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+        while time.perf_counter() < stop_at:
+            roll = rng.random()
+            if roll < args.signup_ratio:
+                kind = "signup"
+            elif roll < args.signup_ratio + args.unknown_ratio:
+                kind = "signin_unknown"
+            else:
+                kind = "signin"
+            path, body = auth_request(kind, emails, rng)
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                stats.add(kind, time.perf_counter() - start, response.status_code)
+            except httpx.HTTPError:
+                stats.errors += 1
+
+
+async def run_load(url, emails, args):
+    stats = Stats()
+    # Warm the workers' pools and caches before measuring
+    warm = time.perf_counter() + args.warmup
+    await asyncio.gather(*(_client(url, emails, args, Stats(), warm, random.Random(n)) for n in range(args.concurrency)))
+    started = time.perf_counter()
+    stop_at = started + args.duration
+    await asyncio.gather(*(_client(url, emails, args, stats, stop_at, random.Random(1000 + n)) for n in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(v) for v in stats.latencies.values())
+    return {
+        "requests": total,
+        "errors": stats.errors,
+        "wall_s": round(elapsed, 3),
+        "requests_per_s": round(total / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": summarize([s for v in stats.latencies.values() for s in v], 1000),
+        "by_kind_ms": {kind: summarize(values, 1000) for kind, values in sorted(stats.latencies.items())},
+        "statuses": dict(sorted(stats.statuses.items())),
+    }
+
+
+def compare(result, baseline):
+    print(f"\nCompared with {baseline['meta'].get('git_revision')} ({baseline['meta'].get('timestamp')}):")
+    for label, path in (("requests/s", ("requests_per_s",)), ("p50 ms", ("latency_ms", "p50")),
+                        ("p95 ms", ("latency_ms", "p95")), ("p99 ms", ("latency_ms", "p99"))):
+        before, after = baseline["result"], result
+        for key in path:
+            before, after = before.get(key, {}), after.get(key, {})
+        if isinstance(before, (int, float)) and isinstance(after, (int, float)) and before:
+            print(f"  {label:<12}{before:>12}{after:>12}{(after - before) / before * 100:>9.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Requests per second of the auth API's /signin and /signup")
+    parser.add_argument("--url", help="benchmark a running server instead of starting one")
+    parser.add_argument("--app-dir", default=".", help="directory containing the auth_api.py to start")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the started server")
+    parser.add_argument("--concurrency", type=int, default=32, help="simultaneous clients")
+    parser.add_argument("--duration", type=float, default=15, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured seconds before that")
+    parser.add_argument("--users", type=int, default=500, help="seeded accounts that sign in")
+    parser.add_argument("--signup-ratio", type=float, default=0.05)
+    parser.add_argument("--unknown-ratio", type=float, default=0.05, help="sign-ins with an unknown email")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare against")
+    args = parser.parse_args(argv)
+
+    if not _database_url():
+        parser.error("set NEON_API_URL or DATABASE_URL to the auth database")
+    emails = seed_users(args.users, "bench-user-")
+
+    process = None
+    url = args.url
+    if not url:
+        process, url = start_server(os.path.abspath(args.app_dir), args.workers)
+    try:
+        result = asyncio.run(run_load(url, emails, args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    app_dir = os.path.abspath(args.app_dir)
+    report = {
+        "meta": {
+            "git_revision": git_revision() if args.url else _revision_of(app_dir),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        },
+        "result": result,
+    }
+    lat = result["latency_ms"]
+    print(f"{result['requests']} requests in {result['wall_s']}s: {result['requests_per_s']} req/s, "
+          f"p50 {lat.get('p50')} ms, p95 {lat.get('p95')} ms, p99 {lat.get('p99')} ms, {result['errors']} errors")
+    for status, count in result["statuses"].items():
+        print(f"  {status}: {count}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.out}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(result, json.load(f))
+    return 0
+
+
+def _revision_of(app_dir):
+    cwd = os.getcwd()
+    try:
+        os.chdir(app_dir)
+        return git_revision()
+    finally:
+        os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+# bench/fakes.py
+import json
+import time
+import asyncio
+import itertools
+import threading
+from typing import Any, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_tavily._utilities import TavilySearchAPIWrapper
+
+
+def _last_question(messages):
+    for msg in reversed(messages):
+        if isinstance(msg, HumanMessage):
+            return msg.content if isinstance(msg.content, str) else str(msg.content)
+    return ""
+
+
+def _answered_since_question(messages, tool):
+    """True if `tool` already returned a result after the latest user question."""
+    for msg in reversed(messages):
+        if isinstance(msg, HumanMessage):
+            return False
+        if isinstance(msg, ToolMessage) and msg.name == tool:
+            return True
+    return False
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic chat model with simulated latency.
+
+    If `tool` is set, the first call after a user question returns a call to
+    that tool; the next call (once its result is in the messages) returns
+    `answer`. `first_token_latency` is paid once per call and
+    `token_latency` per word, both in seconds.
+    """
+    answer: str = "Here is what I found."
+    preface: str = ""
+    tool: Optional[str] = None
+    tool_args: Optional[dict] = None
+    first_token_latency: float = 0.3
+    token_latency: float = 0.01
+
+    _ids: Any = None
+    _lock: Any = None
+
+    def model_post_init(self, __context):
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def _llm_type(self):
+        return "bench-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _next_id(self):
+        with self._lock:
+            return next(self._ids)
+
+    def _reply(self, messages):
+        question = _last_question(messages)
+        if self.tool and not _answered_since_question(messages, self.tool):
+            args = self.tool_args if self.tool_args is not None else {"query": question}
+            call_id = f"call_{self.tool}_{self._next_id()}"
+            message = AIMessage(
+                content=self.preface,
+                tool_calls=[{"name": self.tool, "args": args, "id": call_id, "type": "tool_call"}],
+            )
+        else:
+            message = AIMessage(content=self.answer.format(question=question))
+        # Word counts stand in for token counts
+        prompt = sum(len(str(m.content).split()) for m in messages)
+        completion = len(message.content.split())
+        message.usage_metadata = {"input_tokens": prompt, "output_tokens": completion, "total_tokens": prompt + completion}
+        return message
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._reply(messages)
+        words = len(message.content.split())
+        time.sleep(self.first_token_latency + words * self.token_latency)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._reply(messages)
+        time.sleep(self.first_token_latency)
+        words = message.content.split(" ") if message.content else []
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_latency)
+            text = word if i == len(words) - 1 else word + " "
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="",
+            tool_call_chunks=[
+                {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": i}
+                for i, tc in enumerate(message.tool_calls)
+            ],
+            usage_metadata=message.usage_metadata,
+        ))
+
+
+class FakeTavilyAPIWrapper(TavilySearchAPIWrapper):
+    """
+    Tavily transport that returns canned results after `latency` seconds, so
+    CachedTavilySearch (and its cache) runs unchanged without the network.
+    """
+    latency: float = 0.8
+    num_results: int = 5
+    calls: int = 0
+
+    def _results(self, query):
+        self.calls += 1
+        return {
+            "query": query,
+            "results": [
+                {
+                    "title": f"Result {i} for {query}",
+                    "url": f"https://example.edu.my/{i}",
+                    "content": f"Studying in Malaysia: details about {query}. " * 8,
+                    "score": round(1 - i / 10, 2),
+                }
+                for i in range(1, self.num_results + 1)
+            ],
+            "response_time": self.latency,
+        }
+
+    def raw_results(self, query, **kwargs):
+        time.sleep(self.latency)
+        return self._results(query)
+
+    async def raw_results_async(self, query, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._results(query)
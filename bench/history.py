@@ -0,0 +1,232 @@
+# bench/history.py
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+import psycopg2
+import psycopg2.extensions
+
+import db_pool
+import chat_history
+from db_pool import ConnectionPool
+
+# --- Round-trip counting ---
+
+_counts = threading.local()
+
+
+def round_trips():
+    """Database round trips made by the current thread so far."""
+    return getattr(_counts, "n", 0)
+
+
+def _count():
+    _counts.n = round_trips() + 1
+
+
+# --- SQLite stand-in ---
+# chat_history.py talks psycopg2 to Postgres. These adapters let the same code
+# run against SQLite: %s placeholders become ?, NOW()/GREATEST() are SQL
+# functions (NOW() plus a microsecond offset is rewritten to NOW_PLUS_US()),
+# timestamps are ISO strings, and RealDictCursor rows come back as dicts.
+# SQLite has no ADD COLUMN IF NOT EXISTS, so those statements run one by one
+# and an existing column is skipped.
+
+_ADD_COLUMN = re.compile(r"ADD COLUMN IF NOT EXISTS", re.IGNORECASE)
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(sep=" ")
+
+
+def _now_plus_us(offset):
+    return (datetime.now(timezone.utc) + timedelta(microseconds=offset)).isoformat(sep=" ")
+
+
+def _translate(query):
+    query = query.replace("%s", "?")
+    return query.replace("NOW() + ? * INTERVAL '1 microsecond'", "NOW_PLUS_US(?)")
+
+
+def _param(value):
+    return value.isoformat(sep=" ") if isinstance(value, datetime) else value
+
+
+def _greatest(*values):
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
+
+
+class SQLiteCursor:
+    def __init__(self, conn, as_dict):
+        self._cur = conn.cursor()
+        self._as_dict = as_dict
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def execute(self, query, params=None):
+        _count()
+        query = _translate(query)
+        if params is None and _ADD_COLUMN.search(query):
+            for statement in filter(str.strip, query.split(";")):
+                self._execute_ddl(statement)
+        elif params is None and query.strip().rstrip(";").count(";"):
+            self._cur.executescript(query)
+        else:
+            self._cur.execute(query, tuple(_param(p) for p in params or ()))
+
+    def _execute_ddl(self, statement):
+        try:
+            self._cur.execute(_ADD_COLUMN.sub("ADD COLUMN", statement))
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" not in str(e):
+                raise
+
+    def executemany(self, query, seq):
+        _count()
+        self._cur.executemany(_translate(query), [tuple(_param(p) for p in params) for params in seq])
+
+    def _row(self, row):
+        if row is None or not self._as_dict:
+            return row
+        return {d[0]: v for d, v in zip(self._cur.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cur.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cur.fetchall()]
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    def close(self):
+        self._cur.close()
+
+
+class SQLiteConnection:
+    """The subset of a psycopg2 connection that db_pool and chat_history use."""
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.create_function("NOW", 0, _now)
+        self._conn.create_function("NOW_PLUS_US", 1, _now_plus_us)
+        self._conn.create_function("GREATEST", -1, _greatest)
+        self.closed = 0
+        self.autocommit = False
+
+    def cursor(self, cursor_factory=None, **kwargs):
+        return SQLiteCursor(self._conn, as_dict=cursor_factory is not None)
+
+    def commit(self):
+        if self._conn.in_transaction:
+            _count()
+            self._conn.commit()
+
+    def rollback(self):
+        if self._conn.in_transaction:
+            _count()
+            self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+        self.closed = 1
+
+
+SQLITE_HISTORY_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {chat_history.TABLE_NAME} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT,
+        session_id TEXT,
+        role TEXT,
+        content TEXT,
+        created_at TEXT
+    );
+    CREATE INDEX IF NOT EXISTS {chat_history.TABLE_NAME}_session_created_at_idx
+        ON {chat_history.TABLE_NAME} (session_id, created_at);
+"""
+
+POSTGRES_HISTORY_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {chat_history.TABLE_NAME} (
+        id SERIAL PRIMARY KEY,
+        user_id TEXT,
+        session_id TEXT,
+        role TEXT,
+        content TEXT,
+        created_at TIMESTAMPTZ DEFAULT NOW()
+    );
+    CREATE INDEX IF NOT EXISTS {chat_history.TABLE_NAME}_session_created_at_idx
+        ON {chat_history.TABLE_NAME} (session_id, created_at);
+"""
+
+
+# --- Counting Postgres connections ---
+
+class CountingConnection(psycopg2.extensions.connection):
+    """psycopg2 connection whose cursors count every execute as a round trip."""
+    _cursor_classes = {}
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.pop("cursor_factory", None) or self.cursor_factory or psycopg2.extensions.cursor
+        counting = self._cursor_classes.get(factory)
+        if counting is None:
+            def execute(cur, query, vars=None):
+                _count()
+                return factory.execute(cur, query, vars)
+
+            def executemany(cur, query, vars_list):
+                _count()
+                return factory.executemany(cur, query, vars_list)
+
+            counting = type(f"Counting{factory.__name__}", (factory,), {"execute": execute, "executemany": executemany})
+            self._cursor_classes[factory] = counting
+        return super().cursor(*args, cursor_factory=counting, **kwargs)
+
+    def commit(self):
+        if self.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            _count()
+        return super().commit()
+
+    def rollback(self):
+        if self.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            _count()
+        return super().rollback()
+
+
+def _postgres_connect():
+    return psycopg2.connect(
+        host=db_pool.POSTGRES_HOST,
+        dbname=db_pool.POSTGRES_DB,
+        user=db_pool.POSTGRES_USER,
+        password=db_pool.POSTGRES_PASSWORD,
+        sslmode=db_pool.POSTGRES_SSLMODE,
+        connection_factory=CountingConnection,
+    )
+
+
+def install_history_backend(backend, sqlite_path, pool_size=10):
+    """
+    Point chat_history's connection pool at a counting SQLite file or the
+    Postgres database from POSTGRES_* and make sure the tables exist.
+    """
+    if backend == "sqlite":
+        connect_fn = lambda: SQLiteConnection(sqlite_path)
+        ddl = SQLITE_HISTORY_DDL
+    elif backend == "postgres":
+        connect_fn = _postgres_connect
+        ddl = POSTGRES_HISTORY_DDL
+    else:
+        raise ValueError(f"Unknown history backend {backend!r}")
+
+    db_pool.close_pool()
+    # Health checks would add round trips that production only pays occasionally
+    db_pool._pool = ConnectionPool(connect_fn=connect_fn, min_size=1, max_size=pool_size, healthcheck_after=3600)
+    with db_pool.get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute(ddl)
+    chat_history._schema_ready = False
+    chat_history.ensure_schema()
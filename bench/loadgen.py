@@ -0,0 +1,348 @@
+# bench/loadgen.py
+"""
+Concurrency load generator for the chat endpoint (app.py's /chat) and the
+auth API (auth_api.py's /signin and /signup).
+
+Starts the target locally with stand-ins, or drives a running one given with
+--url. For chat, app.py runs under gunicorn (gthread workers) with the fake
+OpenAI and Tavily models from bench/fakes.py and chat history in SQLite, or
+in Postgres from POSTGRES_* with --history postgres. For auth, auth_api runs
+under uvicorn against the Postgres in NEON_API_URL/DATABASE_URL, as in
+bench/auth_load.py.
+
+Virtual users are stepped through --levels of concurrency. Each one sends a
+request drawn from --mix, waits an exponentially distributed --think-time,
+and starts a new chat session every --session-turns turns. For every level
+the report gives throughput, error and 429 rates, and latency percentiles
+overall and per request kind. Chat has a single kind: app.py's /chat doesn't
+consult answer_cache (only main.py and chat_api do), so a predefined question
+costs the same as any other and a predefined/free split would show nothing.
+
+    python -m bench.loadgen chat --levels 1,4,16,32 --step 20 --think-time 2
+    python -m bench.loadgen chat --slo-p95-ms 5000 --out chat-load.json
+    python -m bench.loadgen auth --levels 8,32,128 --compare auth-load-before.json
+
+Server settings such as ADMISSION_MAX_CONCURRENT or POSTGRES_POOL_MAX are
+passed through the environment. Per-user rate limits are lifted (every
+virtual user is a guest from the same address, so they would share one
+bucket) unless --keep-rate-limits is given.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+import httpx
+
+from bench.run import QUESTIONS, summarize, git_revision, _prepare_environment
+from bench.auth_load import seed_users, start_server as start_auth_server, auth_request, _free_port, _database_url
+
+DEFAULT_MIX = {
+    "chat": "question=1",
+    "auth": "signin=0.9,signin_unknown=0.05,signup=0.05",
+}
+# A response slower than this counts as an error
+REQUEST_TIMEOUT = 120
+# Non-2xx answers that are the correct outcome for a kind
+EXPECTED_STATUS = {"signin_unknown": 404}
+CHAT_NOTE = ("app.py's /chat does not use answer_cache, so predefined and free-form "
+             "questions are one request kind; see main.py or chat_api for cached answers")
+
+
+def parse_mix(text, kinds):
+    """"signin=0.9,signup=0.1" -> [("signin", 0.9), ("signup", 0.1)]."""
+    mix = []
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in kinds:
+            raise ValueError(f"unknown request kind {kind!r}; expected one of {', '.join(kinds)}")
+        mix.append((kind, float(weight or 1)))
+    if not mix or sum(weight for _, weight in mix) <= 0:
+        raise ValueError("the mix needs at least one kind with a positive weight")
+    return mix
+
+
+# --- Local servers ---
+
+def chat_app():
+    """gunicorn entry point: app.py's Flask app with the stand-ins installed in this worker."""
+    from bench.run import _install_fakes
+    from bench.profiler import NodeTimer
+    from bench.history import install_history_backend
+
+    args = argparse.Namespace(**json.loads(os.environ["BENCH_SERVER_ARGS"]))
+    _install_fakes(args, NodeTimer())
+    install_history_backend(args.history, args.sqlite_path, pool_size=args.threads)
+
+    import app
+    # app.py leaves the secret key to the deployment; sessions need one
+    app.app.secret_key = app.app.secret_key or "bench"
+    return app.app
+
+
+def start_chat_server(args, workdir):
+    _prepare_environment(argparse.Namespace(
+        search_cache=False, graph=args.graph, no_router=False, checkpointer="none"
+    ), workdir)
+    env = dict(os.environ)
+    env["BENCH_SERVER_ARGS"] = json.dumps({
+        "graph": args.graph, "history": args.history, "sqlite_path": os.path.join(workdir, "history.sqlite3"),
+        "threads": args.threads, "llm_latency": args.llm_latency, "token_latency": args.token_latency,
+        "search_latency": args.search_latency,
+    })
+    if not args.keep_rate_limits:
+        env["ADMISSION_USER_BURST"] = env["ADMISSION_USER_RATE_PER_MIN"] = "1000000"
+
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "bench.loadgen:chat_app()", "--worker-class", "gthread",
+         "--workers", str(args.workers), "--threads", str(args.threads), "--bind", f"127.0.0.1:{port}",
+         "--timeout", str(REQUEST_TIMEOUT), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"app.py exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{url}/metrics", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("app.py did not come up within 60s")
+
+
+# --- Virtual users ---
+
+class Level:
+    """Results of one concurrency level."""
+    def __init__(self):
+        self.samples = []   # (kind, seconds, status); status 0 is a transport error or timeout
+
+    def add(self, kind, seconds, status):
+        self.samples.append((kind, seconds, status))
+
+    def report(self, concurrency, elapsed):
+        total = len(self.samples)
+        ok = [(kind, s) for kind, s, status in self.samples
+              if 200 <= status < 300 or status == EXPECTED_STATUS.get(kind)]
+        rejected = sum(1 for _, _, status in self.samples if status == 429)
+        errors = total - len(ok) - rejected
+        by_kind = {}
+        for kind, seconds in ok:
+            by_kind.setdefault(kind, []).append(seconds)
+        return {
+            "concurrency": concurrency,
+            "requests": total,
+            "wall_s": round(elapsed, 3),
+            "requests_per_s": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "rejected_rate": round(rejected / total, 4) if total else 0.0,
+            "latency_ms": summarize([s for _, s in ok], 1000),
+            "by_kind_ms": {kind: summarize(values, 1000) for kind, values in sorted(by_kind.items())},
+        }
+
+
+def _pick(mix, rng):
+    roll = rng.random() * sum(weight for _, weight in mix)
+    for kind, weight in mix:
+        roll -= weight
+        if roll < 0:
+            return kind
+    return mix[-1][0]
+
+
+def chat_request(kind, rng):
+    from qna_data import PREDEFINED_QAS
+
+    # Students ask the predefined questions too; app.py answers them like any other
+    return "/chat", {"message": rng.choice(list(PREDEFINED_QAS) + QUESTIONS)}
+
+
+async def virtual_user(url, args, mix, level, stop_at, rng, emails):
+    async with httpx.AsyncClient(base_url=url, timeout=REQUEST_TIMEOUT) as client:
+        # Spread the first requests over one think time so users don't arrive in lockstep
+        await asyncio.sleep(rng.random() * args.think_time)
+        turns = 0
+        while time.perf_counter() < stop_at:
+            if args.target == "chat" and turns == args.session_turns:
+                # A new student: drop the Flask session cookie
+                client.cookies.clear()
+                turns = 0
+            kind = _pick(mix, rng)
+            path, body = chat_request(kind, rng) if args.target == "chat" else auth_request(kind, emails, rng)
+            start = time.perf_counter()
+            retry_after = 0.0
+            try:
+                response = await client.post(path, json=body)
+                status = response.status_code
+                if status == 429:
+                    retry_after = float(response.headers.get("Retry-After", "1"))
+            except httpx.HTTPError:
+                status = 0
+            level.add(kind, time.perf_counter() - start, status)
+            turns += 1
+            if retry_after:
+                # A rejected student waits as told before asking again
+                await asyncio.sleep(min(retry_after, max(0.0, stop_at - time.perf_counter())))
+            elif args.think_time:
+                await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+
+async def run_levels(url, args, mix, emails):
+    if args.warmup:
+        warm = Level()
+        stop_at = time.perf_counter() + args.warmup
+        await asyncio.gather(*(virtual_user(url, args, mix, warm, stop_at, random.Random(n), emails)
+                               for n in range(args.levels[0])))
+    results = []
+    for concurrency in args.levels:
+        level = Level()
+        started = time.perf_counter()
+        # Users finish the request they are in after the step ends; that time counts towards wall_s
+        await asyncio.gather(*(virtual_user(url, args, mix, level, started + args.step, random.Random(concurrency * 1000 + n), emails)
+                               for n in range(concurrency)))
+        result = level.report(concurrency, time.perf_counter() - started)
+        results.append(result)
+        print_level(result)
+        if args.slo_p95_ms and within_slo([result], args.slo_p95_ms, args.max_error_rate) is None:
+            # Past the knee; higher levels would only queue up more
+            print(f"Stopping the ramp: {concurrency} users miss the SLO")
+            break
+    return results
+
+
+# --- Reporting ---
+
+def print_header():
+    print(f"{'users':>6}{'requests':>10}{'req/s':>9}{'errors':>9}{'429s':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+
+
+def print_level(result):
+    lat = result["latency_ms"]
+    print(f"{result['concurrency']:>6}{result['requests']:>10}{result['requests_per_s']:>9}"
+          f"{result['error_rate'] * 100:>8.1f}%{result['rejected_rate'] * 100:>7.1f}%"
+          f"{lat.get('p50', '-'):>10}{lat.get('p95', '-'):>10}{lat.get('p99', '-'):>10}")
+
+
+def within_slo(results, slo_p95_ms, max_error_rate):
+    """The highest concurrency whose p95 and error rate (429s included) stay within the limits."""
+    best = None
+    for result in results:
+        failing = result["error_rate"] + result["rejected_rate"]
+        if result["latency_ms"].get("p95", float("inf")) <= slo_p95_ms and failing <= max_error_rate:
+            best = result["concurrency"]
+    return best
+
+
+def compare(results, baseline):
+    print(f"\nCompared with {baseline['meta'].get('git_revision')} ({baseline['meta'].get('timestamp')}):")
+    before = {r["concurrency"]: r for r in baseline["results"]}
+    print(f"{'users':>6}{'req/s before':>14}{'after':>9}{'p95 before':>12}{'after':>9}")
+    for result in results:
+        old = before.get(result["concurrency"])
+        if old:
+            print(f"{result['concurrency']:>6}{old['requests_per_s']:>14}{result['requests_per_s']:>9}"
+                  f"{old['latency_ms'].get('p95', '-'):>12}{result['latency_ms'].get('p95', '-'):>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput and latency of the chat or auth endpoints per concurrency level")
+    parser.add_argument("target", choices=["chat", "auth"])
+    parser.add_argument("--url", help="load a running server instead of starting one")
+    parser.add_argument("--levels", default="1,2,4,8,16,32", help="comma-separated concurrent users per step")
+    parser.add_argument("--step", type=float, default=20, help="seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds at the first level")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean seconds a user waits between requests")
+    parser.add_argument("--mix", help="auth request kinds and weights: signin, signin_unknown, signup")
+    parser.add_argument("--session-turns", type=int, default=3, help="chat: turns before a user starts a new session")
+    parser.add_argument("--slo-p95-ms", type=float, help="stop at the first level over this p95 (or --max-error-rate) and report the last one within it")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="with --slo-p95-ms: errors and 429s allowed")
+    # Local chat server
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers (chat) or uvicorn workers (auth)")
+    parser.add_argument("--threads", type=int, default=16, help="chat: threads per gunicorn worker")
+    parser.add_argument("--graph", choices=["internet", "fanout"], default="internet")
+    parser.add_argument("--history", choices=["sqlite", "postgres"], default="sqlite")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds to first token per fake LLM call")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="seconds per streamed word")
+    parser.add_argument("--search-latency", type=float, default=0.8, help="seconds per fake Tavily search")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="chat: leave the per-user admission limits on")
+    # Auth
+    parser.add_argument("--users", type=int, default=500, help="auth: seeded accounts that sign in")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare against")
+    args = parser.parse_args(argv)
+
+    args.levels = [int(n) for n in args.levels.split(",") if n.strip()]
+    kinds = ("question",) if args.target == "chat" else ("signin", "signin_unknown", "signup")
+    try:
+        mix = parse_mix(args.mix or DEFAULT_MIX[args.target], kinds)
+    except ValueError as e:
+        parser.error(str(e))
+
+    emails = []
+    if args.target == "auth":
+        if not _database_url():
+            parser.error("set NEON_API_URL or DATABASE_URL to the auth database")
+        emails = seed_users(args.users, "bench-user-")
+
+    process = None
+    url = args.url
+    workdir = tempfile.mkdtemp(prefix="loadgen-")
+    if not url:
+        if args.target == "chat":
+            process, url = start_chat_server(args, workdir)
+        else:
+            process, url = start_auth_server(os.getcwd(), args.workers)
+    try:
+        print_header()
+        results = asyncio.run(run_levels(url, args, mix, emails))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    report = {
+        "meta": {
+            "git_revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        },
+        "results": results,
+    }
+    if args.target == "chat":
+        report["note"] = CHAT_NOTE
+    if args.slo_p95_ms:
+        best = within_slo(results, args.slo_p95_ms, args.max_error_rate)
+        report["max_users_within_slo"] = best
+        print(f"\nHighest concurrency within p95 <= {args.slo_p95_ms} ms and <= {args.max_error_rate:.0%} failures: {best}")
+    if args.target == "chat":
+        print(f"\nNote: {CHAT_NOTE}")
+    for result in results:
+        kinds_ms = ", ".join(f"{kind} p95 {s.get('p95')} ms" for kind, s in result["by_kind_ms"].items())
+        print(f"  {result['concurrency']} users: {kinds_ms}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.out}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(results, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
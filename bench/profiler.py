@@ -0,0 +1,74 @@
+# bench/profiler.py
+import time
+import threading
+from collections import defaultdict
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from instrumentation import node_path, _token_usage
+
+
+class NodeTimer(BaseCallbackHandler):
+    """
+    Callback handler that adds up wall time per graph node, per LLM call site
+    and per tool, and counts LLM tokens. Node runs are keyed by their path
+    through nested subgraphs.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = {}
+        self._node_runs = {}
+        self.timings = defaultdict(list)   # key -> [seconds, ...]
+        self.tokens = {"prompt": 0, "completion": 0}
+
+    def _start(self, run_id, key):
+        if key:
+            self._started[run_id] = (key, time.perf_counter())
+
+    def _end(self, run_id):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            key, t0 = started
+            with self._lock:
+                self.timings[key].append(time.perf_counter() - t0)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        # Only the node's own run, not the runnables it calls internally. A
+        # compiled subgraph (or a wrapper around one) used as a node shows up
+        # several times nested under the same name; time only the outermost.
+        if node and kwargs.get("name") == node:
+            key = f"node:{node_path(metadata)}"
+            if self._node_runs.get(parent_run_id) != key:
+                self._start(run_id, key)
+            self._node_runs[run_id] = key
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._node_runs.pop(run_id, None)
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._node_runs.pop(run_id, None)
+        self._end(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, f"llm:{node_path(metadata) or kwargs.get('name') or 'llm'}")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompt, completion = _token_usage(response)
+        with self._lock:
+            self.tokens["prompt"] += prompt
+            self.tokens["completion"] += completion
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, f"tool:{kwargs.get('name') or (serialized or {}).get('name', 'tool')}")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
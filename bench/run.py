@@ -0,0 +1,361 @@
+# bench/run.py
+"""
+Offline end-to-end latency benchmark for the chat service.
+
+Runs run_supervisor/stream_supervisor through the real supervisor graph,
+CachedTavilySearch and chat_history code, with the LLMs and the Tavily
+transport replaced by deterministic fakes and chat history stored in a local
+SQLite file (or the Postgres database from POSTGRES_*).
+
+    python -m bench.run --out bench-results.json
+    python -m bench.run --scenarios single,long --stream --history postgres
+    python -m bench.run --graph fanout          # pre-router off, so turns reach synthesize
+    python -m bench.run --compare bench-baseline.json --max-regression 10
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import platform
+import tempfile
+import subprocess
+import threading
+from datetime import datetime, timezone
+
+SCENARIOS = ("single", "long", "concurrent")
+
+QUESTIONS = [
+    "What are the top universities in Malaysia for computer science?",
+    "How do I apply for a student visa to study in Malaysia?",
+    "Which scholarships can international students get in Malaysia?",
+    "What is the cost of living for students in Kuala Lumpur?",
+    "Do Malaysian universities accept IELTS 6.0 for a master's degree?",
+    "When is the next intake for engineering programs at UTM?",
+    "Is health insurance mandatory for international students in Malaysia?",
+    "What documents do I need for admission to a Malaysian university?",
+]
+
+INTERNET_ANSWER = (
+    "Here is an overview for your question: {question} " + "Malaysian universities offer many options for international students. " * 12
+    + "Source: https://example.edu.my/1. Tip: apply early. Would you like a list of scholarships?"
+)
+SUMMARY_ANSWER = "The student is comparing Malaysian universities and asked about admissions, fees, visas and scholarships."
+SQL_ANSWER = "From our database: " + "Universiti Malaya offers this program with competitive fees. " * 6
+
+
+def _router_off(args):
+    # The router would answer the bench questions with the internet agent alone,
+    # so fan-out runs would never reach the supervisor or the synthesis step
+    return args.no_router or (args.graph == "fanout" and not args.router)
+
+
+def _prepare_environment(args, workdir):
+    # Must run before the service modules are imported: they read these at import time
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    os.environ.setdefault("TAVILY_API_KEY", "bench")
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+    os.environ["CACHE_DB_PATH"] = os.path.join(workdir, "cache.sqlite3")
+    os.environ["TAVILY_CACHE_ENABLED"] = "true" if args.search_cache else "false"
+    os.environ["GRAPH_MODE"] = args.graph
+    os.environ["ROUTER_ENABLED"] = "false" if _router_off(args) else "true"
+    os.environ["ROUTER_AUDIT_PATH"] = os.path.join(workdir, "router_audit.jsonl")
+    os.environ["CHECKPOINTER"] = args.checkpointer
+    os.environ["CHECKPOINT_SQLITE_PATH"] = os.path.join(workdir, "checkpoints.sqlite")
+
+
+def _install_fakes(args, timer):
+    import agents
+    from bench.fakes import FakeChatModel, FakeTavilyAPIWrapper
+    from chat_service import build_supervisor
+    from tavily_agent import CachedTavilySearch, build_internet_agent
+
+    def llm(**kwargs):
+        return FakeChatModel(first_token_latency=args.llm_latency, token_latency=args.token_latency, **kwargs)
+
+    search_tool = CachedTavilySearch(
+        api_wrapper=FakeTavilyAPIWrapper(tavily_api_key="bench", latency=args.search_latency)
+    )
+    agents.override("internet_agent", build_internet_agent(
+        llm=llm(tool=search_tool.name, answer=INTERNET_ANSWER), search_tool=search_tool,
+    ))
+
+    if args.graph == "fanout":
+        from langgraph.prebuilt import create_react_agent
+        agents.override("sql_agent", create_react_agent(llm(answer=SQL_ANSWER), tools=[], name="sql_agent"))
+        supervisor_llm = llm(preface="Hello! Let me check our database and the web.",
+                             tool="transfer_to_sql_and_internet_agents", tool_args={})
+        supervisor = build_supervisor(model=supervisor_llm, mode="fanout",
+                                      synthesis_llm=llm(answer=INTERNET_ANSWER))
+    else:
+        supervisor_llm = llm(preface="Hello! Let me look that up for you.", tool="transfer_to_internet_agent", tool_args={})
+        supervisor = build_supervisor(model=supervisor_llm, mode="internet")
+    agents.override("supervisor", supervisor.with_config(callbacks=[timer]))
+    agents.override("context_summarizer", llm(answer=SUMMARY_ANSWER).with_config(callbacks=[timer]))
+
+
+# --- Statistics ---
+
+def percentile(values, p):
+    """Linear-interpolated percentile of a non-empty list, p in [0, 100]."""
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values, scale=1.0):
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values) * scale, 3),
+        "p50": round(percentile(values, 50) * scale, 3),
+        "p95": round(percentile(values, 95) * scale, 3),
+        "p99": round(percentile(values, 99) * scale, 3),
+        "max": round(max(values) * scale, 3),
+    }
+
+
+# --- Scenarios ---
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.first_tokens = []
+        self.round_trips = []
+        self.errors = 0
+
+    def add(self, latency, first_token, round_trips, error):
+        with self._lock:
+            self.latencies.append(latency)
+            if first_token is not None:
+                self.first_tokens.append(first_token)
+            self.round_trips.append(round_trips)
+            self.errors += int(error)
+
+
+def run_turn(question, user_id, session_id, stream, recorder):
+    from bench.history import round_trips
+    from chat_history import get_chat_history
+    from chat_service import run_supervisor, stream_supervisor
+
+    trips = round_trips()
+    start = time.perf_counter()
+    first_token = None
+    # A fresh history object per turn, like a web request
+    history, _, _ = get_chat_history(user_id, session_id)
+    if stream:
+        parts = []
+        for token in stream_supervisor(question, history):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            parts.append(token)
+        reply = "".join(parts)
+    else:
+        reply = run_supervisor(question, history)
+    latency = time.perf_counter() - start
+    recorder.add(latency, first_token, round_trips() - trips, reply.startswith(("❌", "📡")))
+
+
+def scenario_single(args, recorder):
+    for i in range(args.turns):
+        run_turn(QUESTIONS[i % len(QUESTIONS)], f"bench-{uuid.uuid4()}", str(uuid.uuid4()), args.stream, recorder)
+
+
+def scenario_long(args, recorder):
+    user_id, session_id = f"bench-{uuid.uuid4()}", str(uuid.uuid4())
+    for i in range(args.session_turns):
+        run_turn(QUESTIONS[i % len(QUESTIONS)], user_id, session_id, args.stream, recorder)
+
+
+def scenario_concurrent(args, recorder):
+    def user(n):
+        user_id, session_id = f"bench-{uuid.uuid4()}", str(uuid.uuid4())
+        for i in range(args.user_turns):
+            run_turn(QUESTIONS[(n + i) % len(QUESTIONS)], user_id, session_id, args.stream, recorder)
+
+    threads = [threading.Thread(target=user, args=(n,)) for n in range(args.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def _route_counts():
+    from router import DECISIONS
+
+    counts = {}
+    with DECISIONS._lock:
+        for (route, _), value in DECISIONS._values.items():
+            counts[route] = counts.get(route, 0) + value
+    return counts
+
+
+def run_scenario(name, args, timer):
+    import db_pool
+    from conversation_context import flush_summaries
+
+    recorder = Recorder()
+    timer.timings.clear()
+    timer.tokens = {"prompt": 0, "completion": 0}
+    pool_before = db_pool.pool_stats()
+    routes_before = _route_counts()
+    started = time.perf_counter()
+    globals()[f"scenario_{name}"](args, recorder)
+    elapsed = time.perf_counter() - started
+    # Include the conversation summaries folded in the background after the last turns
+    flush_summaries()
+    pool = db_pool.pool_stats()
+    routes = _route_counts()
+
+    result = {
+        "turns": len(recorder.latencies),
+        "errors": recorder.errors,
+        "wall_s": round(elapsed, 3),
+        "throughput_turns_per_s": round(len(recorder.latencies) / elapsed, 3) if elapsed else 0.0,
+        "latency_ms": summarize(recorder.latencies, 1000),
+        "db_round_trips_per_turn": summarize(recorder.round_trips),
+        "llm_tokens_per_turn": {
+            kind: round(count / len(recorder.latencies), 1) if recorder.latencies else 0.0
+            for kind, count in timer.tokens.items()
+        },
+        "pool": {
+            "checkouts": pool.get("checkouts", 0) - pool_before.get("checkouts", 0),
+            "timeouts": pool.get("timeouts", 0) - pool_before.get("timeouts", 0),
+            "checkout_max_ms": round(pool.get("checkout_max_ms", 0.0), 3),
+        },
+        # Where each turn went first; without the router every turn is "supervisor"
+        "routes": {
+            route: routes[route] - routes_before.get(route, 0)
+            for route in sorted(routes) if routes[route] - routes_before.get(route, 0)
+        } or {"supervisor": len(recorder.latencies)},
+        "nodes_ms": {
+            key: {"total": round(sum(values) * 1000, 3), **summarize(values, 1000)}
+            for key, values in sorted(timer.timings.items())
+        },
+    }
+    if recorder.first_tokens:
+        result["first_token_ms"] = summarize(recorder.first_tokens, 1000)
+    return result
+
+
+# --- Output ---
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip())
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_summary(results):
+    print(f"{'scenario':<12}{'turns':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ttft p50':>10}{'db rt/turn':>12}{'prompt tok/turn':>17}  routes")
+    for name, r in results["scenarios"].items():
+        lat = r["latency_ms"]
+        ttft = r.get("first_token_ms", {}).get("p50", "-")
+        routes = ", ".join(f"{route}={n}" for route, n in r.get("routes", {}).items())
+        print(f"{name:<12}{r['turns']:>7}{lat['p50']:>10}{lat['p95']:>10}{lat['p99']:>10}{ttft:>10}{r['db_round_trips_per_turn']['mean']:>12}{r['llm_tokens_per_turn']['prompt']:>17}  {routes}")
+
+
+def compare(results, baseline, max_regression):
+    """Print the change against a previous run. Returns the scenarios that regressed beyond max_regression %."""
+    print(f"\nCompared with {baseline['meta'].get('git_revision')} ({baseline['meta'].get('timestamp')}):")
+    print(f"{'scenario':<12}{'metric':<26}{'baseline':>12}{'current':>12}{'change':>10}")
+    regressed = []
+    for name, current in results["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if not previous:
+            continue
+        for section, field in (("latency_ms", "p50"), ("latency_ms", "p95"), ("latency_ms", "p99"),
+                               ("first_token_ms", "p50"), ("db_round_trips_per_turn", "mean"),
+                               ("llm_tokens_per_turn", "prompt")):
+            before = previous.get(section, {}).get(field)
+            after = current.get(section, {}).get(field)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before * 100 if before else 0.0
+            print(f"{name:<12}{section + '.' + field:<26}{before:>12}{after:>12}{change:>9.1f}%")
+            if max_regression is not None and change > max_regression:
+                regressed.append(f"{name} {section}.{field}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline latency benchmark with fake LLM, search and chat history")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated: " + ", ".join(SCENARIOS))
+    parser.add_argument("--graph", choices=["internet", "fanout"], default="internet")
+    parser.add_argument("--history", choices=["sqlite", "postgres"], default="sqlite")
+    parser.add_argument("--stream", action="store_true", help="measure stream_supervisor (adds time to first token)")
+    parser.add_argument("--search-cache", action="store_true", help="leave the Tavily result cache enabled")
+    parser.add_argument("--no-router", action="store_true", help="send every question through the supervisor LLM")
+    parser.add_argument("--router", action="store_true",
+                        help="with --graph fanout: keep the pre-router on (it is off by default there)")
+    parser.add_argument("--checkpointer", choices=["none", "sqlite", "postgres"], default="none",
+                        help="keep graph state per session in a LangGraph checkpointer")
+    parser.add_argument("--turns", type=int, default=20, help="single: number of one-turn sessions")
+    parser.add_argument("--session-turns", type=int, default=20, help="long: turns in the session")
+    parser.add_argument("--users", type=int, default=8, help="concurrent: simultaneous users")
+    parser.add_argument("--user-turns", type=int, default=3, help="concurrent: turns per user")
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds to first token per LLM call")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="seconds per streamed word")
+    parser.add_argument("--search-latency", type=float, default=0.8, help="seconds per Tavily search")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, help="with --compare: exit 1 if a metric got worse by more than this %%")
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    _prepare_environment(args, workdir)
+
+    from bench.history import install_history_backend
+    from bench.profiler import NodeTimer
+
+    timer = NodeTimer()
+    _install_fakes(args, timer)
+    install_history_backend(args.history, os.path.join(workdir, "history.sqlite3"), pool_size=args.pool_size)
+
+    results = {
+        "meta": {
+            "git_revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "max_regression")},
+            "router_enabled": not _router_off(args),
+        },
+        "scenarios": {},
+    }
+    for name in scenarios:
+        results["scenarios"][name] = run_scenario(name, args, timer)
+
+    print_summary(results)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressed = compare(results, baseline, args.max_regression)
+        if regressed:
+            print("\nRegressed: " + ", ".join(regressed))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+import os
+import hmac
+import json
+import asyncio
+import logging
+from datetime import datetime
+from contextlib import asynccontextmanager
+from typing import Optional
+from dotenv import load_dotenv
+from fastapi import FastAPI, Request, Query, Depends, HTTPException
+from fastapi.responses import StreamingResponse, Response, JSONResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel
+from langchain_core.messages import HumanMessage
+
+from async_chat import (
+    arun_supervisor,
+    astream_supervisor,
+    get_async_chat_history,
+    aget_user_chat_sessions,
+    asession_owner,
+    AsyncPostgresChatMessageHistory,
+    get_async_pool,
+    close_async_pool,
+)
+from agents import warm_up, AGENT_WARMUP
+from admission import aadmit, AdmissionRejected
+from answer_cache import answer_cache
+from chat_history import SESSIONS_PAGE_SIZE
+from checkpointing import aclose_checkpointer
+import metrics
+from instrumentation import configure_logging, request_context, get_request_id
+
+load_dotenv()
+configure_logging()
+
+# Shared secret the UI sends as "Authorization: Bearer <key>". The UI vouches for
+# the user (X-User-ID, or user_id in a chat payload), so without a key anyone who
+# can reach the service can act as any user: run_chat_api.sh binds to localhost
+# unless CHAT_API_HOST says otherwise, and any other bind needs this set.
+CHAT_API_KEY = os.getenv("CHAT_API_KEY", "")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not CHAT_API_KEY:
+        logging.warning("CHAT_API_KEY is not set; only expose the chat API on localhost")
+    await get_async_pool()
+    if AGENT_WARMUP:
+        # Build the agent graph before the worker accepts traffic
+        await asyncio.to_thread(warm_up)
+    yield
+    await aclose_checkpointer()
+    await close_async_pool()
+
+
+app = FastAPI(title="AI Super Search Chat API", version="1.0.0", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    # Reuse the caller's ID (e.g. from the proxy) so the turn can be followed end to end
+    with request_context(request.headers.get("X-Request-ID")) as request_id:
+        response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
+@app.exception_handler(AdmissionRejected)
+async def too_busy(request: Request, exc: AdmissionRejected):
+    # 429 with a retry hint, before any LLM work or history write happens
+    return JSONResponse(exc.to_dict(), status_code=429, headers={"Retry-After": str(exc.retry_after)})
+
+
+class ChatPayload(BaseModel):
+    message: str
+    user_id: Optional[str] = None
+    session_id: Optional[str] = None
+    # Skip cached answers and search results, e.g. for time-sensitive questions
+    refresh: bool = False
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# --- Caller ---
+
+def authorize(request: Request):
+    """The user the caller acts for (X-User-ID header), once the API key checks out."""
+    if CHAT_API_KEY:
+        supplied = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(supplied.encode(), f"Bearer {CHAT_API_KEY}".encode()):
+            raise HTTPException(401, "Missing or wrong API key", headers={"WWW-Authenticate": "Bearer"})
+    return request.headers.get("X-User-ID")
+
+
+async def check_session(session_id, user_id):
+    # 404 rather than 403, so session IDs of other users can't be probed
+    owner = await asession_owner(session_id)
+    if owner is not None and owner != user_id:
+        raise HTTPException(404, "Session not found")
+
+
+async def chat_history_for(payload, caller):
+    if caller and payload.user_id and caller != payload.user_id:
+        raise HTTPException(403, "user_id does not match X-User-ID")
+    history, user_id, session_id = get_async_chat_history(payload.user_id or caller, payload.session_id)
+    if payload.session_id:
+        await check_session(session_id, user_id)
+    return history, user_id, session_id
+
+
+# --- Answer cache ---
+# Predefined and previously answered opening questions are answered here,
+# without admission control or the agents
+
+async def cached_answer(message, history):
+    """The cached answer for `message`, saved to history like any turn, or None."""
+    cached = answer_cache.lookup(message)
+    if not cached:
+        return None
+    async with history.turn():
+        await history.add_user_message(message)
+        await history.add_ai_message(cached[0])
+    return cached[0]
+
+
+def remember_answer(message, reply, is_opening_question):
+    # Only a conversation's opening question is context-free enough to reuse its answer
+    if is_opening_question and reply and not reply.startswith(("❌", "📡")):
+        answer_cache.put(message, reply)
+
+
+# --- Chat ---
+
+def client_address(request: Request):
+    # uvicorn takes this from X-Forwarded-For when the peer is in FORWARDED_ALLOW_IPS
+    return request.client.host if request.client else None
+
+
+@app.post("/chat")
+async def chat(payload: ChatPayload, request: Request, caller: Optional[str] = Depends(authorize)):
+    history, user_id, session_id = await chat_history_for(payload, caller)
+    reply = None if payload.refresh else await cached_answer(payload.message, history)
+    if reply is None:
+        is_opening_question = not await history.recent_messages(1)
+        async with await aadmit(user_id, client_address(request)):
+            reply = await arun_supervisor(payload.message, history, refresh=payload.refresh)
+        remember_answer(payload.message, reply, is_opening_question)
+    return {"reply": reply, "user_id": user_id, "session_id": session_id}
+
+
+@app.post("/chat/stream")
+async def chat_stream(payload: ChatPayload, request: Request, caller: Optional[str] = Depends(authorize)):
+    history, user_id, session_id = await chat_history_for(payload, caller)
+    done = f"event: done\ndata: {json.dumps({'user_id': user_id, 'session_id': session_id})}\n\n"
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+    reply = None if payload.refresh else await cached_answer(payload.message, history)
+    if reply is not None:
+        body = f"data: {json.dumps({'token': reply})}\n\n" + done
+        return Response(body, media_type="text/event-stream", headers=headers)
+
+    is_opening_question = not await history.recent_messages(1)
+    request_id = get_request_id()
+    # Admit before the response starts so a rejection can still be a 429
+    ticket = await aadmit(user_id, client_address(request))
+
+    async def events():
+        parts = []
+        async with ticket:
+            with request_context(request_id):
+                async for token in astream_supervisor(payload.message, history, refresh=payload.refresh):
+                    parts.append(token)
+                    yield f"data: {json.dumps({'token': token})}\n\n"
+        remember_answer(payload.message, "".join(parts), is_opening_question)
+        yield done
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers=headers,
+        # Also frees the slot if the client disconnects before the stream starts
+        background=BackgroundTask(ticket.release),
+    )
+
+
+# --- Sessions ---
+# What a UI needs to list a user's conversations and page through one; only
+# for the user named in X-User-ID
+
+@app.get("/users/{user_id}/sessions")
+async def user_sessions(user_id: str, limit: int = Query(SESSIONS_PAGE_SIZE, ge=1, le=200), offset: int = Query(0, ge=0),
+                        caller: Optional[str] = Depends(authorize)):
+    if caller != user_id:
+        raise HTTPException(403, "Sessions of another user")
+    return {"sessions": await aget_user_chat_sessions(user_id, limit, offset)}
+
+
+@app.get("/sessions/{session_id}/messages")
+async def session_messages(session_id: str, before: Optional[datetime] = None, limit: int = Query(20, ge=1, le=200),
+                           caller: Optional[str] = Depends(authorize)):
+    """A page of the session, oldest first; pass `before` back to get the next older page."""
+    if not caller:
+        raise HTTPException(403, "X-User-ID is required")
+    await check_session(session_id, caller)
+    history = AsyncPostgresChatMessageHistory(caller, session_id)
+    messages, cursor = await history.older_messages(before, limit)
+    return {
+        "messages": [
+            {"role": "user" if isinstance(msg, HumanMessage) else "assistant", "content": msg.content}
+            for msg in messages
+        ],
+        "before": cursor,
+    }
+
+
+# Run with ./run_chat_api.sh (gunicorn, one agent graph, pool and cache set per worker)
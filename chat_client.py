@@ -0,0 +1,146 @@
+# chat_client.py
+import os
+import json
+import uuid
+import logging
+from dotenv import load_dotenv
+import httpx
+from langchain_core.messages import HumanMessage, AIMessage
+
+from admission import AdmissionRejected
+
+# Load environment variables
+load_dotenv()
+
+# Base URL of the chat API service (run_chat_api.sh); main.py uses this module when it is set
+CHAT_API_URL = os.getenv("CHAT_API_URL")
+# Seconds to connect and for non-streaming calls; streamed answers may take longer between tokens
+CHAT_API_TIMEOUT = float(os.getenv("CHAT_API_TIMEOUT", "10"))
+CHAT_API_STREAM_TIMEOUT = float(os.getenv("CHAT_API_STREAM_TIMEOUT", "120"))
+# The chat API's CHAT_API_KEY, when it has one
+CHAT_API_KEY = os.getenv("CHAT_API_KEY", "")
+
+_client = None
+
+
+def get_client():
+    """One keep-alive HTTP client per process, shared by every Streamlit session."""
+    global _client
+    if _client is None:
+        headers = {"Authorization": f"Bearer {CHAT_API_KEY}"} if CHAT_API_KEY else {}
+        _client = httpx.Client(base_url=CHAT_API_URL, timeout=CHAT_API_TIMEOUT, headers=headers)
+    return _client
+
+
+def _as_user(user_id):
+    # The chat API serves sessions and messages only to the user they belong to
+    return {"X-User-ID": str(user_id)}
+
+
+def _raise_for_status(response):
+    if response.status_code == 429:
+        body = json.loads(response.read() or b"{}")
+        raise AdmissionRejected(body.get("error", "busy"), float(response.headers.get("Retry-After", "1")))
+    response.raise_for_status()
+
+
+class RemoteChatHistory:
+    """
+    The part of SimplePostgresChatMessageHistory the UI reads, served by the
+    chat API. Pages it has fetched, and turns streamed through it, are kept so
+    Streamlit reruns don't call the service again.
+    """
+    def __init__(self, user_id, session_id):
+        self._user_id = str(user_id)
+        self._session_id = str(session_id)
+        self._window = []
+        self._window_complete = False
+
+    @property
+    def user_id(self):
+        return self._user_id
+
+    @property
+    def session_id(self):
+        return self._session_id
+
+    def recent_messages(self, limit):
+        if limit <= 0:
+            return []
+        if not self._window_complete and len(self._window) < limit:
+            response = get_client().get(f"/sessions/{self._session_id}/messages", params={"limit": limit},
+                                        headers=_as_user(self._user_id))
+            _raise_for_status(response)
+            page = response.json()
+            self._window = [_to_message(item) for item in page["messages"]]
+            self._window_complete = page["before"] is None
+        return self._window[-limit:]
+
+    def remember(self, *messages):
+        """Add a turn the service has already saved."""
+        self._window.extend(messages)
+
+
+def _to_message(item):
+    if item["role"] == "user":
+        return HumanMessage(content=item["content"])
+    return AIMessage(content=item["content"])
+
+
+def get_chat_history(user_id=None, session_id=None):
+    if not user_id:
+        user_id = f"guest-{uuid.uuid4()}"
+    if not session_id:
+        session_id = str(uuid.uuid4())
+    return RemoteChatHistory(user_id, session_id), user_id, session_id
+
+
+def get_user_chat_sessions(user_id):
+    try:
+        response = get_client().get(f"/users/{user_id}/sessions", headers=_as_user(user_id))
+        _raise_for_status(response)
+        return response.json()["sessions"]
+    except (httpx.HTTPError, AdmissionRejected) as e:
+        print(f"Error fetching chat sessions: {e}")
+        return []
+
+
+def _forwarded_for():
+    # The browser's address, so the chat API limits guests per browser rather than per UI server
+    import streamlit as st
+    try:
+        address = st.context.ip_address
+    except Exception:
+        address = None
+    return {"X-Forwarded-For": address} if address else {}
+
+
+def stream_supervisor(input_text, history, refresh=False):
+    """
+    Same contract as chat_service.stream_supervisor, run by the chat API: yields
+    the answer's text as it arrives. The service saves the turn and answers
+    cached questions itself. Raises AdmissionRejected when it is busy.
+    """
+    payload = {"message": input_text, "user_id": history.user_id, "session_id": history.session_id, "refresh": refresh}
+    timeout = httpx.Timeout(CHAT_API_TIMEOUT, read=CHAT_API_STREAM_TIMEOUT)
+    parts = []
+    try:
+        headers = {**_forwarded_for(), **_as_user(history.user_id)}
+        with get_client().stream("POST", "/chat/stream", json=payload, headers=headers, timeout=timeout) as response:
+            _raise_for_status(response)
+            event = None
+            for line in response.iter_lines():
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:") and event is None:
+                    token = json.loads(line[len("data:"):])["token"]
+                    parts.append(token)
+                    yield token
+                elif not line:
+                    event = None
+    except httpx.HTTPError as e:
+        logging.exception("Error calling the chat API")
+        yield f"❌ Unexpected error: {e}"
+        return
+    if parts:
+        history.remember(HumanMessage(content=input_text), AIMessage(content="".join(parts)))
@@ -1,55 +1,451 @@
 # chat_history.py
 import uuid
 import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from contextlib import contextmanager
 from dotenv import load_dotenv
-import psycopg2
 from psycopg2.extras import RealDictCursor
 from langchain_postgres import PostgresChatMessageHistory
 from langchain_core.messages import HumanMessage, AIMessage
+from db_pool import connect, get_pool
+from instrumentation import db_timer
 
 # Load environment variables
 load_dotenv()
 
-POSTGRES_HOST = os.getenv("POSTGRES_HOST")
-POSTGRES_DB = os.getenv("POSTGRES_DB")
-POSTGRES_USER = os.getenv("POSTGRES_USER")
-POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
-POSTGRES_SSLMODE = os.getenv("POSTGRES_SSLMODE", "require")
 TABLE_NAME = os.getenv("TABLE_NAME", "chat_history")
+SESSIONS_TABLE_NAME = os.getenv("SESSIONS_TABLE_NAME", "chat_sessions")
+SESSIONS_PAGE_SIZE = int(os.getenv("SESSIONS_PAGE_SIZE", "50"))
 
+# Hand each turn's write to a background thread instead of waiting for the
+# commit. This process reads its own unwritten messages; other processes see
+# them once the writer has committed (normally within milliseconds).
+WRITE_BEHIND = os.getenv("CHAT_HISTORY_WRITE_BEHIND", "false").lower() == "true"
+# Most turns the writer puts into one transaction
+WRITE_BEHIND_BATCH = int(os.getenv("CHAT_HISTORY_WRITE_BEHIND_BATCH", "100"))
 
-def get_psycopg_connection():
-    return psycopg2.connect(
-        host=POSTGRES_HOST,
-        dbname=POSTGRES_DB,
-        user=POSTGRES_USER,
-        password=POSTGRES_PASSWORD,
-        sslmode=POSTGRES_SSLMODE
+# One row per chat session, kept current by add_message so the sidebar never
+# has to aggregate the whole chat_history table.
+SESSIONS_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {SESSIONS_TABLE_NAME} (
+        session_id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        first_time TIMESTAMPTZ NOT NULL,
+        last_time TIMESTAMPTZ NOT NULL,
+        title TEXT,
+        message_count INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS {SESSIONS_TABLE_NAME}_user_first_time_idx
+        ON {SESSIONS_TABLE_NAME} (user_id, first_time DESC);
+    -- Rolling summary of the messages up to summarized_until (see conversation_context.py)
+    ALTER TABLE {SESSIONS_TABLE_NAME} ADD COLUMN IF NOT EXISTS summary TEXT;
+    ALTER TABLE {SESSIONS_TABLE_NAME} ADD COLUMN IF NOT EXISTS summarized_until TIMESTAMPTZ;
+"""
+
+SESSION_UPSERT = f"""
+    INSERT INTO {SESSIONS_TABLE_NAME} (session_id, user_id, first_time, last_time, title, message_count)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON CONFLICT (session_id) DO UPDATE SET
+        last_time = GREATEST({SESSIONS_TABLE_NAME}.last_time, EXCLUDED.last_time),
+        title = COALESCE({SESSIONS_TABLE_NAME}.title, EXCLUDED.title),
+        message_count = {SESSIONS_TABLE_NAME}.message_count + EXCLUDED.message_count
+"""
+
+SUMMARY_SELECT = f"SELECT summary, summarized_until FROM {SESSIONS_TABLE_NAME} WHERE session_id = %s"
+
+# Only moves the summary forward from the state it was computed from, so two
+# workers folding the same session at once can't overwrite each other's work.
+# Sessions without a row yet (not backfilled, or write-behind not flushed) get
+# one built from their stored messages, like backfill_chat_sessions() would.
+SUMMARY_UPSERT = f"""
+    INSERT INTO {SESSIONS_TABLE_NAME}
+        (session_id, user_id, first_time, last_time, title, message_count, summary, summarized_until)
+    VALUES (
+        %s, %s,
+        COALESCE((SELECT MIN(created_at) FROM {TABLE_NAME} WHERE session_id = %s), %s),
+        COALESCE((SELECT MAX(created_at) FROM {TABLE_NAME} WHERE session_id = %s), %s),
+        (SELECT content FROM {TABLE_NAME} WHERE session_id = %s AND role = 'user' ORDER BY created_at LIMIT 1),
+        (SELECT COUNT(*) FROM {TABLE_NAME} WHERE session_id = %s),
+        %s, %s
     )
+    ON CONFLICT (session_id) DO UPDATE SET
+        summary = EXCLUDED.summary,
+        summarized_until = EXCLUDED.summarized_until
+    WHERE {SESSIONS_TABLE_NAME}.summarized_until IS NOT DISTINCT FROM %s
+"""
+
+
+def summary_upsert_params(user_id, session_id, summary, until, previous_until):
+    return (
+        session_id, user_id, session_id, until, session_id, until, session_id, session_id,
+        summary, until, previous_until,
+    )
+
+
+def unsummarized_page_query(session_id, after, before, limit):
+    """Stored messages of a session created after `after` and before `before` (either may be None), oldest first."""
+    conditions, params = ["session_id = %s"], [session_id]
+    if after is not None:
+        conditions.append("created_at > %s")
+        params.append(after)
+    if before is not None:
+        conditions.append("created_at < %s")
+        params.append(before)
+    query = f"""
+        SELECT role, content, created_at FROM {TABLE_NAME}
+        WHERE {" AND ".join(conditions)}
+        ORDER BY created_at ASC
+        LIMIT %s
+    """
+    return query, params + [limit]
+
+_schema_ready = False
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_psycopg_connection():
+    # Unpooled connection; prefer get_pool().connection() for request paths
+    return connect()
+
+
+def ensure_schema():
+    """Create the chat_sessions table on first use in this process."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute(SESSIONS_DDL)
+    _schema_ready = True
+
+
+def _role(message):
+    return 'user' if isinstance(message, HumanMessage) else 'assistant'
+
+
+def insert_rows_query(rows, explicit_times=False):
+    """
+    One multi-row INSERT for chat rows (user_id, session_id, role, content, stamp).
+    `stamp` is the created_at value when `explicit_times` is set and otherwise a
+    microsecond offset from NOW(), so messages of one transaction keep their
+    order. Returns (query, params); the query returns each row's created_at.
+    """
+    created_at = "%s" if explicit_times else "NOW() + %s * INTERVAL '1 microsecond'"
+    values = ", ".join([f"(%s, %s, %s, %s, {created_at})"] * len(rows))
+    query = f"""
+        INSERT INTO {TABLE_NAME} (user_id, session_id, role, content, created_at)
+        VALUES {values}
+        RETURNING created_at
+    """
+    return query, [value for row in rows for value in row]
+
+
+def session_summaries(rows, created):
+    """SESSION_UPSERT parameters for the sessions touched by the inserted rows."""
+    sessions = {}
+    for (user_id, session_id, role, content, _), at in zip(rows, created):
+        summary = sessions.get(session_id)
+        if summary is None:
+            summary = sessions[session_id] = [session_id, user_id, at, at, None, 0]
+        summary[2] = min(summary[2], at)
+        summary[3] = max(summary[3], at)
+        if summary[4] is None and role == 'user':
+            summary[4] = content
+        summary[5] += 1
+    return list(sessions.values())
+
+
+def _write_rows(cur, rows, explicit_times=False):
+    """Insert chat rows and update their sessions; returns each row's created_at."""
+    cur.execute(*insert_rows_query(rows, explicit_times))
+    created = [row[0] for row in cur.fetchall()]
+    summaries = session_summaries(rows, created)
+    if len(summaries) == 1:
+        cur.execute(SESSION_UPSERT, summaries[0])
+    else:
+        cur.executemany(SESSION_UPSERT, summaries)
+    return created
+
+
+class WriteBehindWriter:
+    """
+    Background thread that writes queued turns, batching whatever has queued
+    up into one transaction. Messages stay readable through unwritten() until
+    they are committed.
+    """
+    def __init__(self, batch_size=WRITE_BEHIND_BATCH, retries=3):
+        self.batch_size = batch_size
+        self.retries = retries
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._unwritten = {}   # session_id -> [(created_at, message)]
+        self._thread = threading.Thread(target=self._run, name="chat-history-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, rows, messages):
+        with self._lock:
+            for row, message in zip(rows, messages):
+                self._unwritten.setdefault(row[1], []).append((row[4], message))
+        self._queue.put(rows)
+
+    def unwritten(self, session_id):
+        with self._lock:
+            return list(self._unwritten.get(session_id, ()))
+
+    def flush(self):
+        """Block until everything submitted so far has been written (or given up on)."""
+        # Not under _lock: the writer thread takes it in _forget before task_done()
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            batches = [self._queue.get()]
+            while len(batches) < self.batch_size:
+                try:
+                    batches.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for batch in batches for row in batch]
+            try:
+                self._write(rows)
+            finally:
+                self._forget(rows)
+                for _ in batches:
+                    self._queue.task_done()
+
+    def _write(self, rows):
+        for attempt in range(self.retries):
+            try:
+                ensure_schema()
+                with db_timer("write_behind"), get_pool().connection() as conn, conn.cursor() as cur:
+                    _write_rows(cur, rows, explicit_times=True)
+                return
+            except Exception:
+                logging.exception("Write-behind of %d chat messages failed (attempt %d)", len(rows), attempt + 1)
+                time.sleep(0.5 * 2 ** attempt)
+        logging.error("Dropped %d chat messages after %d failed writes", len(rows), self.retries)
+
+    def _forget(self, rows):
+        written = {(row[1], row[4]) for row in rows}
+        with self._lock:
+            for session_id in {row[1] for row in rows}:
+                left = [item for item in self._unwritten.get(session_id, ()) if (session_id, item[0]) not in written]
+                if left:
+                    self._unwritten[session_id] = left
+                else:
+                    self._unwritten.pop(session_id, None)
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = WriteBehindWriter()
+                atexit.register(_writer.flush)
+    return _writer
+
+
+def flush_writes():
+    """Wait for queued write-behind turns, e.g. before a worker shuts down."""
+    if _writer is not None:
+        _writer.flush()
 
 
 class SimplePostgresChatMessageHistory:
     """
-    Minimal replacement for PostgresChatMessageHistory that avoids psycopg2.sql.Composed
+    Minimal replacement for PostgresChatMessageHistory that avoids psycopg2.sql.Composed.
+    Connections are borrowed from the process-wide pool per operation unless an
+    explicit connection is passed in. The cached state is locked, as the
+    background summary update (conversation_context.fold_after_turn) uses the
+    same object as the next turn.
     """
-    def __init__(self, user_id, session_id, connection):
+    def __init__(self, user_id, session_id, connection=None):
         self._user_id = str(user_id)
         self._session_id = str(session_id)
         self._connection = connection
+        # Cached tail of the session as [(created_at, message)], oldest first.
+        # Writes through this object are appended in place; writes from other
+        # processes are only picked up after refresh().
+        self._window = []
+        self._window_complete = False
+        # Messages added inside turn() that are not written yet
+        self._pending = []
+        self._turn_depth = 0
+        # (summary, summarized_until) once loaded
+        self._summary = None
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def _connect(self):
+        if self._connection is not None:
+            try:
+                yield self._connection
+                self._connection.commit()
+            except Exception:
+                self._connection.rollback()
+                raise
+        else:
+            with get_pool().connection() as conn:
+                yield conn
+
+    @property
+    def user_id(self):
+        return self._user_id
+
+    @property
+    def session_id(self):
+        return self._session_id
+
+    @staticmethod
+    def _to_message(row):
+        if row['role'] == 'user':
+            return HumanMessage(content=row['content'])
+        return AIMessage(content=row['content'])
+
+    def _fetch(self, op, query, params):
+        with db_timer(op), self._connect() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, params)
+            return [(row['created_at'], self._to_message(row)) for row in cur.fetchall()]
 
     @property
     def messages(self):
-        msgs = []
-        query = f"SELECT role, content FROM {TABLE_NAME} WHERE session_id = %s ORDER BY created_at ASC"
-        with self._connection.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(query, (self._session_id,))
-            rows = cur.fetchall()
-            for row in rows:
-                if row['role'] == 'user':
-                    msgs.append(HumanMessage(content=row['content']))
+        with self._lock:
+            if not self._window_complete:
+                query = f"""
+                    SELECT role, content, created_at FROM {TABLE_NAME}
+                    WHERE session_id = %s
+                    ORDER BY created_at ASC
+                """
+                self._window = self._with_unwritten(self._fetch("messages", query, (self._session_id,)))
+                self._window_complete = True
+            return [msg for _, msg in self._window] + self._pending
+
+    def recent_messages(self, limit):
+        """
+        Returns the last `limit` messages of the session (oldest first), fetching
+        only those rows from the database when they are not already cached.
+        """
+        return [msg for _, msg in self.recent_entries(limit)]
+
+    def recent_entries(self, limit):
+        """Like recent_messages, as (created_at, message); created_at is None for unwritten messages."""
+        if limit <= 0:
+            return []
+        with self._lock:
+            if not self._window_complete and len(self._window) < limit:
+                query = f"""
+                    SELECT role, content, created_at FROM {TABLE_NAME}
+                    WHERE session_id = %s
+                    ORDER BY created_at DESC
+                    LIMIT %s
+                """
+                rows = self._fetch("recent_messages", query, (self._session_id, limit))
+                rows.reverse()
+                self._window_complete = len(rows) < limit
+                self._window = self._with_unwritten(rows)
+            return (self._window + [(None, msg) for msg in self._pending])[-limit:]
+
+    def unsummarized_entries(self, until, limit):
+        """
+        The recent entries (at most `limit`) not yet covered by a summary made
+        up to `until`, and whether they are all of them. If not, the older ones
+        are read with unsummarized_page().
+        """
+        with self._lock:
+            entries = self.recent_entries(limit)
+            complete = self._window_complete or len(entries) < limit
+        if until is None:
+            return entries, complete
+        newer = [item for item in entries if item[0] is None or item[0] > until]
+        return newer, complete or len(newer) < len(entries)
+
+    def unsummarized_page(self, after, before, limit):
+        """Up to `limit` stored entries created after `after` and before `before` (None: unbounded), oldest first."""
+        query, params = unsummarized_page_query(self._session_id, after, before, limit)
+        return self._fetch("unsummarized_page", query, params)
+
+    def summary_state(self):
+        """(summary, summarized_until) of the session; (None, None) before the first summary."""
+        with self._lock:
+            if self._summary is None:
+                ensure_schema()
+                with db_timer("summary"), self._connect() as conn, conn.cursor() as cur:
+                    cur.execute(SUMMARY_SELECT, (self._session_id,))
+                    row = cur.fetchone()
+                self._summary = (row[0], row[1]) if row else (None, None)
+            return self._summary
+
+    def save_summary(self, summary, until, previous_until):
+        """
+        Store a summary covering the messages up to `until`, computed from the one
+        at `previous_until`. Returns False (and reloads) if another worker moved
+        the summary in the meantime.
+        """
+        params = summary_upsert_params(self._user_id, self._session_id, summary, until, previous_until)
+        with self._lock:
+            ensure_schema()
+            with db_timer("save_summary"), self._connect() as conn, conn.cursor() as cur:
+                cur.execute(SUMMARY_UPSERT, params)
+                saved = cur.rowcount == 1
+            self._summary = (summary, until) if saved else None
+            return saved
+
+    def _with_unwritten(self, rows):
+        """Add this session's write-behind messages that haven't reached the database yet."""
+        if _writer is None:
+            return rows
+        stored = {created_at for created_at, _ in rows}
+        unwritten = [item for item in _writer.unwritten(self._session_id) if item[0] not in stored]
+        if not unwritten:
+            return rows
+        return sorted(rows + unwritten, key=lambda item: item[0])
+
+    def older_messages(self, before=None, limit=20):
+        """
+        Keyset-paginated history for the UI. Returns (messages, cursor): up to
+        `limit` messages created strictly before `before` (oldest first), and the
+        cursor to pass for the next older page, or None when there is none.
+        """
+        with self._lock:
+            if before is None:
+                messages = self.recent_messages(limit)
+                window = self._window[-limit:]
+            else:
+                cached = [item for item in self._window if item[0] < before]
+                if self._window_complete or len(cached) >= limit:
+                    window = cached[-limit:]
                 else:
-                    msgs.append(AIMessage(content=row['content']))
-        return msgs
+                    query = f"""
+                        SELECT role, content, created_at FROM {TABLE_NAME}
+                        WHERE session_id = %s AND created_at < %s
+                        ORDER BY created_at DESC
+                        LIMIT %s
+                    """
+                    window = self._fetch("older_messages", query, (self._session_id, before, limit))
+                    window.reverse()
+                    # Extend the cached tail when the page joins onto it
+                    if self._window and before == self._window[0][0]:
+                        self._window = window + self._window
+                        self._window_complete = len(window) < limit
+                messages = [msg for _, msg in window]
+
+            has_more = len(window) == limit and not (
+                self._window_complete and self._window and window and window[0][0] == self._window[0][0]
+            )
+            return messages, (window[0][0] if has_more else None)
+
+    def refresh(self):
+        """Drop the cached messages so the next read goes back to the database."""
+        with self._lock:
+            self._window = []
+            self._window_complete = False
+            self._summary = None
 
     def add_user_message(self, message):
         self.add_message(HumanMessage(content=message))
@@ -58,15 +454,56 @@ class SimplePostgresChatMessageHistory:
         self.add_message(AIMessage(content=message))
 
     def add_message(self, message):
-        query = f"""
-            INSERT INTO {TABLE_NAME} (user_id, session_id, role, content, created_at)
-            VALUES (%s, %s, %s, %s, NOW())
+        self.add_messages([message])
+
+    def add_messages(self, messages):
+        """Add messages; inside turn() they are written when the turn ends."""
+        with self._lock:
+            self._pending.extend(messages)
+            if not self._turn_depth:
+                self.flush()
+
+    @contextmanager
+    def turn(self):
+        """
+        Buffer the messages added in the block and write them together when it
+        ends (also if it fails): one multi-row INSERT and one session update in
+        a single transaction, or a single hand-off in write-behind mode.
+        Buffered messages are already returned by messages/recent_messages.
         """
-        role = 'user' if isinstance(message, HumanMessage) else 'assistant'
-        with self._connection.cursor() as cur:
-            cur.execute(query, (self._user_id, self._session_id, role, message.content))
-        self._connection.commit()
+        with self._lock:
+            self._turn_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._turn_depth -= 1
+                if not self._turn_depth:
+                    self.flush()
 
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            messages, self._pending = self._pending, []
+            if WRITE_BEHIND and self._connection is None:
+                # Timestamps are taken here, not by the database, so the cached window matches the stored rows
+                now = datetime.now(timezone.utc)
+                rows = [
+                    (self._user_id, self._session_id, _role(msg), msg.content, now + timedelta(microseconds=i))
+                    for i, msg in enumerate(messages)
+                ]
+                get_writer().submit(rows, messages)
+                created = [row[4] for row in rows]
+            else:
+                rows = [
+                    (self._user_id, self._session_id, _role(msg), msg.content, i)
+                    for i, msg in enumerate(messages)
+                ]
+                ensure_schema()
+                with db_timer("add_messages"), self._connect() as conn, conn.cursor() as cur:
+                    created = _write_rows(cur, rows)
+            self._window.extend(zip(created, messages))
 
 
 def get_chat_history(user_id=None, session_id=None):
@@ -75,38 +512,88 @@ def get_chat_history(user_id=None, session_id=None):
     if not session_id:
         session_id = str(uuid.uuid4())
 
-    conn = get_psycopg_connection()
-    history = SimplePostgresChatMessageHistory(user_id, session_id, conn)
+    history = SimplePostgresChatMessageHistory(user_id, session_id)
     return history, user_id, session_id
 
 
-def get_user_chat_sessions(user_id):
+def get_user_chat_sessions(user_id, limit=SESSIONS_PAGE_SIZE, offset=0):
     """
-    Returns a list of chat sessions for a given user.
-    Each session contains session_id, first_time, and title (first message content).
+    Returns a page of chat sessions for a given user, newest first.
+    Each session contains session_id, first_time, last_time, title (first user
+    message content) and message_count.
     """
     sessions = []
     try:
-        with get_psycopg_connection() as conn:
+        ensure_schema()
+        with db_timer("user_sessions"), get_pool().connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 query = f"""
-                    SELECT session_id,
-                           MIN(created_at) AS first_time,
-                           (
-                               SELECT content
-                               FROM {TABLE_NAME} ch2
-                               WHERE ch2.session_id = ch1.session_id
-                                 AND ch2.role = 'user'
-                               ORDER BY created_at ASC
-                               LIMIT 1
-                           ) AS title
-                    FROM {TABLE_NAME} ch1
+                    SELECT session_id, first_time, last_time, title, message_count
+                    FROM {SESSIONS_TABLE_NAME}
                     WHERE user_id = %s
-                    GROUP BY session_id
-                    ORDER BY first_time DESC;
+                    ORDER BY first_time DESC
+                    LIMIT %s OFFSET %s;
                 """
-                cur.execute(query, (user_id,))
+                cur.execute(query, (user_id, limit, offset))
                 sessions = cur.fetchall()
     except Exception as e:
         print(f"Error fetching chat sessions: {e}")
     return sessions
+
+
+def backfill_chat_sessions():
+    """
+    Rebuilds chat_sessions from the existing chat_history rows. Safe to re-run:
+    every session's summary is recomputed from the source table.
+    """
+    query = f"""
+        INSERT INTO {SESSIONS_TABLE_NAME} (session_id, user_id, first_time, last_time, title, message_count)
+        SELECT session_id,
+               MIN(user_id),
+               MIN(created_at),
+               MAX(created_at),
+               (ARRAY_AGG(content ORDER BY created_at ASC) FILTER (WHERE role = 'user'))[1],
+               COUNT(*)
+        FROM {TABLE_NAME}
+        GROUP BY session_id
+        ON CONFLICT (session_id) DO UPDATE SET
+            user_id = EXCLUDED.user_id,
+            first_time = EXCLUDED.first_time,
+            last_time = EXCLUDED.last_time,
+            title = EXCLUDED.title,
+            message_count = EXCLUDED.message_count
+    """
+    ensure_schema()
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute(query)
+        return cur.rowcount
+
+
+def create_history_index():
+    """Index chat_history for per-session reads (built concurrently, no write lock)."""
+    conn = get_psycopg_connection()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS {TABLE_NAME}_session_created_at_idx
+                    ON {TABLE_NAME} (session_id, created_at)
+            """)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Chat history maintenance")
+    parser.add_argument("command", choices=["migrate", "backfill-sessions"],
+                        help="migrate: create tables/indexes and backfill; "
+                             "backfill-sessions: only rebuild chat_sessions")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        create_history_index()
+        print(f"Ensured index on {TABLE_NAME}(session_id, created_at)")
+    count = backfill_chat_sessions()
+    print(f"Backfilled {count} sessions into {SESSIONS_TABLE_NAME}")
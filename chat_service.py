@@ -0,0 +1,215 @@
+# chat_service.py
+import os
+import logging
+from contextlib import nullcontext
+from dotenv import load_dotenv
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langgraph.graph import StateGraph, START, END, MessagesState
+from langgraph.prebuilt import create_react_agent
+from langchain_core.runnables.config import RunnableConfig
+from langgraph_swarm import create_handoff_tool
+
+from agents import get_agent
+from instrumentation import trace_turn
+from conversation_context import build_context, fold_after_turn
+from router import make_router, refuse
+from checkpointing import checkpointing_enabled, checkpointed, get_checkpointer, thread_config, turn_input
+
+# Load environment variables
+load_dotenv()
+
+# --- Agent and Graph Definitions ---
+
+# "internet" routes every question to the internet agent; "fanout" also wires in
+# the SQL agent and lets the supervisor query both in parallel
+GRAPH_MODE = os.getenv("GRAPH_MODE", "internet")
+
+SUPERVISOR_PROMPT = (
+    "You are Malaysia's Supervisor AI Agent. Always begin with a friendly greeting."
+    "Only answer questions strictly related to studying in Malaysia, student life, or Malaysian culture in a study context."
+    "TOOL: Internet Research Agent: Conducts latest web-based searches to gather responses."
+)
+
+FANOUT_SUPERVISOR_PROMPT = SUPERVISOR_PROMPT + (
+    "TOOL: SQL Agent: Answers from our database of Malaysian universities, programs, scholarships, rankings, admissions, visa and insurance data."
+    "TOOL: SQL and Internet Agents together: Use when a question needs both database facts and the latest web information; both run in parallel."
+)
+
+# Define the LangGraph graph
+MAX_DEPTH = 10
+
+
+def build_supervisor(model=None, mode=GRAPH_MODE, synthesis_llm=None):
+    """
+    Compile the supervisor graph for `mode`. Called once per process by
+    agents.get_agent("supervisor"); the sub-agents come from the same registry.
+    """
+    from langchain_openai import ChatOpenAI
+
+    # stream_usage reports token counts on streamed calls too (see instrumentation.py)
+    model = model or ChatOpenAI(model="gpt-4.1", stream_usage=True)
+
+    # Define the handoff tool
+    assign_to_internet = create_handoff_tool(agent_name="internet_agent")
+
+    if mode == "fanout":
+        from fanout_graph import assign_to_sql_and_internet, build_fanout_graph
+
+        assign_to_sql = create_handoff_tool(agent_name="sql_agent")
+        supervisor_agent = create_react_agent(
+            model=model,
+            tools=[assign_to_internet, assign_to_sql, assign_to_sql_and_internet],
+            prompt=FANOUT_SUPERVISOR_PROMPT,
+            name="supervisor",
+        )
+        return build_fanout_graph(
+            supervisor_agent,
+            get_agent("sql_agent"),
+            get_agent("internet_agent"),
+            synthesis_llm or ChatOpenAI(model="gpt-4.1", temperature=0.3, stream_usage=True),
+        )
+
+    # Define the supervisor agent
+    supervisor_agent = create_react_agent(
+        model=model,
+        tools=[assign_to_internet],
+        prompt=SUPERVISOR_PROMPT,
+        name="supervisor",
+    )
+
+    # The pre-router sends clear questions straight to the internet agent or
+    # the refusal and only asks the supervisor when it is unsure
+    return (
+        StateGraph(MessagesState)
+        .add_node("supervisor", supervisor_agent)
+        .add_node("internet_agent", get_agent("internet_agent"))
+        .add_node("refuse", refuse)
+        .add_conditional_edges(START, make_router(["supervisor", "internet_agent", "refuse"]))
+        .add_edge("internet_agent", END)
+        .add_edge("refuse", END)
+        .compile()
+    )
+
+
+def __getattr__(name):
+    # `from chat_service import supervisor` still works; the graph is built on first access
+    if name == "supervisor":
+        return get_agent("supervisor")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# --- Core Functions ---
+
+def search_freshness(refresh):
+    """tavily_agent.fresh_search() when the caller asked for fresh web results, else a no-op."""
+    if not refresh:
+        return nullcontext()
+    from tavily_agent import fresh_search
+    return fresh_search()
+
+
+def prepare_turn(input_text, history, callbacks):
+    """
+    The graph, input and config for one turn. Without a checkpointer the state
+    is rebuilt from chat_history each time; with one, the session's thread
+    keeps it and only the new question is sent. `history` must already hold
+    the question.
+    """
+    config = RunnableConfig(recursion_limit=MAX_DEPTH, callbacks=callbacks)
+    if not checkpointing_enabled():
+        # Rolling summary plus the recent messages that fit the token budget
+        messages = build_context(history, callbacks=callbacks)
+        return get_agent("supervisor"), MessagesState(messages=messages), config
+    graph = checkpointed(get_agent("supervisor"), get_checkpointer(), "sync")
+    config["configurable"] = thread_config(history)
+    return graph, turn_input(graph, config, input_text, history, callbacks=callbacks), config
+
+
+# Function to run the supervisor agent and stream output
+def run_supervisor(input_text, history, refresh=False):
+    # refresh=True bypasses cached search results for this turn
+    with trace_turn("run") as trace, search_freshness(refresh):
+        # The question and the reply are written together when the turn ends
+        with history.turn():
+            history.add_user_message(input_text)
+            graph, input_state, config = prepare_turn(input_text, history, [trace.handler])
+
+            try:
+                for output in graph.stream(input_state, config=config):
+                    last_output = output
+            except Exception as e:
+                trace.status = "error"
+                logging.exception("Error running supervisor")
+                return f"❌ Unexpected error: {e}"
+
+            reply = final_reply(last_output)
+            if reply is None:
+                trace.status = "empty"
+                return "📡 No content returned."
+            history.add_ai_message(reply)
+        fold_after_turn(history)
+        return reply
+
+
+# Pick the answer out of the last graph update
+def final_reply(last_output):
+    for source in ["supervisor", "internet_agent", "sql_agent", "synthesize", "refuse"]:
+        if source in last_output and last_output[source]:
+            for msg in reversed(last_output[source].get("messages", [])):
+                if hasattr(msg, "content") and msg.content:
+                    return msg.content
+    return None
+
+
+# Text to show for one item of a stream_mode="messages" stream, or None
+def stream_text(chunk, metadata):
+    if isinstance(chunk, AIMessageChunk):
+        text = chunk.content
+    elif isinstance(chunk, AIMessage) and metadata.get("langgraph_node") in ("synthesize", "refuse"):
+        # Answers made without an LLM call: a single fan-out branch passed through, or the router's refusal
+        text = chunk.content
+    else:
+        return None
+    return text if isinstance(text, str) and text else None
+
+
+# Function to run the supervisor agent and yield the answer token by token
+def stream_supervisor(input_text, history, refresh=False):
+    with trace_turn("stream") as trace, search_freshness(refresh):
+        # The question and the reply are written together when the turn ends
+        with history.turn():
+            history.add_user_message(input_text)
+            graph, input_state, config = prepare_turn(input_text, history, [trace.handler])
+
+            parts = []
+            current_message_id = None
+            try:
+                # subgraphs=True is needed to receive tokens from inside the ReAct agents
+                for _, (chunk, metadata) in graph.stream(input_state, config=config, stream_mode="messages", subgraphs=True):
+                    text = stream_text(chunk, metadata)
+                    if text is None:
+                        continue
+                    if chunk.id != current_message_id:
+                        # A new agent message started (e.g. after a handoff); keep it in its own paragraph
+                        if parts:
+                            parts.append("\n\n")
+                            yield "\n\n"
+                        current_message_id = chunk.id
+                    parts.append(text)
+                    yield text
+            except Exception as e:
+                trace.status = "error"
+                logging.exception("Error streaming supervisor")
+                yield f"❌ Unexpected error: {e}"
+                return
+            finally:
+                # Persist the streamed answer once, even if the consumer stopped early
+                if parts:
+                    history.add_ai_message("".join(parts))
+
+        if not parts:
+            trace.status = "empty"
+            yield "📡 No content returned."
+            return
+        fold_after_turn(history)
@@ -0,0 +1,176 @@
+# checkpointing.py
+import os
+import asyncio
+import logging
+import threading
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage, RemoveMessage
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+from conversation_context import CONTEXT_TOKEN_BUDGET, build_context, abuild_context, count_tokens, message_tokens
+
+# Load environment variables
+load_dotenv()
+
+# "none" rebuilds each turn's state from chat_history; "postgres" (production) and
+# "sqlite" (local) keep the supervisor graph's state per session in a LangGraph
+# checkpointer, so tool calls and handoffs survive and interrupted runs can resume
+CHECKPOINTER = os.getenv("CHECKPOINTER", "none").lower()
+CHECKPOINT_SQLITE_PATH = os.getenv("CHECKPOINT_SQLITE_PATH", "checkpoints.sqlite")
+CHECKPOINT_POOL_MAX = int(os.getenv("CHECKPOINT_POOL_MAX", "5"))
+
+_savers = {}       # "sync" / "async" -> checkpointer
+_graphs = {}       # (id of the supervisor graph, "sync" / "async") -> graph compiled with it
+_lock = threading.Lock()
+_async_lock = None
+
+
+def checkpointing_enabled():
+    return CHECKPOINTER in ("postgres", "sqlite")
+
+
+# --- Checkpointers ---
+
+def _open_saver():
+    if CHECKPOINTER == "postgres":
+        from psycopg.rows import dict_row
+        from psycopg_pool import ConnectionPool
+        from langgraph.checkpoint.postgres import PostgresSaver
+        from db_pool import conninfo
+
+        # The saver needs autocommit and dict rows; prepared statements break behind PgBouncer
+        pool = ConnectionPool(
+            conninfo(), max_size=CHECKPOINT_POOL_MAX, open=True,
+            kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+        )
+        saver = PostgresSaver(pool)
+    else:
+        import sqlite3
+        from langgraph.checkpoint.sqlite import SqliteSaver
+
+        saver = SqliteSaver(sqlite3.connect(CHECKPOINT_SQLITE_PATH, check_same_thread=False))
+    saver.setup()
+    logging.info("Checkpointing conversation state in %s", CHECKPOINTER)
+    return saver
+
+
+async def _aopen_saver():
+    if CHECKPOINTER == "postgres":
+        from psycopg.rows import dict_row
+        from psycopg_pool import AsyncConnectionPool
+        from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+        from db_pool import conninfo
+
+        pool = AsyncConnectionPool(
+            conninfo(), max_size=CHECKPOINT_POOL_MAX, open=False,
+            kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+        )
+        await pool.open()
+        saver = AsyncPostgresSaver(pool)
+    else:
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        saver = AsyncSqliteSaver(await aiosqlite.connect(CHECKPOINT_SQLITE_PATH))
+    await saver.setup()
+    logging.info("Checkpointing conversation state in %s (async)", CHECKPOINTER)
+    return saver
+
+
+def get_checkpointer():
+    if "sync" not in _savers:
+        with _lock:
+            if "sync" not in _savers:
+                _savers["sync"] = _open_saver()
+    return _savers["sync"]
+
+
+async def aget_checkpointer():
+    global _async_lock
+    if "async" not in _savers:
+        if _async_lock is None:
+            _async_lock = asyncio.Lock()
+        async with _async_lock:
+            if "async" not in _savers:
+                _savers["async"] = await _aopen_saver()
+    return _savers["async"]
+
+
+async def aclose_checkpointer():
+    saver = _savers.pop("async", None)
+    for key in [k for k in _graphs if k[1] == "async"]:
+        del _graphs[key]
+    if saver is not None:
+        # The AsyncConnectionPool or aiosqlite connection behind it
+        await saver.conn.close()
+
+
+def checkpointed(graph, checkpointer, kind):
+    """The compiled supervisor graph with `checkpointer` attached; the ReAct subgraphs inherit it."""
+    key = (id(graph), kind)
+    if key not in _graphs:
+        # The supervisor is only rebuilt after agents.reset(); don't keep old copies alive
+        for stale in [k for k in _graphs if k[0] != key[0]]:
+            del _graphs[stale]
+        _graphs[key] = graph.copy(update={"checkpointer": checkpointer})
+    return _graphs[key]
+
+
+def thread_config(history):
+    # One LangGraph thread per chat session
+    return {"thread_id": history.session_id}
+
+
+# --- Turn input ---
+
+def _state_tokens(messages):
+    return sum(message_tokens(m) + count_tokens(getattr(m, "tool_calls", None) or "") for m in messages)
+
+
+def _plan(snapshot, input_text):
+    """"resume", "append" or "rebuild" for a turn on this thread."""
+    messages = snapshot.values.get("messages", []) if snapshot.values else []
+    if snapshot.next:
+        # The last run stopped part-way; if it was on this same question, finish it
+        humans = [m for m in messages if isinstance(m, HumanMessage)]
+        if humans and humans[-1].content == input_text:
+            return "resume"
+    if not messages:
+        # First checkpointed turn of the session, possibly one that started before checkpointing was on
+        return "rebuild"
+    if _state_tokens(messages) > CONTEXT_TOKEN_BUDGET:
+        return "rebuild"
+    return "append"
+
+
+def _input(plan, snapshot, input_text, context):
+    if plan == "resume":
+        # None continues from the last completed node instead of repeating its LLM and search calls
+        logging.info("Resuming interrupted run at %s", ", ".join(snapshot.next))
+        return None
+    if plan == "append":
+        return {"messages": [HumanMessage(content=input_text)]}
+    if snapshot.values.get("messages"):
+        # Past the budget: restart the thread from the rolling summary and the recent replies
+        return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES)] + context}
+    return {"messages": context}
+
+
+def turn_input(graph, config, input_text, history, callbacks=None):
+    """
+    Input for a checkpointed turn: just the new question, None to resume an
+    interrupted run, or the summary plus recent chat_history (as without a
+    checkpointer) when the thread is new or past CONTEXT_TOKEN_BUDGET.
+    `history` must already hold the question.
+    """
+    snapshot = graph.get_state(config)
+    plan = _plan(snapshot, input_text)
+    context = build_context(history, callbacks=callbacks) if plan == "rebuild" else None
+    return _input(plan, snapshot, input_text, context)
+
+
+async def aturn_input(graph, config, input_text, history, callbacks=None):
+    snapshot = await graph.aget_state(config)
+    plan = _plan(snapshot, input_text)
+    context = await abuild_context(history, callbacks=callbacks) if plan == "rebuild" else None
+    return _input(plan, snapshot, input_text, context)
@@ -0,0 +1,295 @@
+# conversation_context.py
+import os
+import asyncio
+import logging
+import threading
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from agents import get_agent
+from instrumentation import get_request_id, request_context
+
+# Load environment variables
+load_dotenv()
+
+# Prompt tokens the conversation (summary plus verbatim messages) may take per turn
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+# The latest messages always sent verbatim, even over budget (the new question
+# and the exchange before it, so follow-ups like "tell me more" keep working)
+CONTEXT_MIN_RECENT_MESSAGES = int(os.getenv("CONTEXT_MIN_RECENT_MESSAGES", "3"))
+# Most not-yet-summarized messages loaded per turn
+CONTEXT_FETCH_LIMIT = int(os.getenv("CONTEXT_FETCH_LIMIT", "20"))
+# Tokens left free for the next question when older messages are folded after a turn
+CONTEXT_NEXT_TURN_RESERVE = int(os.getenv("CONTEXT_NEXT_TURN_RESERVE", "200"))
+# Fold aged-out messages into the summary after the answer is sent, off the request path
+CONTEXT_SUMMARY_IN_BACKGROUND = os.getenv("CONTEXT_SUMMARY_IN_BACKGROUND", "true").lower() == "true"
+CONTEXT_SUMMARY_MODEL = os.getenv("CONTEXT_SUMMARY_MODEL", "gpt-4o-mini")
+CONTEXT_SUMMARY_MAX_WORDS = int(os.getenv("CONTEXT_SUMMARY_MAX_WORDS", "250"))
+CONTEXT_SUMMARY_WORKERS = int(os.getenv("CONTEXT_SUMMARY_WORKERS", "2"))
+TOKEN_ENCODING = os.getenv("CONTEXT_TOKEN_ENCODING", "o200k_base")
+
+# Rough per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Folds per turn; more than one only when the grown summary pushes out more messages
+MAX_FOLDS = 3
+
+SUMMARY_PROMPT = (
+    "You keep a running summary of a conversation between a student and an assistant about studying in Malaysia. "
+    "Update the current summary with the new messages. Keep what the student told about themselves "
+    "(nationality, level, field, budget, universities considered), the questions they asked and the key facts "
+    "in the answers (names, fees, deadlines, requirements). Drop greetings and repetition. "
+    f"Reply with the updated summary only, at most {CONTEXT_SUMMARY_MAX_WORDS} words of plain prose."
+)
+
+
+# --- Token counting ---
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as e:
+        # tiktoken missing, or its encoding file can't be downloaded (offline)
+        logging.warning("Token counting falls back to a character estimate: %s", e)
+        return None
+
+
+def count_tokens(text):
+    text = text if isinstance(text, str) else str(text)
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def message_tokens(message):
+    return count_tokens(message.content) + MESSAGE_OVERHEAD_TOKENS
+
+
+# --- Planning the prompt ---
+
+def summary_message(summary):
+    return SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")
+
+
+def plan_context(entries, summary, budget=CONTEXT_TOKEN_BUDGET, min_recent=CONTEXT_MIN_RECENT_MESSAGES):
+    """
+    Split the session's not-yet-summarized messages, [(created_at, message)]
+    oldest first, into (keep, overflow): the newest messages that fit the
+    budget next to the summary, and the older ones that have to be folded into
+    the summary first. Unwritten messages (created_at None) are always kept.
+    """
+    available = budget - (message_tokens(summary_message(summary)) if summary else 0)
+    used = 0
+    kept = 0
+    for created_at, message in reversed(entries):
+        cost = message_tokens(message)
+        if created_at is not None and kept >= min_recent and used + cost > available:
+            break
+        used += cost
+        kept += 1
+    split = len(entries) - kept
+    return entries[split:], entries[:split]
+
+
+def build_prompt(summary, keep):
+    """Messages for the graph: the summary (if any) followed by the verbatim tail."""
+    messages = [message for _, message in keep]
+    return [summary_message(summary)] + messages if summary else messages
+
+
+# --- Summarizing ---
+
+def build_summary_llm():
+    """Default factory for agents.get_agent("context_summarizer")."""
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=CONTEXT_SUMMARY_MODEL, temperature=0, stream_usage=True)
+
+
+def summary_request(summary, entries):
+    transcript = "\n".join(
+        f"{'Student' if isinstance(message, HumanMessage) else 'Assistant'}: {message.content}"
+        for _, message in entries
+    )
+    return [
+        SystemMessage(content=SUMMARY_PROMPT),
+        HumanMessage(content=f"Current summary:\n{summary or '(none yet)'}\n\nNew messages:\n{transcript}"),
+    ]
+
+
+def summary_config(callbacks=None):
+    # Named so its LLM time and tokens show up as "context_summary" in the traces
+    return {"run_name": "context_summary", "callbacks": callbacks or []}
+
+
+def summarize(summary, entries, callbacks=None):
+    """The summary updated with `entries`; only the new messages are sent, not the whole session."""
+    response = get_agent("context_summarizer").invoke(summary_request(summary, entries), config=summary_config(callbacks))
+    return response.content.strip()
+
+
+async def asummarize(summary, entries, callbacks=None):
+    response = await get_agent("context_summarizer").ainvoke(summary_request(summary, entries), config=summary_config(callbacks))
+    return response.content.strip()
+
+
+# --- Per-turn context ---
+
+def _fold(history, summary, until, overflow, callbacks=None):
+    new_summary = summarize(summary, overflow, callbacks)
+    new_until = overflow[-1][0]
+    if not history.save_summary(new_summary, new_until, until):
+        logging.info("Conversation summary was moved by another worker; using ours for this turn only")
+    return new_summary, new_until
+
+
+def _first_kept(keep):
+    # Everything stored before the oldest kept message gets summarized
+    return next((created_at for created_at, _ in keep if created_at is not None), None)
+
+
+def _fold_older(history, summary, until, keep, overflow, complete, callbacks=None):
+    """
+    Fold every unsummarized message older than `keep` into the summary. When
+    the fetched entries were all of them, that is `overflow`; otherwise they
+    are paged from the database oldest first, CONTEXT_FETCH_LIMIT at a time,
+    and the marker only moves past each page once it is summarized.
+    """
+    if complete:
+        return _fold(history, summary, until, overflow, callbacks)
+    before = _first_kept(keep)
+    while True:
+        page = history.unsummarized_page(until, before, CONTEXT_FETCH_LIMIT)
+        if not page:
+            return summary, until
+        summary, until = _fold(history, summary, until, page, callbacks)
+
+
+def build_context(history, callbacks=None):
+    """
+    Messages to send for this turn (after the question was added): the session
+    summary plus the newest messages that fit CONTEXT_TOKEN_BUDGET. Messages
+    that no longer fit and aren't summarized yet are folded in first; usually
+    fold_after_turn() already did that after the previous turn.
+    """
+    summary, until = history.summary_state()
+    keep, complete = history.unsummarized_entries(until, CONTEXT_FETCH_LIMIT)
+    for _ in range(MAX_FOLDS):
+        keep, overflow = plan_context(keep, summary)
+        if not overflow and complete:
+            break
+        summary, until = _fold_older(history, summary, until, keep, overflow, complete, callbacks)
+        complete = True
+    return build_prompt(summary, keep)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending_folds = set()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=CONTEXT_SUMMARY_WORKERS, thread_name_prefix="context-summary")
+    return _executor
+
+
+def _fold_ahead(history, request_id):
+    with request_context(request_id):
+        try:
+            summary, until = history.summary_state()
+            entries, complete = history.unsummarized_entries(until, CONTEXT_FETCH_LIMIT)
+            keep, overflow = plan_context(entries, summary, budget=CONTEXT_TOKEN_BUDGET - CONTEXT_NEXT_TURN_RESERVE)
+            if overflow or not complete:
+                _fold_older(history, summary, until, keep, overflow, complete)
+        except Exception:
+            logging.exception("Updating the conversation summary failed")
+
+
+def fold_after_turn(history):
+    """
+    Once a turn is written, fold the messages that won't fit the next turn
+    into the summary on a background thread, so the next request finds it ready.
+    `history` may be used by the next turn meanwhile; its cached state is locked.
+    """
+    if CONTEXT_SUMMARY_IN_BACKGROUND:
+        future = _get_executor().submit(_fold_ahead, history, get_request_id())
+        with _executor_lock:
+            _pending_folds.add(future)
+        future.add_done_callback(_discard_fold)
+
+
+def _discard_fold(future):
+    with _executor_lock:
+        _pending_folds.discard(future)
+
+
+def flush_summaries():
+    """Wait for the background summary updates submitted so far."""
+    with _executor_lock:
+        pending = list(_pending_folds)
+    futures.wait(pending)
+
+
+# --- asyncio versions ---
+
+async def _afold(history, summary, until, overflow, callbacks=None):
+    new_summary = await asummarize(summary, overflow, callbacks)
+    new_until = overflow[-1][0]
+    if not await history.save_summary(new_summary, new_until, until):
+        logging.info("Conversation summary was moved by another worker; using ours for this turn only")
+    return new_summary, new_until
+
+
+async def _afold_older(history, summary, until, keep, overflow, complete, callbacks=None):
+    if complete:
+        return await _afold(history, summary, until, overflow, callbacks)
+    before = _first_kept(keep)
+    while True:
+        page = await history.unsummarized_page(until, before, CONTEXT_FETCH_LIMIT)
+        if not page:
+            return summary, until
+        summary, until = await _afold(history, summary, until, page, callbacks)
+
+
+async def abuild_context(history, callbacks=None):
+    """Async version of build_context for async_chat's history."""
+    summary, until = await history.summary_state()
+    keep, complete = await history.unsummarized_entries(until, CONTEXT_FETCH_LIMIT)
+    for _ in range(MAX_FOLDS):
+        keep, overflow = plan_context(keep, summary)
+        if not overflow and complete:
+            break
+        summary, until = await _afold_older(history, summary, until, keep, overflow, complete, callbacks)
+        complete = True
+    return build_prompt(summary, keep)
+
+
+_fold_tasks = set()
+
+
+async def _afold_ahead(history):
+    try:
+        summary, until = await history.summary_state()
+        entries, complete = await history.unsummarized_entries(until, CONTEXT_FETCH_LIMIT)
+        keep, overflow = plan_context(entries, summary, budget=CONTEXT_TOKEN_BUDGET - CONTEXT_NEXT_TURN_RESERVE)
+        if overflow or not complete:
+            await _afold_older(history, summary, until, keep, overflow, complete)
+    except Exception:
+        logging.exception("Updating the conversation summary failed")
+
+
+def afold_after_turn(history):
+    """Async version of fold_after_turn: runs as a task on the current event loop."""
+    if CONTEXT_SUMMARY_IN_BACKGROUND:
+        task = asyncio.get_running_loop().create_task(_afold_ahead(history))
+        # Keep a reference until it finishes so the task isn't garbage collected
+        _fold_tasks.add(task)
+        task.add_done_callback(_fold_tasks.discard)
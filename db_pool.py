@@ -0,0 +1,265 @@
+# db_pool.py
+import os
+import time
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+import psycopg2
+
+# Load environment variables
+load_dotenv()
+
+POSTGRES_HOST = os.getenv("POSTGRES_HOST")
+POSTGRES_DB = os.getenv("POSTGRES_DB")
+POSTGRES_USER = os.getenv("POSTGRES_USER")
+POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
+POSTGRES_SSLMODE = os.getenv("POSTGRES_SSLMODE", "require")
+
+POOL_MIN_SIZE = int(os.getenv("POSTGRES_POOL_MIN", "1"))
+POOL_MAX_SIZE = int(os.getenv("POSTGRES_POOL_MAX", "10"))
+# Seconds a caller may wait for a free connection before giving up
+POOL_TIMEOUT = float(os.getenv("POSTGRES_POOL_TIMEOUT", "10"))
+# Idle connections older than this are pinged with SELECT 1 before reuse
+POOL_HEALTHCHECK_AFTER = float(os.getenv("POSTGRES_POOL_HEALTHCHECK_AFTER", "30"))
+# Connections are recycled after this many seconds (0 disables)
+POOL_MAX_LIFETIME = float(os.getenv("POSTGRES_POOL_MAX_LIFETIME", "1800"))
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became available within the pool timeout."""
+
+
+def connect():
+    return psycopg2.connect(
+        host=POSTGRES_HOST,
+        dbname=POSTGRES_DB,
+        user=POSTGRES_USER,
+        password=POSTGRES_PASSWORD,
+        sslmode=POSTGRES_SSLMODE
+    )
+
+
+def conninfo():
+    """The same connection settings as a libpq string, for psycopg 3 pools."""
+    from psycopg.conninfo import make_conninfo
+    return make_conninfo(
+        host=POSTGRES_HOST,
+        dbname=POSTGRES_DB,
+        user=POSTGRES_USER,
+        password=POSTGRES_PASSWORD,
+        sslmode=POSTGRES_SSLMODE,
+    )
+
+
+class ConnectionPool:
+    """
+    Thread-safe, blocking psycopg2 connection pool.
+
+    Unlike psycopg2.pool.ThreadedConnectionPool, callers wait (up to `timeout`)
+    for a free connection instead of failing when the pool is exhausted, idle
+    connections are health-checked before being handed out, and checkout
+    statistics are kept for monitoring.
+    """
+    def __init__(self, connect_fn=connect, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 timeout=POOL_TIMEOUT, healthcheck_after=POOL_HEALTHCHECK_AFTER,
+                 max_lifetime=POOL_MAX_LIFETIME):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+        self._connect = connect_fn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.healthcheck_after = healthcheck_after
+        self.max_lifetime = max_lifetime
+
+        self._cond = threading.Condition()
+        self._idle = []        # [(conn, created_at, returned_at)]
+        self._created = {}     # id(conn) -> created_at
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+
+        # Metrics
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+
+        for _ in range(min_size):
+            conn = self._new_connection()
+            self._idle.append((conn, self._created[id(conn)], time.monotonic()))
+
+    def _new_connection(self):
+        conn = self._connect()
+        self._created[id(conn)] = time.monotonic()
+        return conn
+
+    def _size(self):
+        return len(self._idle) + self._in_use
+
+    def _discard(self, conn):
+        self._created.pop(id(conn), None)
+        self._discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, created_at, returned_at):
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        if self.max_lifetime and now - created_at > self.max_lifetime:
+            return False
+        if now - returned_at < self.healthcheck_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        create = False
+        with self._cond:
+            if self._closed:
+                raise PoolTimeout("Connection pool is closed")
+            while True:
+                if self._idle:
+                    conn, created_at, returned_at = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._size() < self.max_size:
+                    # Reserve the slot; connect outside the lock
+                    self._in_use += 1
+                    conn, create = None, True
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"No connection available after {self.timeout:.1f}s "
+                        f"(max_size={self.max_size})"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+        try:
+            if create:
+                conn = self._new_connection()
+            elif not self._is_healthy(conn, created_at, returned_at):
+                with self._cond:
+                    self._discard(conn)
+                conn = self._new_connection()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        elapsed = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._checkout_time_total += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+        return conn
+
+    def putconn(self, conn, discard=False):
+        # Never hand a connection with an open or failed transaction to the next caller
+        if not discard and not conn.closed:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+            if discard or conn.closed or self._closed:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, self._created.get(id(conn), time.monotonic()), time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Check out a connection for the duration of the block. The transaction is
+        committed on success and rolled back on error; the connection always goes
+        back to the pool (or is discarded if it is broken).
+        """
+        conn = self.getconn()
+        discard = False
+        try:
+            yield conn
+            conn.commit()
+        except (psycopg2.InterfaceError, psycopg2.OperationalError):
+            # The connection itself is broken; don't put it back
+            discard = True
+            raise
+        except BaseException:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size(),
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "checkout_avg_ms": (self._checkout_time_total / self._checkouts * 1000) if self._checkouts else 0.0,
+                "checkout_max_ms": self._checkout_time_max * 1000,
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _, _ = self._idle.pop()
+                self._discard(conn)
+            self._cond.notify_all()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def pool_stats():
+    if _pool is None:
+        return {}
+    return _pool.stats()
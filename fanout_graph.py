@@ -0,0 +1,189 @@
+# fanout_graph.py
+import os
+import asyncio
+import logging
+import operator
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Annotated, Any
+from dotenv import load_dotenv
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import tool, InjectedToolCallId
+from langgraph.constants import TAG_NOSTREAM
+from langgraph.graph import StateGraph, START, END, MessagesState
+from langgraph.prebuilt import InjectedState
+from langgraph.types import Command, Send
+
+from router import make_router, refuse
+
+# Load environment variables
+load_dotenv()
+
+# Seconds each parallel branch may run before the answer is synthesized without it
+BRANCH_TIMEOUT = float(os.getenv("FANOUT_BRANCH_TIMEOUT", "45"))
+
+BRANCH_LABELS = {"sql_agent": "Database", "internet_agent": "Web"}
+
+SYNTHESIS_PROMPT = (
+    "You are Malaysia's study-abroad assistant. Two research agents answered the student's question in parallel: "
+    "one from our curated university database, one from a live web search. Merge them into a single, well-structured "
+    "answer. Prefer database facts (names, fees, programs, scholarships) and use the web answer for up-to-date details "
+    "(deadlines, visa rules). Keep every source URL from the web answer, don't invent facts, and end with helpful tips "
+    "for international students and a follow-up question."
+)
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("FANOUT_MAX_WORKERS", "16")), thread_name_prefix="fanout")
+
+
+class FanOutState(MessagesState):
+    # Answers from branches that ran in parallel, keyed by agent name
+    branch_answers: Annotated[dict, operator.or_]
+
+
+@tool("transfer_to_sql_and_internet_agents")
+def assign_to_sql_and_internet(
+    state: Annotated[Any, InjectedState],
+    tool_call_id: Annotated[str, InjectedToolCallId],
+) -> Command:
+    """Ask the SQL database agent and the internet research agent at the same time, then merge their answers.
+    Use this when the question needs both our university/scholarship database and current web information."""
+    tool_message = ToolMessage(
+        content="Successfully transferred to sql_agent and internet_agent",
+        name="transfer_to_sql_and_internet_agents",
+        tool_call_id=tool_call_id,
+    )
+    messages = [*state["messages"], tool_message]
+    return Command(
+        graph=Command.PARENT,
+        update={"messages": [tool_message]},
+        goto=[
+            Send("sql_agent", {"messages": messages, "parallel": True}),
+            Send("internet_agent", {"messages": messages, "parallel": True}),
+        ],
+    )
+
+
+def _branch_input(state):
+    return {"messages": state["messages"]}
+
+
+def _answer_of(result):
+    for msg in reversed(result.get("messages", [])):
+        if isinstance(msg, AIMessage) and msg.content:
+            return msg.content
+    return ""
+
+
+def _timed_out(name):
+    # A missing answer is dropped by the synthesize node
+    logging.warning("Fan-out branch %s timed out after %gs", name, BRANCH_TIMEOUT)
+    return ""
+
+
+def make_branch(name, agent):
+    """
+    Graph node for an agent that can run alone (after a normal handoff) or as
+    one of several parallel branches (after a Send from the fan-out tool).
+
+    Alone, it behaves like the plain agent node and ends the graph. In parallel,
+    its tokens are not streamed, it is bounded by BRANCH_TIMEOUT, and its answer
+    is handed to the synthesize node.
+    """
+    def run(state, config):
+        if not state.get("parallel"):
+            result = agent.invoke(_branch_input(state), config=config)
+            return Command(goto=END, update={"messages": result["messages"][len(state["messages"]):]})
+
+        branch_config = {**config, "tags": [*config.get("tags", []), TAG_NOSTREAM]}
+        ctx = contextvars.copy_context()
+        future = _executor.submit(ctx.run, agent.invoke, _branch_input(state), branch_config)
+        try:
+            answer = _answer_of(future.result(timeout=BRANCH_TIMEOUT))
+        except FutureTimeout:
+            # The worker thread can't be interrupted; its result is simply discarded
+            answer = _timed_out(name)
+        except Exception:
+            logging.exception("Fan-out branch %s failed", name)
+            answer = ""
+        return Command(goto="synthesize", update={"branch_answers": {name: answer}})
+
+    async def arun(state, config):
+        if not state.get("parallel"):
+            result = await agent.ainvoke(_branch_input(state), config=config)
+            return Command(goto=END, update={"messages": result["messages"][len(state["messages"]):]})
+
+        branch_config = {**config, "tags": [*config.get("tags", []), TAG_NOSTREAM]}
+        try:
+            result = await asyncio.wait_for(agent.ainvoke(_branch_input(state), config=branch_config), BRANCH_TIMEOUT)
+            answer = _answer_of(result)
+        except asyncio.TimeoutError:
+            answer = _timed_out(name)
+        except Exception:
+            logging.exception("Fan-out branch %s failed", name)
+            answer = ""
+        return Command(goto="synthesize", update={"branch_answers": {name: answer}})
+
+    return RunnableLambda(run, afunc=arun, name=name)
+
+
+def _synthesis_messages(state):
+    question = next(
+        (msg.content for msg in reversed(state["messages"]) if isinstance(msg, HumanMessage)), ""
+    )
+    sections = "\n\n".join(
+        f"## {BRANCH_LABELS.get(name, name)} answer\n{answer}"
+        for name, answer in sorted(state["branch_answers"].items()) if answer
+    )
+    return [
+        SystemMessage(content=SYNTHESIS_PROMPT),
+        HumanMessage(content=f"Student question: {question}\n\n{sections}"),
+    ]
+
+
+def make_synthesizer(llm):
+    """Merge parallel branch answers; skip the LLM when only one branch produced an answer."""
+    def usable(state):
+        return {n: a for n, a in state.get("branch_answers", {}).items() if a}
+
+    def run(state, config):
+        answers = usable(state)
+        if len(answers) <= 1:
+            content = next(iter(answers.values()), "📡 No content returned.")
+            return {"messages": [AIMessage(content=content, name="synthesize")]}
+        # Keep the LLM's message (and its id) so streamed tokens aren't emitted twice
+        response = llm.invoke(_synthesis_messages(state), config=config)
+        response.name = "synthesize"
+        return {"messages": [response]}
+
+    async def arun(state, config):
+        answers = usable(state)
+        if len(answers) <= 1:
+            content = next(iter(answers.values()), "📡 No content returned.")
+            return {"messages": [AIMessage(content=content, name="synthesize")]}
+        response = await llm.ainvoke(_synthesis_messages(state), config=config)
+        response.name = "synthesize"
+        return {"messages": [response]}
+
+    return RunnableLambda(run, afunc=arun, name="synthesize")
+
+
+def build_fanout_graph(supervisor_agent, sql_agent, internet_agent, synthesis_llm):
+    """
+    supervisor -> sql_agent | internet_agent (one of them, or both in parallel) -> synthesize.
+    `supervisor_agent` must carry the assign_to_sql_and_internet tool to fan out.
+    The pre-router can skip the supervisor and start at one agent or the refusal.
+    """
+    return (
+        StateGraph(FanOutState)
+        .add_node("supervisor", supervisor_agent, destinations=("sql_agent", "internet_agent"))
+        .add_node("sql_agent", make_branch("sql_agent", sql_agent), destinations=("synthesize", END))
+        .add_node("internet_agent", make_branch("internet_agent", internet_agent), destinations=("synthesize", END))
+        .add_node("synthesize", make_synthesizer(synthesis_llm))
+        .add_node("refuse", refuse)
+        .add_conditional_edges(START, make_router(["supervisor", "sql_agent", "internet_agent", "refuse"]))
+        .add_edge("synthesize", END)
+        .add_edge("refuse", END)
+        .compile()
+    )
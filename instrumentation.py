@@ -0,0 +1,357 @@
+# instrumentation.py
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+
+from metrics import Counter, Histogram, register_collector
+from db_pool import pool_stats
+
+# Load environment variables
+load_dotenv()
+
+# One JSON line per chat turn on the "trace" logger
+TRACE_LOG_ENABLED = os.getenv("TRACE_LOG_ENABLED", "true").lower() == "true"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s")
+
+trace_logger = logging.getLogger("trace")
+
+_request_id = ContextVar("request_id", default=None)
+_current_trace = ContextVar("turn_trace", default=None)
+
+
+# --- Metrics ---
+
+TURNS = Counter("chat_turns_total", "Chat turns handled, by kind (run/stream) and outcome", ["kind", "status"])
+TURN_SECONDS = Histogram("chat_turn_duration_seconds", "Wall time of a chat turn", ["kind"])
+NODE_SECONDS = Histogram("graph_node_duration_seconds", "Wall time per graph node, nested nodes as agent/node", ["node"])
+LLM_SECONDS = Histogram("llm_call_duration_seconds", "Wall time per LLM call, by calling node", ["node"])
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens, by calling node and type (prompt/completion)", ["node", "type"])
+TOOL_SECONDS = Histogram("tool_call_duration_seconds", "Wall time per tool call", ["tool", "status"])
+REACT_ITERATIONS = Histogram(
+    "react_iterations", "LLM steps a ReAct agent took in one turn", ["agent"], buckets=(1, 2, 3, 4, 5, 6, 8, 10),
+)
+DB_SECONDS = Histogram(
+    "chat_history_query_duration_seconds", "Wall time of chat history database operations", ["op"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+
+def _pool_metrics():
+    stats = pool_stats()
+    if not stats:
+        return []
+    return [
+        ("db_pool_connections", "Connections in the chat history pool", "gauge", {"state": "idle"}, stats["idle"]),
+        ("db_pool_connections", "Connections in the chat history pool", "gauge", {"state": "in_use"}, stats["in_use"]),
+        ("db_pool_waiting", "Threads waiting for a pooled connection", "gauge", None, stats["waiting"]),
+        ("db_pool_timeouts_total", "Checkouts that gave up waiting for a connection", "counter", None, stats["timeouts"]),
+    ]
+
+
+register_collector(_pool_metrics)
+
+
+# --- Request IDs and logging ---
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+def set_request_id(request_id=None):
+    """Set the request ID for the current context; returns a token for reset_request_id()."""
+    return _request_id.set(request_id or new_request_id())
+
+
+def reset_request_id(token):
+    _reset(_request_id, token)
+
+
+def _reset(var, token):
+    try:
+        var.reset(token)
+    except ValueError:
+        # Reset from another context (e.g. a generator closed by the GC); nothing to undo there
+        pass
+
+
+@contextmanager
+def request_context(request_id=None):
+    """Run a block under `request_id` (a new one if not given)."""
+    token = set_request_id(request_id)
+    try:
+        yield _request_id.get()
+    finally:
+        _reset(_request_id, token)
+
+
+_base_record_factory = logging.getLogRecordFactory()
+
+
+def _record_factory(*args, **kwargs):
+    record = _base_record_factory(*args, **kwargs)
+    record.request_id = _request_id.get() or "-"
+    return record
+
+
+def configure_logging(level=logging.INFO):
+    """Add the request ID to every log record and show the per-turn trace lines."""
+    if logging.getLogRecordFactory() is not _record_factory:
+        logging.setLogRecordFactory(_record_factory)
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=level, format=LOG_FORMAT)
+    if TRACE_LOG_ENABLED:
+        trace_logger.setLevel(logging.INFO)
+
+
+# --- Per-turn traces ---
+
+def node_path(metadata):
+    """'internet_agent/agent' for the agent node inside the internet_agent subgraph."""
+    namespace = (metadata or {}).get("langgraph_checkpoint_ns", "")
+    return "/".join(part.split(":")[0] for part in namespace.split("|") if part)
+
+
+def _token_usage(response):
+    """(prompt, completion) tokens reported for an LLM call, or (0, 0)."""
+    prompt = completion = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt += usage.get("input_tokens", 0)
+                completion += usage.get("output_tokens", 0)
+    if not prompt and not completion:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt = usage.get("prompt_tokens", 0)
+        completion = usage.get("completion_tokens", 0)
+    return prompt, completion
+
+
+class TurnTrace:
+    """Timings and counters collected for one chat turn."""
+    def __init__(self, kind, request_id):
+        self.kind = kind
+        self.request_id = request_id
+        self.status = "ok"
+        self.started = time.perf_counter()
+        self.duration = None
+        self.nodes = {}        # node path -> {"count", "ms"}
+        self.tools = {}        # tool -> {"count", "errors", "ms"}
+        self.llm = {}          # node path -> {"count", "ms", "prompt_tokens", "completion_tokens"}
+        self.iterations = {}   # agent -> LLM steps
+        self.db = {}           # op -> {"count", "ms"}
+        self.search = {"count": 0, "raw_tokens": 0, "sent_tokens": 0}
+        self.route = None      # the pre-router's decision, if it ran
+        self._lock = threading.Lock()
+        self.handler = InstrumentationHandler(self)
+
+    @staticmethod
+    def _add(table, key, seconds, **counts):
+        entry = table.setdefault(key, {"count": 0, "ms": 0.0})
+        entry["count"] += 1
+        entry["ms"] += seconds * 1000
+        for name, value in counts.items():
+            entry[name] = entry.get(name, 0) + value
+
+    def record_node(self, path, seconds):
+        NODE_SECONDS.observe(seconds, node=path)
+        with self._lock:
+            self._add(self.nodes, path, seconds)
+            # Every "agent" step inside a ReAct subgraph is one reasoning iteration
+            agent, _, leaf = path.rpartition("/")
+            if agent and leaf == "agent":
+                self.iterations[agent] = self.iterations.get(agent, 0) + 1
+
+    def record_llm(self, path, seconds, prompt_tokens, completion_tokens):
+        LLM_SECONDS.observe(seconds, node=path)
+        if prompt_tokens:
+            LLM_TOKENS.inc(prompt_tokens, node=path, type="prompt")
+        if completion_tokens:
+            LLM_TOKENS.inc(completion_tokens, node=path, type="completion")
+        with self._lock:
+            self._add(self.llm, path, seconds, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def record_tool(self, name, seconds, error=False):
+        TOOL_SECONDS.observe(seconds, tool=name, status="error" if error else "ok")
+        with self._lock:
+            self._add(self.tools, name, seconds, errors=int(error))
+
+    def record_db(self, op, seconds):
+        with self._lock:
+            self._add(self.db, op, seconds)
+
+    def record_route(self, route, label, probability, reason):
+        with self._lock:
+            self.route = {"route": route, "label": label, "probability": round(probability, 4), "reason": reason}
+
+    def record_search(self, raw_tokens, sent_tokens):
+        with self._lock:
+            self.search["count"] += 1
+            self.search["raw_tokens"] += raw_tokens
+            self.search["sent_tokens"] += sent_tokens
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+        TURNS.inc(kind=self.kind, status=self.status)
+        TURN_SECONDS.observe(self.duration, kind=self.kind)
+        for agent, steps in self.iterations.items():
+            REACT_ITERATIONS.observe(steps, agent=agent)
+
+    def to_dict(self):
+        def rounded(table):
+            return {k: {**v, "ms": round(v["ms"], 2)} for k, v in table.items()}
+
+        with self._lock:
+            return {
+                "event": "chat_turn",
+                "request_id": self.request_id,
+                "kind": self.kind,
+                "status": self.status,
+                "duration_ms": round((self.duration or 0) * 1000, 2),
+                "nodes": rounded(self.nodes),
+                "llm": rounded(self.llm),
+                "tokens": {
+                    "prompt": sum(v["prompt_tokens"] for v in self.llm.values()),
+                    "completion": sum(v["completion_tokens"] for v in self.llm.values()),
+                },
+                "react_iterations": dict(self.iterations),
+                "tools": rounded(self.tools),
+                "db": rounded(self.db),
+                "search": {**self.search, "saved_tokens": self.search["raw_tokens"] - self.search["sent_tokens"]},
+                "route": self.route,
+            }
+
+
+class InstrumentationHandler(BaseCallbackHandler):
+    """LangChain callback handler that feeds node, LLM and tool timings into a TurnTrace."""
+    # Cheap and thread-safe, so don't hop to an executor in async runs
+    run_inline = True
+
+    def __init__(self, trace):
+        self.trace = trace
+        self._started = {}   # run_id -> (kind, key, start)
+        self._node_runs = {}  # run_id -> node path, for every run named after its node
+
+    def _start(self, run_id, kind, key):
+        self._started[run_id] = (kind, key, time.perf_counter())
+
+    def _end(self, run_id, error=False, response=None):
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        kind, key, t0 = started
+        seconds = time.perf_counter() - t0
+        if kind == "node":
+            self.trace.record_node(key, seconds)
+        elif kind == "llm":
+            prompt, completion = _token_usage(response) if response is not None else (0, 0)
+            self.trace.record_llm(key, seconds, prompt, completion)
+        else:
+            self.trace.record_tool(key, seconds, error=error)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        # Only the node's own run, not the runnables it calls internally. A
+        # compiled subgraph (or a wrapper around one) used as a node shows up
+        # several times nested under the same name; time only the outermost.
+        if node and kwargs.get("name") == node:
+            path = node_path(metadata)
+            if self._node_runs.get(parent_run_id) != path:
+                self._start(run_id, "node", path)
+            self._node_runs[run_id] = path
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._node_runs.pop(run_id, None)
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._node_runs.pop(run_id, None)
+        self._end(run_id, error=True)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        # Calls outside the graph (e.g. the context summary) are keyed by run name
+        self._start(run_id, "llm", node_path(metadata) or kwargs.get("name") or "llm")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id, response=response)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=True)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, "tool", kwargs.get("name") or (serialized or {}).get("name", "tool"))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=True)
+
+
+@contextmanager
+def trace_turn(kind):
+    """
+    Collect a TurnTrace for the block: pass `trace.handler` in the graph's
+    callbacks and set `trace.status` for handled failures. On exit the turn is
+    recorded in the metrics and logged as one JSON line.
+    """
+    request_id = _request_id.get()
+    id_token = None if request_id else _request_id.set(new_request_id())
+    trace = TurnTrace(kind, _request_id.get())
+    trace_token = _current_trace.set(trace)
+    try:
+        yield trace
+    except (GeneratorExit, asyncio.CancelledError):
+        # A streaming consumer went away before the answer finished
+        trace.status = "cancelled"
+        raise
+    except BaseException:
+        trace.status = "error"
+        raise
+    finally:
+        trace.finish()
+        if TRACE_LOG_ENABLED:
+            trace_logger.info(json.dumps(trace.to_dict()))
+        _reset(_current_trace, trace_token)
+        if id_token is not None:
+            _reset(_request_id, id_token)
+
+
+@contextmanager
+def db_timer(op):
+    """Time a chat history database operation for the metrics and the current turn's trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        DB_SECONDS.observe(seconds, op=op)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.record_db(op, seconds)
+
+
+def record_search_tokens(raw_tokens, sent_tokens):
+    """Count one search's result tokens, before and after compaction, in the current turn's trace."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record_search(raw_tokens, sent_tokens)
+
+
+def record_route(route, label, probability, reason):
+    """Note the pre-router's decision in the current turn's trace."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record_route(route, label, probability, reason)
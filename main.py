@@ -1,15 +1,13 @@
 # main.py
 
+import os
 import random
+from contextlib import nullcontext
 import uuid
-import logging
 import streamlit as st
 from dotenv import load_dotenv
 
 from langchain_core.messages import HumanMessage
-from langgraph.graph import StateGraph, START, END, MessagesState
-from langgraph.prebuilt import create_react_agent
-from langchain_core.runnables.config import RunnableConfig
 
 # --- Configuration & Imports ---
 from qna_data import PREDEFINED_QAS
@@ -17,66 +15,61 @@ from qna_data import PREDEFINED_QAS
 # Load environment variables
 load_dotenv()
 
-# Import agents and chat history
-from tavily_agent import internet_agent_executor
-from langgraph_swarm import create_handoff_tool
-from chat_history import get_chat_history, get_user_chat_sessions
-
-# --- Agent and Graph Definitions ---
-
-# Define the handoff tool
-assign_to_internet = create_handoff_tool(agent_name="internet_agent")
-
-# Define the supervisor agent
-supervisor_agent = create_react_agent(
-    model="openai:gpt-4.1",
-    tools=[assign_to_internet],
-    prompt=(
-        "You are Malaysia's Supervisor AI Agent. Always begin with a friendly greeting."
-        "Only answer questions strictly related to studying in Malaysia, student life, or Malaysian culture in a study context."
-        "TOOL: Internet Research Agent: Conducts latest web-based searches to gather responses."
-    ),
-    name="supervisor",
-)
-
-# Define the LangGraph graph
-MAX_DEPTH = 10
-
-supervisor = (
-    StateGraph(MessagesState)
-    .add_node("supervisor", supervisor_agent)
-    .add_node("internet_agent", internet_agent_executor)
-    .add_edge(START, "supervisor")
-    .add_edge("internet_agent", END)
-    .compile()
-)
-
-
-# --- Core Functions ---
-
-# Function to run the supervisor agent and stream output
-def run_supervisor(input_text, history):
-    # This part of the code is already handling the history addition
-    # as identified in your previous request.
-    history.add_user_message(input_text)
-    messages = history.messages[-MAX_DEPTH:]
-    input_state = MessagesState(messages=messages)
-    config = RunnableConfig(recursion_limit=MAX_DEPTH)
-
-    try:
-        for output in supervisor.stream(input_state, config=config):
-            last_output = output
-    except Exception as e:
-        logging.exception("Error running supervisor")
-        return f"❌ Unexpected error: {e}"
-
-    for source in ["supervisor", "internet_agent"]:
-        if source in last_output:
-            for msg in reversed(last_output[source].get("messages", [])):
-                if hasattr(msg, "content") and msg.content:
-                    history.add_ai_message(msg.content)
-                    return msg.content
-    return "📡 No content returned."
+from admission import admit, AdmissionRejected
+
+# With CHAT_API_URL set, the chat API service (run_chat_api.sh) runs the agents and
+# owns history and caches, and this process only renders the UI
+CHAT_API_URL = os.getenv("CHAT_API_URL")
+if CHAT_API_URL:
+    from chat_client import stream_supervisor, get_chat_history, get_user_chat_sessions
+    answer_cache = None
+else:
+    # Import the chat service and chat history. Agents are built lazily on the
+    # first question, so the page renders without waiting for them.
+    from chat_service import stream_supervisor
+    from chat_history import get_chat_history, get_user_chat_sessions
+    from answer_cache import answer_cache
+
+# Messages rendered per page of a chat session; older ones are behind "Load older messages"
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "20"))
+# Seconds the sidebar's session list is reused across reruns (it's also cleared on every new message)
+SESSIONS_CACHE_TTL = int(os.getenv("SESSIONS_CACHE_TTL", "300"))
+
+
+# --- Cached data ---
+# The connection pool (db_pool.get_pool), the compiled agents (agents.get_agent) and
+# the chat API client are already built once per process; what a rerun would
+# otherwise redo is below.
+
+@st.cache_data(ttl=SESSIONS_CACHE_TTL, show_spinner=False)
+def cached_chat_sessions(user_id):
+    # Plain dicts: cache_data stores pickled copies
+    return [dict(row) for row in get_user_chat_sessions(user_id)]
+
+
+def active_history(user_id, session_id):
+    """
+    The active session's history object, kept across reruns in this browser
+    session. It caches the messages it has read and written, so a rerun that
+    adds nothing renders without querying the database.
+    """
+    cached = st.session_state.get("history")
+    if cached is None or cached[0] != session_id:
+        history, _, _ = get_chat_history(user_id, session_id)
+        st.session_state["history"] = cached = (session_id, history)
+        st.session_state["shown_messages"] = CHAT_PAGE_SIZE
+    return cached[1]
+
+
+def switch_session(session_id):
+    st.session_state["active_session"] = session_id
+    # Re-read the session from the database when it's opened
+    st.session_state.pop("history", None)
+
+
+def messages_written(user_id):
+    # A new message changes the session list (new session, title, order)
+    cached_chat_sessions.clear(user_id)
 
 
 # --- Streamlit UI and Session Management ---
@@ -155,19 +148,21 @@ else:
 # --- Sidebar UI ---
 
 st.sidebar.title("🔍 AI Super Search Malaysia")
+# Skip cached answers and search results, e.g. for deadlines that just changed
+refresh = st.sidebar.toggle("🔄 Fresh web results", key="fresh_search")
 st.sidebar.header("💬 Chat Sessions")
 # Use a key for the "New Chat" button to avoid a duplicate ID with other buttons
 if st.sidebar.button("➕ New Chat", key="new_chat_button"):
-    st.session_state["active_session"] = str(uuid.uuid4())
+    switch_session(str(uuid.uuid4()))
     st.rerun()
 
 # Fetch and display chat sessions from DB for this user
-chat_sessions = get_user_chat_sessions(USER_ID)
+chat_sessions = cached_chat_sessions(USER_ID)
 for chat in chat_sessions:
     chat_title = chat["title"] or "(No title)"
     # Use the unique session_id to create a unique key for each button
     if st.sidebar.button(chat_title, key=f"chat_button_{chat['session_id']}"):
-        st.session_state["active_session"] = chat["session_id"]
+        switch_session(chat["session_id"])
         st.rerun()
 
 
@@ -182,10 +177,19 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 
 # Get history for the current session
-history, user_id, session_id = get_chat_history(USER_ID, st.session_state["active_session"])
+session_id = st.session_state["active_session"]
+history = active_history(USER_ID, session_id)
+
+# Display the latest page(s) of the active session; one extra message tells whether there are older ones
+shown = st.session_state["shown_messages"]
+visible = history.recent_messages(shown + 1)
+if len(visible) > shown:
+    visible = visible[1:]
+    if st.button("⬆️ Load older messages", key="load_older"):
+        st.session_state["shown_messages"] = shown + CHAT_PAGE_SIZE
+        st.rerun()
 
-# Display chat history from the active session
-for msg in history.messages:
+for msg in visible:
     if isinstance(msg, HumanMessage):
         with st.chat_message("user"):
             st.markdown(msg.content)
@@ -221,19 +225,32 @@ if prompt or st.session_state.prompt_from_button:
     with st.chat_message("user"):
         st.markdown(final_prompt)
     
-    # Check if the prompt is one of the predefined questions
-    if final_prompt in PREDEFINED_QAS:
-        response = PREDEFINED_QAS[final_prompt]
-        # Add both messages to the history
-        history.add_user_message(final_prompt)
-        history.add_ai_message(response)
+    # Check if the prompt matches a predefined or previously answered question (the chat API does this itself)
+    cached = answer_cache.lookup(final_prompt) if answer_cache and not refresh else None
+    if cached:
+        response = cached[0]
+        # Add both messages to the history in one write
+        with history.turn():
+            history.add_user_message(final_prompt)
+            history.add_ai_message(response)
+        with st.chat_message("assistant"):
+            st.markdown(response)
+        messages_written(USER_ID)
     else:
-        # If not, use the supervisor agent for a new search
-        with st.spinner("Processing..."):
-            response = run_supervisor(final_prompt, history)
-    
-    # Display the response
-    with st.chat_message("assistant"):
-        st.markdown(response)
+        # Only a conversation's opening question is context-free enough to reuse its answer
+        is_opening_question = answer_cache is not None and not history.recent_messages(1)
+        # If not, use the supervisor agent for a new search and render tokens as they arrive
+        try:
+            # The chat API applies admission control itself and answers busy with AdmissionRejected
+            with nullcontext() if CHAT_API_URL else admit(USER_ID, st.context.ip_address):
+                with st.chat_message("assistant"):
+                    response = st.write_stream(stream_supervisor(final_prompt, history, refresh=refresh))
+        except AdmissionRejected as exc:
+            # Nothing was saved; keep the notice on screen instead of rerunning
+            st.warning(exc.message)
+            st.stop()
+        messages_written(USER_ID)
+        if is_opening_question and isinstance(response, str) and not response.startswith(("❌", "📡")):
+            answer_cache.put(final_prompt, response)
         
     st.rerun()
\ No newline at end of file
@@ -0,0 +1,314 @@
+# router.py
+import os
+import json
+import math
+import time
+import logging
+import threading
+from collections import Counter
+from functools import lru_cache
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, HumanMessage
+
+from answer_cache import STOPWORDS, normalize_question, _stem
+from instrumentation import get_request_id, record_route
+from metrics import Counter as MetricCounter
+
+# Load environment variables
+load_dotenv()
+
+# Route clear questions locally instead of asking the gpt-4.1 supervisor
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+# Probability the classifier needs before a question skips the supervisor
+ROUTER_CONFIDENCE = float(os.getenv("ROUTER_CONFIDENCE", "0.85"))
+# Refusals also need a question without any DOMAIN_WORDS, so they can do with less
+ROUTER_REFUSAL_CONFIDENCE = float(os.getenv("ROUTER_REFUSAL_CONFIDENCE", "0.7"))
+# One JSON line per routing decision, including the raw question, for auditing
+# accuracy. Off by default: it stores user questions and is never rotated. The
+# decision itself (without the question) is always in the turn's trace log line.
+ROUTER_AUDIT_PATH = os.getenv("ROUTER_AUDIT_PATH", "")
+# Extra labelled questions, one {"question": ..., "label": "internet" | "sql" | "off_topic"}
+# per line, e.g. reviewed lines from the audit log
+ROUTER_TRAINING_PATH = os.getenv("ROUTER_TRAINING_PATH", "")
+
+REFUSAL_MESSAGE = (
+    "Hello! I can only help with questions about studying in Malaysia, student life, "
+    "or Malaysian culture in a study context. Feel free to ask me about universities, "
+    "programs, scholarships, visas or living costs!"
+)
+
+# Classifier label -> graph node
+LABEL_ROUTES = {"internet": "internet_agent", "sql": "sql_agent", "off_topic": "refuse"}
+
+# Words that tie a question to Malaysia: the country, its places, and home-grown
+# institutions and exams. Only questions with one of these skip the supervisor,
+# which is what refuses questions about studying elsewhere. Branch campuses of
+# foreign universities (Monash, Nottingham, ...) are left out on purpose.
+MALAYSIA_WORDS = {_stem(w) for w in """
+    malaysia malaysian kuala lumpur kl klia penang johor selangor sabah sarawak putrajaya cyberjaya
+    melaka malacca perak ipoh kedah kelantan terengganu pahang perlis labuan subang petaling
+    universiti malaya ukm upm usm utm uitm iium sunway taylor apu ucsi
+    emgs muet spm stpm ringgit malay
+""".split()}
+
+# Words that put a question in scope; an off-topic refusal needs none of them
+DOMAIN_WORDS = MALAYSIA_WORDS | {_stem(w) for w in """
+    university universities uni college campus student students study studying intake semester
+    degree diploma foundation bachelor master masters phd postgraduate undergraduate
+    program programme programs course courses faculty admission admissions
+    scholarship scholarships tuition fee fees ranking rankings qs visa insurance
+    ielts toefl accommodation hostel dorm internship halal
+    monash nottingham heriot
+""".split()}
+
+# Other countries, cities and institutions students ask about; a question naming
+# one is left to the supervisor even when it also mentions Malaysia. Languages
+# (English, Chinese, ...) aren't listed: Malaysian universities teach in them
+FOREIGN_WORDS = {_stem(w) for w in """
+    uk britain british england scotland wales ireland london manchester
+    usa america american canada canadian australia australian melbourne sydney
+    new zealand singapore japan korea china hong kong taiwan
+    india pakistan bangladesh indonesia thailand vietnam philippines
+    germany france netherlands europe european
+    dubai uae turkey egypt
+    harvard oxford cambridge stanford mit yale princeton
+""".split()}
+
+# Seed examples, in the words students actually use; ROUTER_TRAINING_PATH adds more
+SEED_EXAMPLES = [
+    # Current or web-only information -> internet agent
+    ("How do I apply for a student visa to study in Malaysia?", "internet"),
+    ("What is the latest news about Malaysian student visas?", "internet"),
+    ("When is the next intake for engineering programs at UTM?", "internet"),
+    ("What is the cost of living for students in Kuala Lumpur?", "internet"),
+    ("Is it safe for international students to live in Penang?", "internet"),
+    ("What documents do I need for my EMGS visa application?", "internet"),
+    ("Can international students work part time in Malaysia?", "internet"),
+    ("What are the current application deadlines for Malaysian universities?", "internet"),
+    ("How much is rent near the Sunway campus these days?", "internet"),
+    ("What festivals do students celebrate in Malaysia?", "internet"),
+    ("What is student life like at Taylor's University?", "internet"),
+    ("How do I open a bank account as a student in Malaysia?", "internet"),
+    ("Which phone plan is best for students in Malaysia?", "internet"),
+    ("How do I get from KLIA to my university campus?", "internet"),
+    ("What should I pack before moving to Malaysia to study?", "internet"),
+    ("Are there internships for foreign students in Kuala Lumpur?", "internet"),
+    # Facts in our university database -> SQL agent
+    ("List universities in Malaysia that offer computer science", "sql"),
+    ("Which universities in Selangor offer a master's in data science?", "sql"),
+    ("What is the tuition fee for the MBA at Universiti Malaya?", "sql"),
+    ("Show the QS ranking of Malaysian universities", "sql"),
+    ("Which scholarships are available for a PhD in engineering?", "sql"),
+    ("Compare the tuition fees of Monash and Sunway for medicine", "sql"),
+    ("What are the admission requirements for a bachelor in nursing at UKM?", "sql"),
+    ("How many programs does UPM offer in agriculture?", "sql"),
+    ("Which universities accept IELTS 6.0 for a master's degree?", "sql"),
+    ("What is the minimum CGPA for the postgraduate program at USM?", "sql"),
+    ("Which private universities have the lowest fees for business?", "sql"),
+    ("Give me the insurance plans for international students", "sql"),
+    ("What is the duration of the diploma in accounting at UiTM?", "sql"),
+    ("Which universities are ranked in the top 200?", "sql"),
+    # Nothing to do with studying in Malaysia -> canned refusal
+    ("Write me a poem about the ocean", "off_topic"),
+    ("What is the capital of France?", "off_topic"),
+    ("Who won the football match yesterday?", "off_topic"),
+    ("Tell me a joke", "off_topic"),
+    ("How do I fix a Python import error?", "off_topic"),
+    ("What is the weather in New York tomorrow?", "off_topic"),
+    ("Give me a recipe for chocolate cake", "off_topic"),
+    ("Which stocks should I buy this week?", "off_topic"),
+    ("Translate this sentence into German", "off_topic"),
+    ("Who is the president of the United States?", "off_topic"),
+    ("Recommend a good movie to watch tonight", "off_topic"),
+    ("How many calories are in a banana?", "off_topic"),
+    ("Solve this equation for x: 2x + 3 = 7", "off_topic"),
+    ("What is the best smartphone to buy?", "off_topic"),
+    ("Write a short story about a dragon", "off_topic"),
+    ("Explain quantum physics in simple words", "off_topic"),
+    ("How do I lose weight fast?", "off_topic"),
+    ("What time is it in London?", "off_topic"),
+    ("Which laptop is best for gaming?", "off_topic"),
+    ("How do I cook pasta?", "off_topic"),
+    ("What is the capital of Australia?", "off_topic"),
+    ("Write a song about love", "off_topic"),
+]
+
+# Words that point back at the previous turn; such questions need the supervisor's context
+FOLLOW_UP_WORDS = {"it", "that", "this", "those", "these", "them", "they", "there", "more", "else", "also", "same", "again"}
+
+DECISIONS = MetricCounter("router_decisions_total", "Pre-router decisions, by route and reason", ["route", "reason"])
+
+_audit_lock = threading.Lock()
+
+
+def _words(text):
+    return [_stem(w) for w in normalize_question(text).split() if w not in STOPWORDS]
+
+
+# --- Classifier ---
+
+class NaiveBayesClassifier:
+    """Multinomial naive Bayes over stemmed words, with add-one smoothing."""
+    def __init__(self, examples):
+        self.word_counts = {}      # label -> Counter of words
+        self.label_counts = Counter()
+        for text, label in examples:
+            self.label_counts[label] += 1
+            self.word_counts.setdefault(label, Counter()).update(_words(text))
+        self.vocabulary = set().union(*self.word_counts.values()) if self.word_counts else set()
+        self.totals = {label: sum(counts.values()) for label, counts in self.word_counts.items()}
+
+    def predict(self, text):
+        """Probability per label; uniform when no word of `text` was seen in training."""
+        words = [w for w in _words(text) if w in self.vocabulary]
+        examples = sum(self.label_counts.values())
+        scores = {}
+        for label, counts in self.word_counts.items():
+            score = math.log(self.label_counts[label] / examples)
+            denominator = self.totals[label] + len(self.vocabulary)
+            for word in words:
+                score += math.log((counts[word] + 1) / denominator)
+            scores[label] = score
+        if not words:
+            return {label: 1 / len(scores) for label in scores}
+        top = max(scores.values())
+        exp = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exp.values())
+        return {label: value / total for label, value in exp.items()}
+
+
+def load_examples(path):
+    """Labelled (question, label) pairs from a JSONL file with question/label fields."""
+    examples = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                if row.get("label") in LABEL_ROUTES:
+                    examples.append((row["question"], row["label"]))
+    return examples
+
+
+@lru_cache(maxsize=1)
+def get_classifier():
+    examples = list(SEED_EXAMPLES)
+    if ROUTER_TRAINING_PATH:
+        try:
+            examples += load_examples(ROUTER_TRAINING_PATH)
+        except Exception:
+            logging.exception("Could not load router training examples from %s", ROUTER_TRAINING_PATH)
+    return NaiveBayesClassifier(examples)
+
+
+# --- Routing ---
+
+def decide(question, routes, follow_up=False, confidence=ROUTER_CONFIDENCE, refusal_confidence=ROUTER_REFUSAL_CONFIDENCE):
+    """
+    Pick a graph node for `question` among `routes` (which always include
+    "supervisor"). Returns (route, label, probability, reason); anything the
+    router isn't sure about goes to the supervisor.
+    """
+    words = _words(question)
+    if not words:
+        return "supervisor", None, 0.0, "empty"
+    if follow_up and (len(words) <= 3 or FOLLOW_UP_WORDS & set(normalize_question(question).split())):
+        return "supervisor", None, 0.0, "follow_up"
+
+    probabilities = get_classifier().predict(question)
+    in_scope = bool(DOMAIN_WORDS & set(words))
+    malaysian = bool(MALAYSIA_WORDS & set(words))
+    foreign = bool(FOREIGN_WORDS & set(words))
+    label = max(probabilities, key=probabilities.get)
+    probability = probabilities[label]
+
+    if label == "off_topic":
+        if not in_scope and probability >= refusal_confidence and "refuse" in routes:
+            return "refuse", label, probability, "off_topic"
+        return "supervisor", label, probability, "unsure"
+    if not in_scope:
+        return "supervisor", label, probability, "no_domain_words"
+    if foreign:
+        # The supervisor decides whether a question about studying elsewhere is refused
+        return "supervisor", label, probability, "foreign"
+    if not malaysian:
+        return "supervisor", label, probability, "no_malaysia_words"
+    if "sql_agent" not in routes:
+        # The internet agent answers every in-scope question in this graph
+        label = "internet"
+        probability = probabilities.get("internet", 0.0) + probabilities.get("sql", 0.0)
+    if probability >= confidence and LABEL_ROUTES[label] in routes:
+        return LABEL_ROUTES[label], label, probability, "confident"
+    return "supervisor", label, probability, "unsure"
+
+
+def _audit(record):
+    if not ROUTER_AUDIT_PATH:
+        return
+    try:
+        with _audit_lock, open(ROUTER_AUDIT_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError:
+        logging.exception("Could not write the router audit log")
+
+
+def make_router(routes):
+    """
+    Conditional-edge function for START: sends the latest question to one of
+    `routes` (graph node names) and records the decision.
+    """
+    routes = tuple(routes)
+
+    def route(state):
+        messages = state["messages"]
+        questions = [msg for msg in messages if isinstance(msg, HumanMessage)]
+        if not ROUTER_ENABLED or not questions:
+            return "supervisor"
+        question = questions[-1].content if isinstance(questions[-1].content, str) else str(questions[-1].content)
+        # Earlier turns in the prompt (messages or a summary) make short questions ambiguous
+        follow_up = len(messages) > 1
+        started = time.perf_counter()
+        target, label, probability, reason = decide(question, routes, follow_up=follow_up)
+        DECISIONS.inc(route=target, reason=reason)
+        record_route(target, label, probability, reason)
+        _audit({
+            "ts": time.time(),
+            "request_id": get_request_id(),
+            "question": question[:500],
+            "route": target,
+            "label": label,
+            "probability": round(probability, 4),
+            "reason": reason,
+            "ms": round((time.perf_counter() - started) * 1000, 3),
+        })
+        return target
+
+    return route
+
+
+def refuse(state):
+    """Graph node answering an off-topic question without an LLM call."""
+    return {"messages": [AIMessage(content=REFUSAL_MESSAGE, name="refuse")]}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pre-router accuracy against labelled questions")
+    parser.add_argument("labelled", help="JSONL with question and label (internet, sql or off_topic) fields")
+    parser.add_argument("--internet-only", action="store_true", help="route as the internet-only graph does")
+    args = parser.parse_args()
+
+    routes = ("supervisor", "internet_agent", "refuse") + (() if args.internet_only else ("sql_agent",))
+    confusion = Counter()
+    examples = load_examples(args.labelled)
+    for question, label in examples:
+        expected = LABEL_ROUTES[label]
+        if args.internet_only and expected == "sql_agent":
+            expected = "internet_agent"
+        confusion[(expected, decide(question, routes)[0])] += 1
+
+    routed = sum(n for (_, got), n in confusion.items() if got != "supervisor")
+    correct = sum(n for (expected, got), n in confusion.items() if expected == got)
+    print(f"{len(examples)} questions, {routed} routed locally, {correct} of those correct")
+    for (expected, got), n in sorted(confusion.items()):
+        print(f"  expected {expected:<15} got {got:<15} {n}")
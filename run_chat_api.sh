@@ -0,0 +1,13 @@
+#!/bin/bash
+# Headless chat API (agents, history, caches). Each worker has its own agent graph,
+# Postgres pools and caches; scale with CHAT_API_WORKERS independently of the UI.
+# Point the Streamlit UI at it with CHAT_API_URL=http://<host>:8001, and list the UI
+# hosts in FORWARDED_ALLOW_IPS so guests are rate-limited by the browser address they forward.
+# The UI vouches for the user, so the service only listens on localhost by default; to
+# serve a UI on another host set CHAT_API_HOST=0.0.0.0 and the same CHAT_API_KEY on both
+export AGENT_WARMUP=${AGENT_WARMUP:-true}
+if [ "${CHAT_API_HOST:-127.0.0.1}" != "127.0.0.1" ] && [ -z "$CHAT_API_KEY" ]; then
+    echo "CHAT_API_KEY must be set when CHAT_API_HOST is not 127.0.0.1" >&2
+    exit 1
+fi
+gunicorn chat_api:app --workers ${CHAT_API_WORKERS:-4} --worker-class uvicorn.workers.UvicornWorker --bind ${CHAT_API_HOST:-127.0.0.1}:${CHAT_API_PORT:-8001} --timeout 120
@@ -0,0 +1,166 @@
+# search_compaction.py
+import os
+import re
+import json
+import math
+import logging
+from dotenv import load_dotenv
+
+from answer_cache import STOPWORDS, normalize_question, _stem
+from conversation_context import count_tokens
+from instrumentation import record_search_tokens
+from metrics import Counter
+
+# Load environment variables
+load_dotenv()
+
+# Shrink Tavily results before they reach the internet agent: drop repeated
+# passages, keep the sentences that best match the query, and fit a token budget
+SEARCH_COMPACTION_ENABLED = os.getenv("SEARCH_COMPACTION_ENABLED", "true").lower() == "true"
+# Prompt tokens one search result (as the JSON the agent sees) may take
+SEARCH_RESULT_TOKEN_BUDGET = int(os.getenv("SEARCH_RESULT_TOKEN_BUDGET", "1200"))
+# Word overlap (Jaccard, 0-1) at which two sentences count as the same passage
+SEARCH_DEDUP_THRESHOLD = float(os.getenv("SEARCH_DEDUP_THRESHOLD", "0.8"))
+# Sentences considered per result; raw page content can run to hundreds
+SEARCH_MAX_SENTENCES_PER_RESULT = int(os.getenv("SEARCH_MAX_SENTENCES_PER_RESULT", "60"))
+
+SEARCH_TOKENS = Counter(
+    "search_result_tokens_total", "Tokens of Tavily results before and after compaction",
+    ["stage"],  # raw, sent
+)
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\s*\n+\s*")
+
+
+def split_sentences(text):
+    return [s.strip() for s in _SENTENCE_BREAK.split(text or "") if s and s.strip()]
+
+
+def _words(text):
+    return frozenset(_stem(w) for w in normalize_question(text).split() if w not in STOPWORDS)
+
+
+def _tool_tokens(result):
+    # What the ReAct agent's ToolNode puts in the ToolMessage
+    return count_tokens(json.dumps(result, ensure_ascii=False))
+
+
+class _Sentence:
+    __slots__ = ("result", "position", "text", "words", "tokens", "score")
+
+    def __init__(self, result, position, text, words):
+        self.result = result
+        self.position = position
+        self.text = text
+        self.words = words
+        self.tokens = 0
+        self.score = 0.0
+
+
+def _candidates(results, threshold):
+    """Every result's sentences in order, leaving out those that repeat an earlier one."""
+    kept = []
+    seen = set()
+    for index, item in enumerate(results):
+        # The snippet first; Tavily's snippet is usually the page's most relevant passage
+        text = "\n".join(part for part in (item.get("content"), item.get("raw_content")) if part)
+        for position, sentence in enumerate(split_sentences(text)[:SEARCH_MAX_SENTENCES_PER_RESULT]):
+            words = _words(sentence)
+            if not words or words in seen:
+                continue
+            if any(_similar(words, other.words, threshold) for other in kept):
+                continue
+            seen.add(words)
+            kept.append(_Sentence(index, position, sentence, words))
+    return kept
+
+
+def _similar(a, b, threshold):
+    # Jaccard can't reach the threshold when the sizes are too far apart
+    if min(len(a), len(b)) < threshold * max(len(a), len(b)):
+        return False
+    return len(a & b) >= threshold * len(a | b)
+
+
+def _score(sentences, query_words, results):
+    """IDF-weighted share of the query's words a sentence covers, nudged by Tavily's ranking."""
+    doc_freq = {}
+    for sentence in sentences:
+        for word in sentence.words & query_words:
+            doc_freq[word] = doc_freq.get(word, 0) + 1
+    total = len(sentences)
+    idf = {word: math.log(1 + total / doc_freq.get(word, 0.5)) for word in query_words}
+    query_weight = sum(idf.values()) or 1.0
+    for sentence in sentences:
+        coverage = sum(idf[w] for w in sentence.words & query_words) / query_weight
+        rank = results[sentence.result].get("score") or 1 / (sentence.result + 1)
+        lead = 0.1 if sentence.position == 0 else 0.0
+        sentence.score = coverage + 0.2 * float(rank) + lead
+
+
+def compact_results(result, query, budget=SEARCH_RESULT_TOKEN_BUDGET, threshold=SEARCH_DEDUP_THRESHOLD):
+    """
+    Tavily's response with each result cut to its most relevant, non-repeated
+    sentences (kept in page order) and only title, url and content left, so
+    the whole fits `budget` tokens. Results with nothing left are dropped;
+    the rest keep their URL for citations. Returns (result, raw tokens, sent tokens).
+    """
+    raw_tokens = _tool_tokens(result)
+    results = result.get("results") or []
+    compacted = {"query": result.get("query", query)}
+    if result.get("answer"):
+        compacted["answer"] = result["answer"]
+    used = _tool_tokens({**compacted, "results": []})
+
+    query_words = _words(query)
+    sentences = _candidates(results, threshold)
+    # Boilerplate and off-topic sentences share no words with the query; keep
+    # everything only when nothing does (e.g. results in another language)
+    sentences = [s for s in sentences if s.words & query_words] or sentences
+    _score(sentences, query_words, results)
+    chosen = {}
+    for sentence in sorted(sentences, key=lambda s: s.score, reverse=True):
+        sentence.tokens = count_tokens(sentence.text) + 1
+        cost = sentence.tokens
+        if sentence.result not in chosen:
+            # First sentence from this result also pays for its title and URL
+            item = results[sentence.result]
+            cost += _tool_tokens({"title": item.get("title", ""), "url": item.get("url", ""), "content": ""})
+        if used + cost > budget:
+            continue
+        used += cost
+        chosen.setdefault(sentence.result, []).append(sentence)
+
+    compacted["results"] = [
+        {
+            "title": results[index].get("title", ""),
+            "url": results[index].get("url", ""),
+            "content": " ".join(s.text for s in sorted(chosen[index], key=lambda s: s.position)),
+        }
+        for index in sorted(chosen)
+    ]
+    return compacted, raw_tokens, _tool_tokens(compacted)
+
+
+def compact_search_result(result, query):
+    """compact_results for CachedTavilySearch, counted in the metrics and the turn's trace."""
+    if not SEARCH_COMPACTION_ENABLED or not isinstance(result, dict) or "error" in result:
+        return result
+    if not isinstance(result.get("results"), list):
+        return result
+    try:
+        compacted, raw_tokens, sent_tokens = compact_results(result, query)
+    except Exception:
+        # The raw results still answer the question, just at a higher cost
+        logging.exception("Error compacting search results for %r", query)
+        return result
+    if sent_tokens >= raw_tokens:
+        compacted, sent_tokens = result, raw_tokens
+    SEARCH_TOKENS.inc(raw_tokens, stage="raw")
+    SEARCH_TOKENS.inc(sent_tokens, stage="sent")
+    record_search_tokens(raw_tokens, sent_tokens)
+    logging.info(
+        "Compacted search results for %r: %d -> %d tokens (%d saved)",
+        query, raw_tokens, sent_tokens, raw_tokens - sent_tokens,
+    )
+    return compacted
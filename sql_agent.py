@@ -1,14 +1,20 @@
 from langchain_openai import ChatOpenAI
 from langchain_community.utilities import SQLDatabase
 from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
+from langchain_community.tools.sql_database.tool import QuerySQLDatabaseTool
 from langgraph.prebuilt import create_react_agent
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
-from langchain_core.messages import ToolMessage
+from langchain_core.messages import ToolMessage, SystemMessage, HumanMessage
 from langgraph.graph import MessagesState
 from typing import Optional
 from langchain_core.runnables import RunnableConfig
+from sql_schema import SQL_TABLES, SchemaSnapshot
+from sql_validator import validate_query
+from sql_cache import get_sql_result_cache, SQL_CACHE_ENABLED
+from agents import get_agent
 
 # Load environment variables
 load_dotenv()
@@ -18,19 +24,90 @@ os.environ["LANGCHAIN_TRACING_V2"] = "true"
 openai_key = os.getenv("OPENAI_API_KEY")
 db_url = os.getenv("NEON_API_URL", "sqlite:///example.db")
 
-# Setup LLM
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+TOP_K = 5
+# Milliseconds a SQL agent query may run before Postgres cancels it
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", "15000"))
+
+
+# Setup LLM and SQL connection on first use. SQLDatabase checks the table list
+# against the live database, so none of this may run at import time.
+@lru_cache(maxsize=None)
+def get_llm():
+    return ChatOpenAI(model="gpt-4o-mini", temperature=0, stream_usage=True)
+
+
+@lru_cache(maxsize=None)
+def get_engine():
+    engine = create_engine(db_url)
+    # Every transaction on this engine is read-only and time-limited, whatever
+    # the query; validate_query is the first line of defence, not the only one
+    if engine.dialect.name == "postgresql":
+        @event.listens_for(engine, "begin")
+        def read_only(conn):
+            conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {SQL_STATEMENT_TIMEOUT_MS}")
+    elif engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def read_only(dbapi_conn, record):
+            dbapi_conn.execute("PRAGMA query_only = ON")
+    return engine
+
+
+@lru_cache(maxsize=None)
+def get_db():
+    # Tables are reflected on demand; the agent gets its schema from the snapshot
+    return SQLDatabase(get_engine(), include_tables=SQL_TABLES, lazy_table_reflection=True)
+
+
+@lru_cache(maxsize=None)
+def get_schema_snapshot():
+    return SchemaSnapshot(get_engine())
+
+
+class ValidatedQuerySQLDatabaseTool(QuerySQLDatabaseTool):
+    """
+    sql_db_query that checks the query locally before it reaches the database
+    and serves repeated queries from sql_result_cache.
+    """
+
+    description: str = """
+    Execute a read-only SQL SELECT query against the database and get back the result.
+    The query is validated first (SELECT only, known tables/columns, "countryID" = 14, LIMIT).
+    If an error is returned, rewrite the query and try again.
+    """
+
+    def _run(self, query, run_manager=None):
+        errors = validate_query(query, get_schema_snapshot().schema, top_k=TOP_K)
+        if errors:
+            return "Error: " + " ".join(errors)
+        if not SQL_CACHE_ENABLED:
+            return super()._run(query, run_manager=run_manager)
+
+        sql_result_cache = get_sql_result_cache()
+        key, tables = sql_result_cache.key(query)
+        if key is not None:
+            cached = sql_result_cache.get(key, tables)
+            if cached is not None:
+                return cached
+        result = super()._run(query, run_manager=run_manager)
+        # run_no_throw reports failures as "Error: ..." strings; don't cache those
+        if key is not None and isinstance(result, str) and not result.startswith("Error:"):
+            sql_result_cache.set(key, result)
+        return result
 
-# SQL Connection
-engine = create_engine(db_url)
-db = SQLDatabase.from_uri(
-    db_url,
-    include_tables=["Scholarships", "Universities", "VisaInfo", "Ranking", "Programs", "HealthInsurance","Eligibility","DocumentsRequired","Admissions"]
-)
 
 # SQL Tool Setup
-toolkit = SQLDatabaseToolkit(db=db, llm=llm)
-tools = toolkit.get_tools()
+# The query checker tool is replaced by local validation inside sql_db_query,
+# which saves an LLM call per query and actually enforces the read-only rules.
+def build_tools():
+    db = get_db()
+    toolkit = SQLDatabaseToolkit(db=db, llm=get_llm())
+    tools = [
+        tool for tool in toolkit.get_tools()
+        if tool.name not in ("sql_db_query", "sql_db_query_checker")
+    ]
+    tools.insert(0, ValidatedQuerySQLDatabaseTool(db=db))
+    return tools
 
 
 # Agent system prompt
@@ -39,10 +116,10 @@ You are Malaysia's SQL AI assistant. Your job is to answer user questions using
 
 GENERAL QUERY FLOW
 
-1. **Always** call `sql_table_list` first to get the list of tables. **Never skip this step.**
-2. **Then** call `info-sql` to get the schema for the relevant tables. **Never assume column names.**
+1. The schema of the relevant tables is given under DATABASE SCHEMA at the end of these instructions. Use it directly. **Never assume column names** that are not listed there.
+2. **Only if** a table you need is missing from DATABASE SCHEMA, call `sql_db_list_tables` and `sql_db_schema` to look it up.
 3. **Next**, generate a syntactically correct {dialect} SQL query based on the user's request, using the 'sql_db_query' tool.
-4. **Validate** your query using the `sql_db_query_checker` before execution.
+4. `sql_db_query` validates the query before running it. If it returns an error, fix the query and run it again.
 5. **Execute** the query and return accurate, detailed results in plain language. Include related columns for more comprehensive information.
 6. **If you cannot find enough data, signal the supervisor to use the Internet agent for additional information.**
 
@@ -65,14 +142,47 @@ SMART QUERYING TIPS
 - **Never assume column names.** For example, if the user asks about accommodation cost, you can't use avgFee as accommodation cost. If not found, say you couldn't find it and the supervisor can use the internet agent.
 - **Always** use descending order by the most relevant column to surface the most useful rows.
 
-""".format(dialect="postgresql", top_k=5)
+""".format(dialect="postgresql", top_k=TOP_K)
 
-sql_agent = create_react_agent(
-    llm,
-    tools=tools,
-    name="sql_agent",
-    prompt=system_message,
-)
+
+def sql_agent_prompt(state: MessagesState):
+    """System prompt plus the snapshot schema of the tables the latest question is about."""
+    question = next(
+        (msg.content for msg in reversed(state["messages"]) if isinstance(msg, HumanMessage)),
+        "",
+    )
+    schema_snapshot = get_schema_snapshot()
+    tables = schema_snapshot.relevant_tables(question if isinstance(question, str) else "")
+    schema = schema_snapshot.describe(tables)
+    content = system_message + "\n============================\nDATABASE SCHEMA\n============================\n" + schema
+    return [SystemMessage(content=content)] + state["messages"]
+
+
+# Use agents.get_agent("sql_agent") for the shared per-process instance
+def build_sql_agent():
+    return create_react_agent(
+        get_llm(),
+        tools=build_tools(),
+        name="sql_agent",
+        prompt=sql_agent_prompt,
+    )
+
+
+_LAZY_ATTRIBUTES = {
+    "sql_agent": lambda: get_agent("sql_agent"),
+    "llm": get_llm,
+    "engine": get_engine,
+    "db": get_db,
+    "schema_snapshot": get_schema_snapshot,
+    "tools": build_tools,
+}
+
+
+def __getattr__(name):
+    # Backwards compatible module attributes, built on first access
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def sql_agent_node(state: MessagesState, config: Optional[RunnableConfig] = None) -> ToolMessage:
@@ -88,6 +198,7 @@ def sql_agent_node(state: MessagesState, config: Optional[RunnableConfig] = None
         tool_call_id = "unknown"
 
     # Pass both state and config to invoke
+    sql_agent = get_agent("sql_agent")
     result_message = sql_agent.invoke(state, config=config) if config else sql_agent.invoke(state)
 
     # Use getattr to safely access content
@@ -0,0 +1,143 @@
+# sql_cache.py
+import os
+import sqlite3
+import hashlib
+import threading
+import sqlglot
+from sqlglot import exp
+from dotenv import load_dotenv
+
+from ttl_cache import TTLCache, CACHE_DB_PATH
+
+# Load environment variables
+load_dotenv()
+
+SQL_CACHE_TTL = float(os.getenv("SQL_CACHE_TTL", str(60 * 60)))
+SQL_CACHE_SIZE = int(os.getenv("SQL_CACHE_SIZE", "2048"))
+SQL_CACHE_ENABLED = os.getenv("SQL_CACHE_ENABLED", "true").lower() == "true"
+
+
+def normalize_sql(sql, dialect="postgres"):
+    """
+    Canonical text for a query plus the tables it reads. Formatting, keyword
+    case and unquoted identifier case don't change the result.
+    """
+    tree = sqlglot.parse_one(sql, read=dialect)
+    ctes = {cte.alias for cte in tree.find_all(exp.CTE)}
+    tables = sorted({t.name for t in tree.find_all(exp.Table)} - ctes)
+    return tree.sql(dialect=dialect, normalize=True), tables
+
+
+class SQLResultCache:
+    """
+    TTL/LRU cache of SQL agent query results, keyed on normalized SQL.
+
+    Each table has a generation number stored in the shared cache database;
+    invalidate() bumps it, so every worker on the host stops serving results
+    that read that table (stale entries then age out of the LRU).
+    """
+    def __init__(self, ttl=SQL_CACHE_TTL, max_entries=SQL_CACHE_SIZE, generations_path=CACHE_DB_PATH):
+        self.cache = TTLCache("sql", ttl=ttl, max_entries=max_entries)
+        self.generations_path = generations_path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.table_stats = {}   # table -> {"hits": n, "misses": n}
+
+        directory = os.path.dirname(generations_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._db() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS sql_cache_generations (tbl TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+            )
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.generations_path, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def _generations(self, tables):
+        names = list(tables) + ["*"]
+        rows = self._db().execute(
+            f"SELECT tbl, generation FROM sql_cache_generations WHERE tbl IN ({','.join('?' * len(names))})",
+            names,
+        ).fetchall()
+        found = dict(rows)
+        return [found.get(name, 0) for name in names]
+
+    def key(self, sql):
+        """Returns (cache key, tables read), or (None, []) if the SQL can't be parsed."""
+        try:
+            normalized, tables = normalize_sql(sql)
+        except sqlglot.errors.ParseError:
+            return None, []
+        generations = self._generations(tables)
+        digest = hashlib.sha256(f"{normalized}|{generations}".encode("utf-8")).hexdigest()
+        return digest, tables
+
+    def _count(self, tables, field):
+        with self._lock:
+            for table in tables:
+                stats = self.table_stats.setdefault(table, {"hits": 0, "misses": 0})
+                stats[field] += 1
+
+    def get(self, key, tables):
+        value = self.cache.get(key)
+        self._count(tables, "misses" if value is None else "hits")
+        return value
+
+    def set(self, key, value):
+        self.cache.set(key, value)
+
+    def invalidate(self, tables=None):
+        """Drop cached results for the given tables, or for everything when tables is None."""
+        names = list(tables) if tables else ["*"]
+        with self._db() as db:
+            db.executemany(
+                """
+                INSERT INTO sql_cache_generations (tbl, generation) VALUES (?, 1)
+                ON CONFLICT (tbl) DO UPDATE SET generation = generation + 1
+                """,
+                [(name,) for name in names],
+            )
+        if not tables:
+            self.cache.clear()
+
+    def stats(self):
+        with self._lock:
+            return {**self.cache.stats(), "tables": {t: dict(s) for t, s in self.table_stats.items()}}
+
+
+_sql_result_cache = None
+_sql_result_cache_lock = threading.Lock()
+
+
+def get_sql_result_cache():
+    """The process-wide SQL result cache, opened on first use."""
+    global _sql_result_cache
+    if _sql_result_cache is None:
+        with _sql_result_cache_lock:
+            if _sql_result_cache is None:
+                _sql_result_cache = SQLResultCache()
+    return _sql_result_cache
+
+
+def __getattr__(name):
+    # `from sql_cache import sql_result_cache` still works; the cache is opened on first access
+    if name == "sql_result_cache":
+        return get_sql_result_cache()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Invalidate cached SQL agent results after reloading reference data")
+    parser.add_argument("tables", nargs="*", help="tables that were reloaded (default: all)")
+    args = parser.parse_args()
+
+    get_sql_result_cache().invalidate(args.tables or None)
+    print(f"Invalidated cached results for {', '.join(args.tables) or 'all tables'}")
@@ -0,0 +1,214 @@
+# sql_schema.py
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from dotenv import load_dotenv
+from sqlalchemy import inspect, text
+
+from ttl_cache import CACHE_DIR
+
+# Load environment variables
+load_dotenv()
+
+SQL_TABLES = ["Scholarships", "Universities", "VisaInfo", "Ranking", "Programs", "HealthInsurance", "Eligibility", "DocumentsRequired", "Admissions"]
+
+SCHEMA_SNAPSHOT_PATH = os.getenv("SQL_SCHEMA_SNAPSHOT_PATH", os.path.join(CACHE_DIR, "sql_schema.json"))
+# Bump to force every worker to re-introspect, e.g. after a migration
+SCHEMA_VERSION = os.getenv("SQL_SCHEMA_VERSION", "1")
+# How often (seconds) a loaded snapshot is re-checked against the live schema fingerprint
+SCHEMA_CHECK_INTERVAL = float(os.getenv("SQL_SCHEMA_CHECK_INTERVAL", "3600"))
+
+# Words in a question that point at a table. Tables linked by foreign keys to a
+# matched table are included as well, so joins have the columns they need.
+TABLE_KEYWORDS = {
+    "Universities": ["universit", "college", "campus", "institution", "school"],
+    "Programs": ["program", "course", "degree", "major", "bachelor", "master", "phd", "diploma", "study"],
+    "Scholarships": ["scholarship", "funding", "grant", "bursar", "financial aid"],
+    "Ranking": ["rank", "top", "best"],
+    "VisaInfo": ["visa", "immigration", "student pass", "permit"],
+    "HealthInsurance": ["insurance", "health", "medical"],
+    "Eligibility": ["eligib", "requirement", "qualif", "criteria", "ielts", "toefl", "gpa"],
+    "DocumentsRequired": ["document", "transcript", "passport", "certificate"],
+    "Admissions": ["admission", "apply", "application", "intake", "deadline", "enrol", "enroll"],
+}
+
+
+def introspect(engine, tables=SQL_TABLES):
+    """Read columns, primary keys and foreign keys for the given tables."""
+    inspector = inspect(engine)
+    existing = set(inspector.get_table_names())
+    schema = {}
+    for table in tables:
+        if table not in existing:
+            continue
+        pk = inspector.get_pk_constraint(table).get("constrained_columns") or []
+        schema[table] = {
+            "columns": [
+                {"name": col["name"], "type": str(col["type"]), "nullable": bool(col.get("nullable", True))}
+                for col in inspector.get_columns(table)
+            ],
+            "primary_key": pk,
+            "foreign_keys": [
+                {
+                    "columns": fk["constrained_columns"],
+                    "table": fk["referred_table"],
+                    "referred": fk["referred_columns"],
+                }
+                for fk in inspector.get_foreign_keys(table)
+            ],
+        }
+    return schema
+
+
+def fingerprint(engine, tables=SQL_TABLES, schema=None):
+    """
+    Cheap hash of the live schema. On Postgres this is a single query against
+    information_schema; elsewhere it falls back to hashing a full introspection.
+    """
+    if engine.dialect.name == "postgresql":
+        query = text("""
+            SELECT md5(string_agg(
+                table_name || '.' || column_name || ':' || data_type || ':' || is_nullable,
+                ',' ORDER BY table_name, ordinal_position
+            ))
+            FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = ANY(:tables)
+        """)
+        with engine.connect() as conn:
+            return conn.execute(query, {"tables": list(tables)}).scalar() or ""
+    if schema is None:
+        schema = introspect(engine, tables)
+    return hashlib.md5(json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SchemaSnapshot:
+    """
+    Introspected schema for the whitelisted tables, persisted to a JSON file so
+    workers don't reflect the database on startup. The snapshot is rebuilt when
+    SQL_SCHEMA_VERSION changes or the live schema fingerprint no longer matches.
+    """
+    def __init__(self, engine, tables=SQL_TABLES, path=SCHEMA_SNAPSHOT_PATH,
+                 version=SCHEMA_VERSION, check_interval=SCHEMA_CHECK_INTERVAL):
+        self.engine = engine
+        self.tables = list(tables)
+        self.path = path
+        self.version = version
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._schema = None
+        self._fingerprint = None
+        self._checked_at = 0.0
+
+    def _load_file(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != self.version or data.get("tables") != self.tables:
+            return False
+        self._schema = data["schema"]
+        self._fingerprint = data["fingerprint"]
+        return True
+
+    def _save_file(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": self.version,
+                "tables": self.tables,
+                "fingerprint": self._fingerprint,
+                "created_at": time.time(),
+                "schema": self._schema,
+            }, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def refresh(self):
+        """Re-introspect the database and rewrite the snapshot file."""
+        with self._lock:
+            self._schema = introspect(self.engine, self.tables)
+            self._fingerprint = fingerprint(self.engine, self.tables, self._schema)
+            self._checked_at = time.monotonic()
+            self._save_file()
+            logging.info("SQL schema snapshot rebuilt (%d tables)", len(self._schema))
+            return self._schema
+
+    @property
+    def schema(self):
+        if self._schema is None:
+            with self._lock:
+                # A snapshot read from disk still gets one fingerprint check below
+                loaded = self._schema is not None or self._load_file()
+            if not loaded:
+                return self.refresh()
+        if self.check_interval and time.monotonic() - self._checked_at > self.check_interval:
+            self._checked_at = time.monotonic()
+            try:
+                current = fingerprint(self.engine, self.tables)
+            except Exception:
+                logging.exception("Could not fingerprint SQL schema; keeping snapshot")
+                return self._schema
+            if current != self._fingerprint:
+                logging.info("SQL schema changed; rebuilding snapshot")
+                return self.refresh()
+        return self._schema
+
+    def describe(self, tables=None):
+        """Compact, prompt-ready description of the given tables (all by default)."""
+        schema = self.schema
+        lines = []
+        for table in tables or self.tables:
+            info = schema.get(table)
+            if not info:
+                continue
+            columns = []
+            for col in info["columns"]:
+                flags = " PK" if col["name"] in info["primary_key"] else ""
+                columns.append(f'"{col["name"]}" {col["type"].lower()}{flags}')
+            lines.append(f'"{table}"(' + ", ".join(columns) + ")")
+            for fk in info["foreign_keys"]:
+                lines.append(
+                    f'  "{table}".' + ",".join(f'"{c}"' for c in fk["columns"])
+                    + f' -> "{fk["table"]}".' + ",".join(f'"{c}"' for c in fk["referred"])
+                )
+        return "\n".join(lines)
+
+    def relevant_tables(self, question):
+        """Tables a question is likely about, plus their foreign-key neighbours."""
+        schema = self.schema
+        question = (question or "").lower()
+        matched = [
+            table for table, words in TABLE_KEYWORDS.items()
+            if table in schema and any(re.search(r"\b" + re.escape(w), question) for w in words)
+        ]
+        if not matched:
+            return [t for t in self.tables if t in schema]
+
+        selected = set(matched)
+        for table in matched:
+            for fk in schema[table]["foreign_keys"]:
+                if fk["table"] in schema:
+                    selected.add(fk["table"])
+        return [t for t in self.tables if t in selected]
+
+
+if __name__ == "__main__":
+    import argparse
+    from sqlalchemy import create_engine
+
+    parser = argparse.ArgumentParser(description="SQL schema snapshot maintenance")
+    parser.add_argument("command", choices=["refresh", "show"])
+    args = parser.parse_args()
+
+    snapshot = SchemaSnapshot(create_engine(os.getenv("NEON_API_URL", "sqlite:///example.db")))
+    if args.command == "refresh":
+        snapshot.refresh()
+    print(snapshot.describe())
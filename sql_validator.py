@@ -0,0 +1,231 @@
+# sql_validator.py
+import os
+import sqlglot
+from sqlglot import exp
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+MALAYSIA_COUNTRY_ID = 14
+# Hard ceiling for LIMIT when the user explicitly asks for more than top_k rows
+SQL_MAX_LIMIT = int(os.getenv("SQL_MAX_LIMIT", "50"))
+
+# Anything that writes, changes schema or takes locks
+FORBIDDEN_NODES = tuple(
+    getattr(exp, name) for name in (
+        "Insert", "Update", "Delete", "Merge", "Create", "Drop", "Alter", "AlterTable",
+        "TruncateTable", "Command", "Into", "Lock", "Grant", "Copy", "Set", "Use",
+    )
+    if hasattr(exp, name)
+)
+
+# Functions a query may call. Anything else, such as pg_sleep, set_config,
+# pg_terminate_backend or lo_unlink, can have side effects or tie up the database
+SAFE_FUNCTIONS = (exp.AggFunc,) + tuple(
+    getattr(exp, name) for name in (
+        "Case", "If", "Cast", "TryCast", "Coalesce", "Nullif", "Greatest", "Least",
+        "Lower", "Upper", "Initcap", "Length", "Substring", "Trim", "Concat", "ConcatWs",
+        "Replace", "Left", "Right", "StrPosition", "SplitPart", "Pad",
+        "Abs", "Round", "Ceil", "Floor", "Extract", "CurrentDate", "CurrentTimestamp",
+        "DateTrunc", "TimestampTrunc", "TimeToStr", "StrToTime", "StrToDate",
+        "RowNumber", "Rank", "DenseRank", "PercentRank", "CumeDist", "Ntile", "Lag", "Lead",
+        "Array", "Exists", "JSONExtract", "JSONExtractScalar", "RegexpLike", "RegexpILike",
+    )
+    if hasattr(exp, name)
+)
+# Functions sqlglot doesn't model (exp.Anonymous) that are still safe
+SAFE_ANONYMOUS_FUNCTIONS = {
+    "age", "date_part", "to_char", "to_date", "to_number", "initcap", "btrim", "ltrim", "rtrim",
+    "char_length", "rank", "dense_rank", "ntile", "percentile_cont", "percentile_disc",
+}
+
+
+def _literal_int(node):
+    if isinstance(node, exp.Literal) and not node.is_string:
+        try:
+            return int(node.this)
+        except ValueError:
+            return None
+    return None
+
+
+def _country_filters(tree):
+    """Integer values compared with countryID anywhere in the query."""
+    values = []
+    for node in tree.find_all(exp.EQ, exp.In, exp.NEQ, exp.GT, exp.GTE, exp.LT, exp.LTE):
+        column = node.this if isinstance(node.this, exp.Column) else node.expression
+        if not isinstance(column, exp.Column) or column.name != "countryID":
+            continue
+        if isinstance(node, exp.EQ):
+            other = node.expression if column is node.this else node.this
+            values.append(_literal_int(other))
+        else:
+            values.append(None)
+    return values
+
+
+def _conjuncts(where):
+    """The top-level AND terms of a WHERE clause."""
+    terms = []
+    stack = [where.this] if where is not None else []
+    while stack:
+        node = stack.pop()
+        while isinstance(node, exp.Paren):
+            node = node.this
+        if isinstance(node, exp.And):
+            stack.extend((node.this, node.expression))
+        else:
+            terms.append(node)
+    return terms
+
+
+def _malaysia_filters(select):
+    """Qualifiers ("" if none) of `countryID = 14` terms ANDed into the SELECT's WHERE."""
+    qualifiers = set()
+    for term in _conjuncts(select.args.get("where")):
+        if not isinstance(term, exp.EQ):
+            continue
+        for column, other in ((term.this, term.expression), (term.expression, term.this)):
+            if isinstance(column, exp.Column) and column.name == "countryID" and _literal_int(other) == MALAYSIA_COUNTRY_ID:
+                qualifiers.add(column.table)
+    return qualifiers
+
+
+def _unfiltered_country_tables(tree, country_tables):
+    """
+    Tables with a countryID column that some SELECT (each UNION arm, CTE and
+    subquery on its own) reads without requiring countryID = 14 in its WHERE.
+    A filter under OR or NOT doesn't count.
+    """
+    missing = set()
+    for select in tree.find_all(exp.Select):
+        read = [
+            table for table in select.find_all(exp.Table)
+            if table.name in country_tables and table.parent_select is select
+        ]
+        if not read:
+            continue
+        filters = _malaysia_filters(select)
+        for table in read:
+            unqualified_ok = "" in filters and len(read) == 1
+            if not unqualified_ok and table.alias_or_name not in filters:
+                missing.add(table.name)
+    return missing
+
+
+def _unsafe_functions(tree):
+    names = []
+    for func in tree.find_all(exp.Func):
+        if isinstance(func, (exp.Binary, exp.Predicate)):
+            # Operators such as AND, OR and LIKE
+            continue
+        if isinstance(func, exp.Anonymous):
+            if func.name.lower() not in SAFE_ANONYMOUS_FUNCTIONS:
+                names.append(func.name)
+        elif not isinstance(func, SAFE_FUNCTIONS):
+            names.append(func.sql_name())
+    return names
+
+
+def _is_plain_aggregate(select):
+    """SELECT COUNT(*)/MAX(...)... without GROUP BY returns a single row."""
+    if not isinstance(select, exp.Select) or select.args.get("group"):
+        return False
+    return all(
+        isinstance(e.unalias(), exp.AggFunc) for e in select.expressions
+    )
+
+
+def validate_query(sql, schema, top_k=5, max_limit=SQL_MAX_LIMIT, dialect="postgres"):
+    """
+    Checks a generated query against the SQL agent's rules and returns a list
+    of error messages (empty when the query may run).
+
+    `schema` is the SchemaSnapshot mapping: {table: {"columns": [{"name": ...}, ...], ...}}.
+    """
+    try:
+        statements = [s for s in sqlglot.parse(sql, read=dialect) if s is not None]
+    except sqlglot.errors.ParseError as e:
+        return [f"Could not parse the query: {e}"]
+    if len(statements) != 1:
+        return ["Run exactly one SQL statement per call."]
+    tree = statements[0]
+
+    if not isinstance(tree, (exp.Select, exp.Union, exp.Intersect, exp.Except)):
+        return ["Only read-only SELECT queries are allowed."]
+    forbidden = next(iter(tree.find_all(*FORBIDDEN_NODES)), None) if FORBIDDEN_NODES else None
+    if forbidden is not None:
+        return [f"Only read-only SELECT queries are allowed (found {forbidden.key.upper()})."]
+    unsafe = _unsafe_functions(tree)
+    if unsafe:
+        return [f"Function {unsafe[0]}() is not allowed."]
+
+    errors = []
+    known = {name: {c["name"] for c in info["columns"]} for name, info in schema.items()}
+    by_lower = {name.lower(): name for name in known}
+    cte_names = {cte.alias for cte in tree.find_all(exp.CTE)}
+
+    # Resolve tables and their aliases
+    aliases = {}
+    used_tables = set()
+    for table in tree.find_all(exp.Table):
+        name = table.name
+        if name in cte_names:
+            continue
+        if name not in known:
+            if name.lower() in by_lower:
+                errors.append(f'Table names are case-sensitive; write "{by_lower[name.lower()]}" in double quotes.')
+            else:
+                errors.append(f'Unknown table {name!r}. Available tables: {", ".join(sorted(known))}.')
+            continue
+        if not table.this.args.get("quoted") and name != name.lower():
+            errors.append(f'Quote the table name as "{name}".')
+        used_tables.add(name)
+        aliases[table.alias_or_name] = name
+
+    # Derived tables and CTEs expose their own columns; don't check those
+    derived = cte_names | {sub.alias for sub in tree.find_all(exp.Subquery) if sub.alias}
+    output_aliases = {e.alias for e in tree.find_all(exp.Alias)}
+    used_columns = set().union(*(known[t] for t in used_tables)) if used_tables else set()
+
+    for column in tree.find_all(exp.Column):
+        if isinstance(column.this, exp.Star):
+            continue
+        name, qualifier = column.name, column.table
+        if not column.this.args.get("quoted") and name != name.lower():
+            errors.append(f'Quote the column name as "{name}".')
+            continue
+        if qualifier:
+            if qualifier in derived:
+                continue
+            table = aliases.get(qualifier)
+            if table is not None and name not in known[table]:
+                errors.append(f'Column "{name}" does not exist in "{table}".')
+        elif name not in used_columns and name not in output_aliases and not derived:
+            errors.append(f'Column "{name}" does not exist in {", ".join(sorted(used_tables)) or "the queried tables"}.')
+
+    # Malaysia-only rule
+    country_tables = {t for t in used_tables if "countryID" in known[t]}
+    if any(value != MALAYSIA_COUNTRY_ID for value in _country_filters(tree)):
+        errors.append(f'Only "countryID" = {MALAYSIA_COUNTRY_ID} (Malaysia) may be used.')
+    else:
+        unfiltered = _unfiltered_country_tables(tree, country_tables)
+        if unfiltered:
+            errors.append(
+                f'Filter {", ".join(sorted(unfiltered))} by "countryID" = {MALAYSIA_COUNTRY_ID}, ANDed into '
+                f'the WHERE clause of every SELECT that reads it (not under OR or NOT).'
+            )
+
+    # Row limit
+    limit = tree.args.get("limit")
+    if limit is None:
+        if not _is_plain_aggregate(tree):
+            errors.append(f"Add LIMIT {top_k} (or up to {max_limit} if the user asked for more rows).")
+    else:
+        value = _literal_int(limit.expression)
+        if value is None or value > max_limit:
+            errors.append(f"LIMIT must be a number no larger than {max_limit}.")
+
+    return list(dict.fromkeys(errors))
+
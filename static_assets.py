@@ -0,0 +1,227 @@
+# static_assets.py
+import os
+import re
+import gzip
+import hashlib
+import logging
+import mimetypes
+from dotenv import load_dotenv
+from starlette.responses import PlainTextResponse, Response
+
+try:
+    import brotli
+except ImportError:  # optional; without it only gzip (and prebuilt .br files) are served
+    brotli = None
+
+# Load environment variables
+load_dotenv()
+
+STATIC_GZIP_LEVEL = int(os.getenv("STATIC_GZIP_LEVEL", "9"))
+STATIC_BROTLI_QUALITY = int(os.getenv("STATIC_BROTLI_QUALITY", "11"))
+# Smaller files aren't worth compressing
+STATIC_COMPRESS_MIN_BYTES = int(os.getenv("STATIC_COMPRESS_MIN_BYTES", "1024"))
+
+# Content-hashed build output (e.g. static/js/main.8e973547.js) never changes under the same name
+HASHED_ASSET = re.compile(r"(^|/)static/.+\.[0-9a-f]{8,}\.(chunk\.)?(js|css)(\.map)?$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Everything else (index.html, manifest.json, ...) is revalidated with its ETag
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/manifest+json")
+# Preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# Source maps are JSON, and compress well
+mimetypes.add_type("application/json", ".map")
+
+
+class Asset:
+    __slots__ = ("path", "media_type", "cache_control", "variants")
+
+    def __init__(self, path, media_type, cache_control):
+        self.path = path
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.variants = {}   # encoding ("identity", "gzip", "br") -> (body, etag)
+
+
+def _etag(body, encoding):
+    digest = hashlib.sha256(body).hexdigest()[:20]
+    # Strong ETags must differ per representation
+    return f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+
+
+def _compressible(media_type):
+    return media_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(body, encoding):
+    if encoding == "gzip":
+        # mtime=0 keeps the output (and its ETag) identical across workers and restarts
+        return gzip.compress(body, compresslevel=STATIC_GZIP_LEVEL, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=STATIC_BROTLI_QUALITY)
+    return None
+
+
+def _accepted_encodings(header):
+    """Encodings the client accepts with q > 0, from an Accept-Encoding header."""
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name and q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def _route_path(scope):
+    # Inside a Mount the path still starts with the mount point, which is in root_path
+    path, root = scope["path"], scope.get("root_path", "")
+    return path[len(root):] if root and path.startswith(root) else path
+
+
+def _matches(if_none_match, etag):
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
+
+
+class StaticAssets:
+    """
+    ASGI app serving a frontend build directory from memory.
+
+    Every file is read once when the app is created, together with its
+    gzip/brotli variants: prebuilt .gz/.br files next to it (see
+    `python static_assets.py <dir>`) or compressed on load. Responses carry
+    a strong ETag per variant, answer If-None-Match with 304, and hashed
+    static/js and static/css files are cacheable for a year. Paths without a
+    file extension fall back to index.html so client-side routes work.
+    """
+    def __init__(self, directory, index="index.html", spa_fallback=True):
+        self.directory = os.path.abspath(directory)
+        self.index = index
+        self.spa_fallback = spa_fallback
+        self.assets = {}
+        self._load()
+
+    def _load(self):
+        total = compressed = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith((".gz", ".br")) and os.path.exists(os.path.join(root, name[:-3])):
+                    continue  # a prebuilt variant, picked up with its original below
+                full = os.path.join(root, name)
+                path = os.path.relpath(full, self.directory).replace(os.sep, "/")
+                asset = self._load_asset(full, path)
+                self.assets[path] = asset
+                total += len(asset.variants["identity"][0])
+                compressed += len(asset.variants) - 1
+        logging.info("Loaded %d static assets (%d KB, %d compressed variants) from %s",
+                     len(self.assets), total // 1024, compressed, self.directory)
+
+    def _load_asset(self, full, path):
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if media_type.startswith("text/") or media_type in ("application/javascript", "application/json"):
+            media_type += "; charset=utf-8"
+        cache_control = IMMUTABLE_CACHE_CONTROL if HASHED_ASSET.search(path) else REVALIDATE_CACHE_CONTROL
+        asset = Asset(path, media_type, cache_control)
+
+        with open(full, "rb") as f:
+            body = f.read()
+        asset.variants["identity"] = (body, _etag(body, "identity"))
+        if not _compressible(media_type) or len(body) < STATIC_COMPRESS_MIN_BYTES:
+            return asset
+
+        for encoding, suffix in ENCODINGS:
+            prebuilt = full + suffix
+            if os.path.exists(prebuilt) and os.path.getmtime(prebuilt) >= os.path.getmtime(full):
+                with open(prebuilt, "rb") as f:
+                    variant = f.read()
+            else:
+                variant = compress(body, encoding)
+            if variant is not None and len(variant) < len(body):
+                asset.variants[encoding] = (variant, _etag(variant, encoding))
+        return asset
+
+    def lookup(self, path):
+        path = path.lstrip("/")
+        if not path or path.endswith("/"):
+            path += self.index
+        asset = self.assets.get(path)
+        if asset is None and self.spa_fallback and "." not in path.rsplit("/", 1)[-1]:
+            asset = self.assets.get(self.index)
+        return asset
+
+    def response(self, asset, method, headers):
+        accepted = _accepted_encodings(headers.get("accept-encoding", ""))
+        encoding = next((e for e, _ in ENCODINGS if e in accepted and e in asset.variants), "identity")
+        body, etag = asset.variants[encoding]
+
+        response_headers = {"ETag": etag, "Cache-Control": asset.cache_control}
+        if len(asset.variants) > 1:
+            response_headers["Vary"] = "Accept-Encoding"
+        if encoding != "identity":
+            response_headers["Content-Encoding"] = encoding
+
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and _matches(if_none_match, etag):
+            return Response(status_code=304, headers=response_headers)
+
+        response_headers["Content-Length"] = str(len(body))
+        return Response(b"" if method == "HEAD" else body, headers=response_headers, media_type=asset.media_type)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        method = scope["method"]
+        if method not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+        else:
+            asset = self.lookup(_route_path(scope))
+            if asset is None:
+                response = PlainTextResponse("Not Found", status_code=404)
+            else:
+                headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+                response = self.response(asset, method, headers)
+        await response(scope, receive, send)
+
+
+def precompress(directory):
+    """Write .gz (and .br, with brotli installed) next to every compressible file; run after the frontend build."""
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith((".gz", ".br")):
+                continue
+            full = os.path.join(root, name)
+            media_type = mimetypes.guess_type(name)[0] or ""
+            if not _compressible(media_type) or os.path.getsize(full) < STATIC_COMPRESS_MIN_BYTES:
+                continue
+            with open(full, "rb") as f:
+                body = f.read()
+            for encoding, suffix in ENCODINGS:
+                variant = compress(body, encoding)
+                if variant is not None and len(variant) < len(body):
+                    with open(full + suffix, "wb") as f:
+                        f.write(variant)
+                    written += 1
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precompress a frontend build directory")
+    parser.add_argument("directory", nargs="?", default="front_signup/build")
+    args = parser.parse_args()
+    print(f"Wrote {precompress(args.directory)} compressed files in {args.directory}")
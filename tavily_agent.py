@@ -2,12 +2,23 @@ from langchain_tavily import TavilySearch
 from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
 import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dotenv import load_dotenv
 from langchain_core.messages import ToolMessage
 from langgraph.graph import MessagesState
 from typing import Optional
 from langchain_core.runnables import RunnableConfig
 from datetime import date
+from functools import lru_cache
+from ttl_cache import TTLCache, CACHE_DB_PATH
+from agents import get_agent
+from search_compaction import compact_search_result
 today = date.today().strftime("%B %d, %Y")
 # Load environment variables
 load_dotenv()
@@ -17,12 +28,116 @@ tavily_key = os.getenv("TAVILY_API_KEY")
 if tavily_key:
     os.environ["TAVILY_API_KEY"] = tavily_key
 
-# Create the Tavily Search Tool
-search_tool = TavilySearch()
+# --- Search result cache ---
+
+SEARCH_CACHE_TTL = float(os.getenv("TAVILY_CACHE_TTL", str(6 * 60 * 60)))
+# Shorter TTL for searches the agent scopes to recent news or a recent time range
+SEARCH_CACHE_FRESH_TTL = float(os.getenv("TAVILY_CACHE_FRESH_TTL", str(15 * 60)))
+SEARCH_CACHE_SIZE = int(os.getenv("TAVILY_CACHE_SIZE", "512"))
+SEARCH_CACHE_DISK_SIZE = int(os.getenv("TAVILY_CACHE_DISK_SIZE", "10000"))
+SEARCH_CACHE_ENABLED = os.getenv("TAVILY_CACHE_ENABLED", "true").lower() == "true"
+
+_search_cache = None
+_search_cache_lock = threading.Lock()
+_force_refresh = ContextVar("tavily_force_refresh", default=False)
+
+
+def get_search_cache():
+    """The process-wide search result cache, opened on first use."""
+    global _search_cache
+    if _search_cache is None:
+        with _search_cache_lock:
+            if _search_cache is None:
+                _search_cache = TTLCache(
+                    "tavily",
+                    ttl=SEARCH_CACHE_TTL,
+                    max_entries=SEARCH_CACHE_SIZE,
+                    disk_path=CACHE_DB_PATH,
+                    disk_max_entries=SEARCH_CACHE_DISK_SIZE,
+                )
+    return _search_cache
+
+
+@contextmanager
+def fresh_search():
+    """
+    Within this block searches skip cached results (and re-populate the
+    cache). chat_service.run_supervisor(..., refresh=True) turns it on.
+    """
+    token = _force_refresh.set(True)
+    try:
+        yield
+    finally:
+        try:
+            _force_refresh.reset(token)
+        except ValueError:
+            # Reset from another context (e.g. a streaming generator closed by the GC)
+            pass
+
+
+def normalize_query(query):
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip("?.! ")
+
+
+def search_cache_key(query, params):
+    params = {k: v for k, v in params.items() if v is not None}
+    payload = json.dumps({"query": normalize_query(query), **params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CachedTavilySearch(TavilySearch):
+    """
+    TavilySearch that serves repeated queries from search_cache. The cache
+    keeps the raw response; the agent gets it compacted (search_compaction.py).
+    """
+
+    def _cache_lookup(self, query, kwargs):
+        if not SEARCH_CACHE_ENABLED:
+            return None, None
+        key = search_cache_key(query, kwargs)
+        if _force_refresh.get():
+            return key, None
+        return key, get_search_cache().get(key)
+
+    def _cache_store(self, key, kwargs, result):
+        # Don't cache failures ({"error": ...}) so the next turn retries
+        if key is None or not isinstance(result, dict) or "error" in result:
+            return
+        time_sensitive = kwargs.get("topic") == "news" or kwargs.get("time_range") in ("day", "week")
+        get_search_cache().set(key, result, ttl=SEARCH_CACHE_FRESH_TTL if time_sensitive else None)
+
+    def _run(self, query, run_manager=None, **kwargs):
+        key, cached = self._cache_lookup(query, kwargs)
+        if cached is not None:
+            logging.info("Tavily cache hit for %r", query)
+            return compact_search_result(cached, query)
+        result = super()._run(query=query, run_manager=run_manager, **kwargs)
+        self._cache_store(key, kwargs, result)
+        return compact_search_result(result, query)
+
+    async def _arun(self, query, run_manager=None, **kwargs):
+        key, cached = self._cache_lookup(query, kwargs)
+        if cached is not None:
+            logging.info("Tavily cache hit for %r", query)
+            return compact_search_result(cached, query)
+        result = await super()._arun(query=query, run_manager=run_manager, **kwargs)
+        self._cache_store(key, kwargs, result)
+        return compact_search_result(result, query)
+
+
+# Create the Tavily Search Tool and LLM on first use, not at import time
+@lru_cache(maxsize=None)
+def get_search_tool():
+    return CachedTavilySearch()
+
 
 # Define LLM
+@lru_cache(maxsize=None)
+def get_llm():
+    # stream_usage reports token counts on streamed calls too (see instrumentation.py)
+    return ChatOpenAI(model="gpt-4.1", temperature=0.7, stream_usage=True)
 
-llm = ChatOpenAI(model="gpt-4.1", temperature=0.7)
 
 internet_agent_system_prompt = """
 You are an AI assistant that uses a search engine to provide up-to-date and accurate information from the internet.
@@ -37,13 +152,31 @@ You need to format the data in a way that is easy to read and understand. For ex
 
 """
 
-# Wrap with LangGraph ReAct agent
-internet_agent_executor = create_react_agent(
-    model=llm,
-    tools=[search_tool],
-    name="internet_agent",
-    prompt=internet_agent_system_prompt
-)
+# Wrap with LangGraph ReAct agent. Use agents.get_agent("internet_agent") for
+# the shared per-process instance.
+def build_internet_agent(llm=None, search_tool=None):
+    return create_react_agent(
+        model=llm or get_llm(),
+        tools=[search_tool or get_search_tool()],
+        name="internet_agent",
+        prompt=internet_agent_system_prompt
+    )
+
+
+_LAZY_ATTRIBUTES = {
+    "internet_agent_executor": lambda: get_agent("internet_agent"),
+    "search_tool": get_search_tool,
+    "search_cache": get_search_cache,
+    "llm": get_llm,
+}
+
+
+def __getattr__(name):
+    # Backwards compatible module attributes, built on first access
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def internet_agent_node(state: MessagesState, config: Optional[RunnableConfig] = None) -> ToolMessage:
     tool_call_id = None
@@ -55,6 +188,7 @@ def internet_agent_node(state: MessagesState, config: Optional[RunnableConfig] =
 
     if not tool_call_id:
         tool_call_id = "unknown"
+    internet_agent_executor = get_agent("internet_agent")
     result_message = internet_agent_executor.invoke(state, config=config) if config else internet_agent_executor.invoke(state)
     content = getattr(result_message, "content", str(result_message))
     return ToolMessage(tool_call_id=tool_call_id, content=content)
@@ -0,0 +1,23 @@
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, admission_key
+
+
+def test_anonymous_requests_without_session_share_a_bucket():
+    controller = AdmissionController(user_burst=1, user_rate_per_min=1)
+    # Two guests with fresh IDs and no session, as app.py/chat_api make them up
+    with controller.admit(admission_key("guest-1", None)):
+        pass
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit(admission_key("guest-2", None))
+    assert rejected.value.reason == "rate_limited"
+
+
+def test_anonymous_callers_are_keyed_by_client_address():
+    assert admission_key("guest-1", "10.0.0.1") == admission_key("", "10.0.0.1")
+    assert admission_key("guest-1", "10.0.0.1") != admission_key("guest-1", "10.0.0.2")
+    assert admission_key("new-user") == admission_key(None) == "anonymous"
+
+
+def test_signed_in_users_have_their_own_bucket():
+    assert admission_key("42", "10.0.0.1") == "user:42"
@@ -0,0 +1,60 @@
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import HumanMessage
+
+import chat_api
+
+OWNERS = {"alice-session": "alice", "bob-session": "bob"}
+
+
+class FakeHistory:
+    def __init__(self, user_id, session_id):
+        self.session_id = session_id
+
+    async def older_messages(self, before, limit):
+        return [HumanMessage(content=f"message in {self.session_id}")], None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def owner(session_id):
+        return OWNERS.get(session_id)
+
+    async def sessions(user_id, limit, offset):
+        return [{"session_id": s} for s, u in OWNERS.items() if u == user_id]
+
+    monkeypatch.setattr(chat_api, "asession_owner", owner)
+    monkeypatch.setattr(chat_api, "aget_user_chat_sessions", sessions)
+    monkeypatch.setattr(chat_api, "AsyncPostgresChatMessageHistory", FakeHistory)
+    monkeypatch.setattr(chat_api, "CHAT_API_KEY", "secret")
+    # Not entered as a context manager, so the lifespan (pools, agents) doesn't run
+    return TestClient(chat_api.app, headers={"Authorization": "Bearer secret"})
+
+
+def test_user_reads_own_sessions_and_messages(client):
+    assert client.get("/users/alice/sessions", headers={"X-User-ID": "alice"}).json() == {
+        "sessions": [{"session_id": "alice-session"}]
+    }
+    response = client.get("/sessions/alice-session/messages", headers={"X-User-ID": "alice"})
+    assert response.status_code == 200
+    assert response.json()["messages"] == [{"role": "user", "content": "message in alice-session"}]
+
+
+def test_user_cannot_read_another_users_session(client):
+    assert client.get("/users/bob/sessions", headers={"X-User-ID": "alice"}).status_code == 403
+    assert client.get("/users/bob/sessions").status_code == 403
+    assert client.get("/sessions/bob-session/messages", headers={"X-User-ID": "alice"}).status_code == 404
+    assert client.get("/sessions/bob-session/messages").status_code == 403
+
+
+def test_user_cannot_chat_in_another_users_session(client):
+    payload = {"message": "hi", "user_id": "alice", "session_id": "bob-session"}
+    assert client.post("/chat", json=payload).status_code == 404
+    payload = {"message": "hi", "user_id": "bob", "session_id": "bob-session"}
+    assert client.post("/chat", json=payload, headers={"X-User-ID": "alice"}).status_code == 403
+
+
+def test_api_key_is_required(client):
+    headers = {"X-User-ID": "alice"}
+    assert client.get("/users/alice/sessions", headers={**headers, "Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/health", headers={"Authorization": ""}).status_code == 200
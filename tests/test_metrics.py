@@ -0,0 +1,26 @@
+import metrics
+
+
+def test_collector_families_render_contiguously(monkeypatch):
+    monkeypatch.setattr(metrics, "_registry", [])
+    monkeypatch.setattr(metrics, "_collectors", [])
+
+    def caches():
+        # One cache at a time, as ttl_cache's collector reports them
+        for cache in ("search", "sql"):
+            yield "cache_entries", "Entries per cache", "gauge", {"cache": cache}, 3
+            yield "cache_evictions_total", "Evictions per cache", "counter", {"cache": cache}, 1
+
+    metrics.register_collector(caches)
+    lines = metrics.render().splitlines()
+
+    assert lines == [
+        "# HELP cache_entries Entries per cache",
+        "# TYPE cache_entries gauge",
+        'cache_entries{cache="search"} 3',
+        'cache_entries{cache="sql"} 3',
+        "# HELP cache_evictions_total Evictions per cache",
+        "# TYPE cache_evictions_total counter",
+        'cache_evictions_total{cache="search"} 1',
+        'cache_evictions_total{cache="sql"} 1',
+    ]
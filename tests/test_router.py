@@ -0,0 +1,47 @@
+import pytest
+
+from router import decide, get_classifier
+
+# The default graph in chat_service has no sql_agent node
+INTERNET_ONLY = ("supervisor", "internet_agent", "refuse")
+WITH_SQL = INTERNET_ONLY + ("sql_agent",)
+
+
+@pytest.mark.parametrize("question", [
+    "What are the top universities in the UK?",
+    "What is the tuition fee at Harvard?",
+    "How do I get a student visa for Japan?",
+    "Best universities in Singapore for engineering",
+    "Which universities in Australia offer nursing?",
+    "Compare the tuition fees of universities in the UK and Malaysia",
+])
+def test_questions_about_studying_elsewhere_go_to_the_supervisor(question):
+    for routes in (INTERNET_ONLY, WITH_SQL):
+        assert decide(question, routes)[0] == "supervisor"
+
+
+def test_generic_study_words_alone_do_not_skip_the_supervisor():
+    route, _, _, reason = decide("Which universities are ranked in the top 200?", INTERNET_ONLY)
+    assert (route, reason) == ("supervisor", "no_malaysia_words")
+
+
+def test_internet_only_graph_sums_sql_and_internet_probabilities():
+    question = "Is Taylor's University good for business?"
+    probabilities = get_classifier().predict(question)
+    # Neither label is confident on its own, their sum is
+    assert max(probabilities["sql"], probabilities["internet"]) < 0.85
+    assert probabilities["sql"] + probabilities["internet"] >= 0.85
+
+    route, label, probability, reason = decide(question, INTERNET_ONLY)
+    assert (route, label, reason) == ("internet_agent", "internet", "confident")
+    assert probability == pytest.approx(probabilities["sql"] + probabilities["internet"])
+
+
+def test_graph_with_sql_agent_does_not_sum_probabilities():
+    route, label, _, reason = decide("Is Taylor's University good for business?", WITH_SQL)
+    assert (route, label, reason) == ("supervisor", "sql", "unsure")
+
+
+def test_malaysian_questions_still_route_locally():
+    assert decide("How do I apply for a student visa to study in Malaysia?", INTERNET_ONLY)[0] == "internet_agent"
+    assert decide("Write me a poem about the ocean", INTERNET_ONLY)[0] == "refuse"
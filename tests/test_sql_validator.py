@@ -0,0 +1,65 @@
+from sql_validator import validate_query
+
+SCHEMA = {
+    "Universities": {"columns": [{"name": "id"}, {"name": "name"}, {"name": "countryID"}]},
+    "Scholarships": {"columns": [{"name": "id"}, {"name": "name"}, {"name": "countryID"}]},
+    "Programs": {"columns": [{"name": "id"}, {"name": "universityID"}, {"name": "name"}]},
+}
+
+
+def errors(sql):
+    return validate_query(sql, SCHEMA)
+
+
+def test_malaysia_filter_passes():
+    assert errors('SELECT "name" FROM "Universities" WHERE "countryID" = 14 AND "name" ILIKE \'%a%\' LIMIT 5') == []
+
+
+def test_filter_under_or_is_rejected():
+    assert errors('SELECT "name" FROM "Universities" WHERE "countryID" = 14 OR 1 = 1 LIMIT 5')
+
+
+def test_filter_under_not_is_rejected():
+    assert errors('SELECT "name" FROM "Universities" WHERE NOT ("countryID" = 14) LIMIT 5')
+
+
+def test_union_arm_without_filter_is_rejected():
+    sql = (
+        'SELECT "name" FROM "Universities" WHERE "countryID" = 14 '
+        'UNION SELECT "name" FROM "Scholarships" LIMIT 5'
+    )
+    assert errors(sql)
+
+
+def test_union_with_every_arm_filtered_passes():
+    sql = (
+        'SELECT "name" FROM "Universities" WHERE "countryID" = 14 '
+        'UNION SELECT "name" FROM "Scholarships" WHERE "countryID" = 14 LIMIT 5'
+    )
+    assert errors(sql) == []
+
+
+def test_join_needs_a_filter_per_country_table():
+    sql = (
+        'SELECT u."name" FROM "Universities" u JOIN "Scholarships" s ON s."id" = u."id" '
+        'WHERE u."countryID" = 14 LIMIT 5'
+    )
+    assert errors(sql)
+    assert errors(sql.replace("LIMIT", 'AND s."countryID" = 14 LIMIT')) == []
+
+
+def test_other_country_is_rejected():
+    assert errors('SELECT "name" FROM "Universities" WHERE "countryID" = 14 AND "countryID" <> 3 LIMIT 5')
+
+
+def test_side_effect_functions_are_rejected():
+    for call in ("pg_terminate_backend(1)", "lo_unlink(1)", "set_config('a', 'b', false)", "pg_sleep(100)"):
+        assert errors(f'SELECT {call} FROM "Universities" WHERE "countryID" = 14 LIMIT 1'), call
+
+
+def test_common_functions_pass():
+    sql = (
+        'SELECT LOWER("name"), COALESCE("id", 0), age(CURRENT_DATE) FROM "Universities" '
+        'WHERE "countryID" = 14 AND "name" LIKE \'%a%\' LIMIT 5'
+    )
+    assert errors(sql) == []
@@ -0,0 +1,34 @@
+import threading
+import time
+
+from chat_history import WriteBehindWriter
+
+
+class SlowWriter(WriteBehindWriter):
+    """Stands in for the database with a short sleep per batch."""
+    def __init__(self):
+        self.written = []
+        super().__init__()
+
+    def _write(self, rows):
+        time.sleep(0.05)
+        self.written.extend(rows)
+
+
+def _row(session_id, at):
+    return ("user-1", session_id, "user", "hello", at)
+
+
+def test_flush_waits_for_queued_rows_without_deadlocking():
+    writer = SlowWriter()
+    rows = [_row("s1", 1.0), _row("s1", 2.0), _row("s2", 3.0)]
+    writer.submit(rows[:2], ["m1", "m2"])
+    writer.submit(rows[2:], ["m3"])
+
+    flusher = threading.Thread(target=writer.flush, daemon=True)
+    flusher.start()
+    flusher.join(timeout=5)
+
+    assert not flusher.is_alive(), "flush() did not return"
+    assert sorted(writer.written) == sorted(rows)
+    assert writer.unwritten("s1") == [] and writer.unwritten("s2") == []
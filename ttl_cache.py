@@ -0,0 +1,212 @@
+# ttl_cache.py
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+from metrics import register_collector
+
+# Load environment variables
+load_dotenv()
+
+# Next to the code rather than the working directory, so every entry point
+# (app, chat API, bench, tests) uses the same files wherever it is started from
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(CACHE_DIR, "cache.sqlite3"))
+
+_caches = []
+_caches_lock = threading.Lock()
+
+
+class TTLCache:
+    """
+    Two-level key/value cache with per-entry expiry.
+
+    The first level is an in-process LRU dict bounded by `max_entries`. The
+    optional second level is a SQLite file (`disk_path`) shared by every worker
+    on the host and bounded by `disk_max_entries`. Values must be JSON
+    serializable when the disk level is enabled.
+    """
+    def __init__(self, namespace, ttl, max_entries=1024, disk_path=None, disk_max_entries=10000):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()   # key -> (expires_at, value)
+        self._local = threading.local()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        with _caches_lock:
+            _caches.append(self)
+
+        if disk_path:
+            directory = os.path.dirname(disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._disk() as db:
+                db.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS cache_entries (
+                        namespace TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        expires_at REAL NOT NULL,
+                        last_access REAL NOT NULL,
+                        PRIMARY KEY (namespace, key)
+                    )
+                    """
+                )
+                db.execute(
+                    "CREATE INDEX IF NOT EXISTS cache_entries_lru_idx ON cache_entries (namespace, last_access)"
+                )
+
+    def _disk(self):
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.disk_path, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _remember(self, key, expires_at, value):
+        # Caller holds self._lock
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._memory[key]
+
+        if self.disk_path:
+            with self._disk() as db:
+                row = db.execute(
+                    "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                ).fetchone()
+                if row and row[1] > now:
+                    db.execute(
+                        "UPDATE cache_entries SET last_access = ? WHERE namespace = ? AND key = ?",
+                        (now, self.namespace, key),
+                    )
+                    value = json.loads(row[0])
+                    with self._lock:
+                        self._remember(key, row[1], value)
+                        self.disk_hits += 1
+                    return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, expires_at, value)
+
+        if self.disk_path:
+            with self._disk() as db:
+                db.execute(
+                    """
+                    INSERT INTO cache_entries (namespace, key, value, expires_at, last_access)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (namespace, key) DO UPDATE SET
+                        value = excluded.value,
+                        expires_at = excluded.expires_at,
+                        last_access = excluded.last_access
+                    """,
+                    (self.namespace, key, json.dumps(value), expires_at, now),
+                )
+                self._evict_disk(db, now)
+
+    def _evict_disk(self, db, now):
+        db.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?",
+            (self.namespace, now),
+        )
+        count = db.execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        if count > self.disk_max_entries:
+            cursor = db.execute(
+                """
+                DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                    SELECT key FROM cache_entries WHERE namespace = ?
+                    ORDER BY last_access ASC LIMIT ?
+                )
+                """,
+                (self.namespace, self.namespace, count - self.disk_max_entries),
+            )
+            with self._lock:
+                self.evictions += cursor.rowcount
+
+    def delete(self, key):
+        with self._lock:
+            self._memory.pop(key, None)
+        if self.disk_path:
+            with self._disk() as db:
+                db.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                )
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.disk_path:
+            with self._disk() as db:
+                db.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "namespace": self.namespace,
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+def _cache_metrics():
+    with _caches_lock:
+        caches = list(_caches)
+    samples = []
+    for cache in caches:
+        stats = cache.stats()
+        labels = {"cache": stats["namespace"]}
+        for result in ("hits", "disk_hits", "misses"):
+            samples.append((
+                "cache_lookups_total", "Cache lookups, by cache and result (hits, disk_hits, misses)", "counter",
+                {**labels, "result": result}, stats[result],
+            ))
+        samples.append(("cache_evictions_total", "Entries evicted for space", "counter", labels, stats["evictions"]))
+        samples.append(("cache_entries", "Entries in the in-process level", "gauge", labels, stats["entries"]))
+    return samples
+
+
+register_collector(_cache_metrics)